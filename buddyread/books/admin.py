@@ -1,16 +1,114 @@
 from django.contrib import admin
-from .models import Book, Review, BookClub, BookClubMembers, BookClubBooks
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.forms.models import BaseInlineFormSet
+from core.paginator import EstimatedCountPaginator
+from .models import Book, Review, BookClub, BookClubMembers, BookClubBooks, normalize_book_key
+from .pagination import ADMIN_PAGE_SIZE
 
-admin.site.register(Book)
-admin.site.register(Review)
 
-class BookClubMembersInline(admin.TabularInline):
-    model = BookClubMembers
+class LoadedAutocompleteSelect(AutocompleteSelect):
+    """
+    AutocompleteSelect that labels its selected option from an object the inline already loaded
+    with select_related, instead of a query per row.
+    """
+    loaded = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = {str(v) for v in value if str(v) not in self.choices.field.empty_values}
+        if self.loaded is None or selected != {str(self.loaded.pk)}:
+            return super().optgroups(name, value, attr)
+        default = (None, [], 0)
+        if not self.is_required:
+            default[1].append(self.create_option(name, "", "", False, 0))
+        default[1].append(self.create_option(
+            name, self.loaded.pk, self.choices.field.label_from_instance(self.loaded), selected, len(default[1])
+        ))
+        return [default]
+
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """Inline formset showing one page of the related rows, selected by ?<prefix>-page=."""
+    params = {}
+    per_page = ADMIN_PAGE_SIZE
+    loaded_fields = ()
+
+    def get_queryset(self):
+        if not hasattr(self, "_queryset"):
+            queryset = super().get_queryset().select_related(*self.loaded_fields)
+            self.page = Paginator(queryset, self.per_page).get_page(self.params.get(f"{self.prefix}-page"))
+            self._queryset = self.page.object_list
+        return self._queryset
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        for name in self.loaded_fields:
+            if getattr(form.instance, f"{name}_id") is not None:
+                widget = form.fields[name].widget
+                getattr(widget, "widget", widget).loaded = getattr(form.instance, name)
+        return form
+
+
+class PaginatedTabularInline(admin.TabularInline):
+    formset = PaginatedInlineFormSet
+    template = "admin/books/paginated_tabular.html"
     extra = 1
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs["widget"] = LoadedAutocompleteSelect(db_field, self.admin_site, using=kwargs.get("using"))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.params = request.GET
+        formset.loaded_fields = tuple(self.get_autocomplete_fields(request))
+        return formset
+
+
+class BookClubMembersInline(PaginatedTabularInline):
+    model = BookClubMembers
+    autocomplete_fields = ('member',)
+
+
+class BookClubBooksInline(PaginatedTabularInline):
+    model = BookClubBooks
+    autocomplete_fields = ('book', 'selected_by')
+
+
+@admin.register(Book)
+class BookAdmin(admin.ModelAdmin):
+    list_display = ('title', 'author', 'creation_date')
+    # prefix searches on the indexed normalized keys
+    search_fields = ('^title_key', '^author_key')
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def get_search_results(self, request, queryset, search_term):
+        # the whole term is one prefix of a title or author, not a word per search field; term and keys
+        # are both casefolded, so a case-sensitive startswith can use the key indexes
+        key = normalize_book_key(search_term)
+        if not key:
+            return queryset, False
+        return queryset.filter(Q(title_key__startswith=key) | Q(author_key__startswith=key)), False
+
+
+@admin.register(Review)
+class ReviewAdmin(admin.ModelAdmin):
+    list_display = ('book', 'user', 'score')
+    list_select_related = ('book', 'user')
+    autocomplete_fields = ('book', 'user')
+    search_fields = ('^user__username',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+
 @admin.register(BookClub)
 class BookClubAdmin(admin.ModelAdmin):
     exclude = ('slug', 'end_date')
     list_display = ('name', 'creation_date')
-    inlines = [BookClubMembersInline]
-
+    search_fields = ('^name',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    inlines = [BookClubMembersInline, BookClubBooksInline]
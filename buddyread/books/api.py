@@ -0,0 +1,136 @@
+from functools import wraps
+from django.http import Http404, JsonResponse
+from .decorators import resolve_club_membership
+from .models import Review, BookClubBooks
+from .pagination import CLUB_BOOKS_ORDERING, InvalidCursor, keyset_page
+
+
+BOOK_FIELDS = ["id", "title", "author", "selected_by", "date_added", "reviews"]
+REVIEW_FIELDS = ["user", "score", "comment"]
+SCORE_LABELS = dict(Review.SCORES)
+
+# API field -> values() lookup
+BOOK_LOOKUPS = {
+    "id": "book_id",
+    "title": "book__title",
+    "author": "book__author",
+    "selected_by": "selected_by__username",
+    "date_added": "date_added",
+}
+REVIEW_LOOKUPS = {
+    "user": "user__username",
+    "score": "score",
+    "comment": "comment",
+}
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def parse_fields(fields):
+    """
+    Parse a sparse fieldset such as "title,author,reviews.score" into the selected book fields
+    and review fields. Selecting "reviews" alone selects all review fields.
+    """
+    if not fields:
+        return BOOK_FIELDS, REVIEW_FIELDS
+
+    book_fields, review_fields = [], []
+    for field in fields.split(","):
+        name, _, review_field = field.strip().partition(".")
+        if name not in BOOK_FIELDS or (review_field and (name != "reviews" or review_field not in REVIEW_FIELDS)):
+            raise InvalidFields(field)
+        if name not in book_fields:
+            book_fields.append(name)
+        if review_field:
+            review_fields.append(review_field)
+
+    if "reviews" in book_fields and not review_fields:
+        review_fields = REVIEW_FIELDS
+    return book_fields, review_fields
+
+
+def _member_reviews(book_club, book_ids, review_fields):
+    lookups = ["book_id"] + [REVIEW_LOOKUPS[field] for field in review_fields]
+    reviews = {book_id: [] for book_id in book_ids}
+    rows = Review.objects.filter(
+        book_id__in=book_ids,
+        user__in=book_club.bookclubmembers_set.values("member")
+    ).order_by("pk").values_list(*lookups)
+    for book_id, *values in rows:
+        review = dict(zip(review_fields, values))
+        if "score" in review:
+            review["score"] = SCORE_LABELS[review["score"]]
+        reviews[book_id].append(review)
+    return reviews
+
+
+def serialize_club_books(book_club, queryset, book_fields, review_fields):
+    """Serialize club books from values() rows: one query for the books and one for their reviews."""
+    lookups = {"book_id"} | {BOOK_LOOKUPS[field] for field in book_fields if field in BOOK_LOOKUPS}
+    rows = list(queryset.values(*lookups))
+
+    reviews = {}
+    if "reviews" in book_fields:
+        reviews = _member_reviews(book_club, [row["book_id"] for row in rows], review_fields)
+
+    results = []
+    for row in rows:
+        book = {}
+        for field in book_fields:
+            if field == "reviews":
+                book[field] = reviews[row["book_id"]]
+            elif field == "date_added":
+                book[field] = row["date_added"].isoformat() if row["date_added"] else None
+            else:
+                book[field] = row[BOOK_LOOKUPS[field]]
+        results.append(book)
+    return results
+
+
+def api_club_member(view_func):
+    @wraps(view_func)
+    def wrap(request, club, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({"detail": "Niet ingelogd"}, status=401)
+        try:
+            membership = resolve_club_membership(request, club)
+        except Http404:
+            return JsonResponse({"detail": "Boeken club niet gevonden"}, status=404)
+        if membership is None:
+            return JsonResponse({"detail": "Toegang geweigerd voor de geselecteerde boeken club"}, status=403)
+        try:
+            return view_func(request, club, *args, **kwargs)
+        except InvalidFields as exc:
+            return JsonResponse({"detail": f"Ongeldig veld: {exc}"}, status=400)
+    return wrap
+
+
+@api_club_member
+def club_books(request, club):
+    book_club = request.club
+    book_fields, review_fields = parse_fields(request.GET.get("fields"))
+    try:
+        page_pks, next_cursor = keyset_page(
+            BookClubBooks.objects.filter(book_club=book_club), request.GET.get("cursor")
+        )
+    except InvalidCursor:
+        return JsonResponse({"detail": "Ongeldige cursor"}, status=400)
+
+    queryset = BookClubBooks.objects.filter(pk__in=page_pks).order_by(*CLUB_BOOKS_ORDERING)
+    return JsonResponse({
+        "results": serialize_club_books(book_club, queryset, book_fields, review_fields),
+        "next_cursor": next_cursor,
+    })
+
+
+@api_club_member
+def club_book(request, club, book_pk):
+    book_club = request.club
+    book_fields, review_fields = parse_fields(request.GET.get("fields"))
+    queryset = BookClubBooks.objects.filter(book_club=book_club, book_id=book_pk).order_by(*CLUB_BOOKS_ORDERING)
+    results = serialize_club_books(book_club, queryset, book_fields, review_fields)
+    if not results:
+        return JsonResponse({"detail": "Boek niet gevonden in deze boeken club"}, status=404)
+    return JsonResponse(results[0])
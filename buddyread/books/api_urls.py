@@ -0,0 +1,8 @@
+from django.urls import path
+
+from . import api
+
+urlpatterns = [
+    path("clubs/<slug:club>/books/", api.club_books, name="api_club_books"),
+    path("clubs/<slug:club>/books/<int:book_pk>/", api.club_book, name="api_club_book"),
+]
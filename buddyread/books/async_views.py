@@ -0,0 +1,78 @@
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponseBadRequest
+from django.shortcuts import render, redirect
+from .caching import cache_policy, club_condition
+from .decorators import async_login_required, user_is_club_member
+from .forms import ReviewForm
+from .memberships import auser_clubs
+from .models import Book, Review
+from .pagination import InvalidCursor
+from .views import _club_books_context
+
+
+# Async versions of the hot read views, served by the ASGI entry point (see buddyread/async_urls.py).
+# Templates are rendered through sync_to_async, as they may evaluate lazy querysets, with the clubs of
+# the user awaited up front so the user_clubs context processor never looks them up itself.
+
+
+@async_login_required
+async def choose_club(request):
+    context = {"user_clubs": await auser_clubs(request.user)}
+    return await sync_to_async(render)(request, "books/choose_club.html", context)
+
+
+@async_login_required
+@user_is_club_member
+@cache_policy()
+@club_condition
+async def books(request, club):
+    book_club = request.club
+    cursor = request.GET.get("cursor")
+    try:
+        context = _club_books_context(book_club, cursor)
+    except InvalidCursor:
+        return HttpResponseBadRequest("Ongeldige cursor")
+
+    context["user_clubs"] = await auser_clubs(request.user)
+    context["first_page"] = not cursor
+    return await sync_to_async(render)(request, "books/book_list.html", context)
+
+
+@async_login_required
+@user_is_club_member
+@club_condition
+async def review(request, club, book_pk):
+    try:
+        book = await Book.objects.aget(pk=book_pk)
+    except Book.DoesNotExist:
+        raise Http404("Boek niet gevonden")
+    book_club = request.club
+    review_selected = await Review.objects.filter(user=request.user, book=book).afirst()
+    if request.method == "POST":
+        form = ReviewForm(request.POST)
+        if form.is_valid():
+            score = form.cleaned_data['score']
+            comment = form.cleaned_data['comment']
+            if review_selected is None:
+                await Review.objects.acreate(
+                    user=request.user,
+                    book=book,
+                    score=score,
+                    comment=comment
+                )
+            else:
+                review_selected.score = score
+                review_selected.comment = comment
+                await review_selected.asave()
+            return redirect('books', club=book_club.slug)
+    else:
+        if review_selected is None:
+            form = ReviewForm()
+        else:
+            initial_data = {
+                'score': review_selected.get_score_display(),
+                'comment': review_selected.comment
+            }
+            form = ReviewForm(initial=initial_data)
+    context = {'book': book, 'form': form, 'user_clubs': await auser_clubs(request.user)}
+    return await sync_to_async(render)(request, "books/review_form.html", context)
@@ -0,0 +1,81 @@
+import asyncio
+import hashlib
+from functools import wraps
+from django.db.models import F
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+
+
+def bump_club_versions(clubs):
+    """Atomically bump the version of a queryset of book clubs, invalidating their cached pages."""
+    clubs.update(version=F("version") + 1, modified=timezone.now())
+
+
+def club_etag(request, club, *args, **kwargs):
+    # pages also depend on the user (club dropdown, own review) and embed a token of the CSRF secret,
+    # which get_token creates up front for a first visit
+    get_token(request)
+    variant = hashlib.sha256(
+        f"{request.user.pk}:{request.get_full_path()}:{request.META['CSRF_COOKIE']}".encode()
+    ).hexdigest()[:16]
+    return f"{request.club.slug}-{request.club.version}-{variant}"
+
+
+def club_last_modified(request, club, *args, **kwargs):
+    return request.club.modified
+
+
+def club_condition(view_func):
+    """
+    condition() on the club version for sync and async views. Must be applied inside the club
+    membership decorators, which resolve request.club.
+    """
+    if not asyncio.iscoroutinefunction(view_func):
+        return condition(etag_func=club_etag, last_modified_func=club_last_modified)(view_func)
+
+    # django.views.decorators.http.condition only supports sync views in Django 4.2
+    @wraps(view_func)
+    async def wrap(request, club, *args, **kwargs):
+        etag = quote_etag(club_etag(request, club, *args, **kwargs))
+        last_modified = int(club_last_modified(request, club, *args, **kwargs).timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await view_func(request, club, *args, **kwargs)
+
+        if request.method in ("GET", "HEAD"):
+            if not response.has_header("Last-Modified"):
+                response.headers["Last-Modified"] = http_date(last_modified)
+            response.headers.setdefault("ETag", etag)
+        return response
+    return wrap
+
+
+def cache_policy(max_age=0, private=True):
+    """
+    Cache-Control of a view for browsers and proxies. max_age=0 lets the browser keep the page but
+    revalidate it on every use, which is cheap for views with club_condition.
+    """
+    directives = {"private": True} if private else {"public": True}
+    if max_age:
+        directives["max_age"] = max_age
+    else:
+        directives["no_cache"] = True
+
+    def decorator(view_func):
+        if asyncio.iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def wrap(request, *args, **kwargs):
+                response = await view_func(request, *args, **kwargs)
+                patch_cache_control(response, **directives)
+                return response
+        else:
+            @wraps(view_func)
+            def wrap(request, *args, **kwargs):
+                response = view_func(request, *args, **kwargs)
+                patch_cache_control(response, **directives)
+                return response
+        return wrap
+    return decorator
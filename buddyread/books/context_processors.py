@@ -0,0 +1,9 @@
+from django.utils.functional import SimpleLazyObject
+from .memberships import user_clubs as _user_clubs
+
+
+def user_clubs(request):
+    """The cached clubs of the user, looked up only when a template uses them."""
+    if not request.user.is_authenticated:
+        return {"user_clubs": []}
+    return {"user_clubs": SimpleLazyObject(lambda: _user_clubs(request.user))}
@@ -1,40 +1,88 @@
-from django.http import HttpResponseForbidden
-from django.shortcuts import render, get_object_or_404
+import asyncio
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponseForbidden
+from django.shortcuts import get_object_or_404
 from functools import wraps
 from .models import BookClub, BookClubMembers
 
-def user_is_club_member(view_func):
+
+def _membership_qs(request, club):
+    return BookClubMembers.objects.select_related("book_club").filter(
+        book_club__slug=club,
+        member=request.user
+    )
+
+
+def resolve_club_membership(request, club):
+    """
+    Load the club and the membership of the requesting user in one joined query and attach
+    both to the request as request.club and request.membership (None for non-members).
+    Raises Http404 if the club does not exist.
+    """
+    try:
+        # (book_club, member) is unique, so get() needs no ORDER BY unlike first()
+        membership = _membership_qs(request, club).get()
+    except BookClubMembers.DoesNotExist:
+        membership = None
+
+    if membership is None:
+        request.club = get_object_or_404(BookClub, slug=club)
+    else:
+        request.club = membership.book_club
+    request.membership = membership
+    return membership
+
+
+async def aresolve_club_membership(request, club):
+    """Async version of resolve_club_membership."""
+    try:
+        membership = await _membership_qs(request, club).aget()
+    except BookClubMembers.DoesNotExist:
+        membership = None
+
+    if membership is None:
+        try:
+            request.club = await BookClub.objects.aget(slug=club)
+        except BookClub.DoesNotExist:
+            raise Http404("Boekenclub niet gevonden")
+    else:
+        request.club = membership.book_club
+    request.membership = membership
+    return membership
+
+
+def async_login_required(view_func):
+    # django.contrib.auth.decorators.login_required only supports sync views in Django 4.2
     @wraps(view_func)
-    def wrap(request, club, *args, **kwargs):
-        book_club = get_object_or_404(BookClub, slug=club)
-        member = request.user
-        book_club_members_qs = BookClubMembers.objects.filter(
-            book_club=book_club,
-            member=member
-        )
-        if not book_club_members_qs.exists():
-            return HttpResponseForbidden("Toegang geweigerd voor de geselecteerde boeken club")
-        return view_func(request, club, *args, **kwargs)
+    async def wrap(request, *args, **kwargs):
+        # the lazy request.user loads the session and user from the database
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
     return wrap
 
 
-def user_is_club_mod(view_func):
+def _club_access(view_func, is_allowed):
+    if asyncio.iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrap(request, club, *args, **kwargs):
+            if not is_allowed(await aresolve_club_membership(request, club)):
+                return HttpResponseForbidden("Toegang geweigerd voor de geselecteerde boeken club")
+            return await view_func(request, club, *args, **kwargs)
+        return async_wrap
+
     @wraps(view_func)
     def wrap(request, club, *args, **kwargs):
-        book_club = get_object_or_404(BookClub, slug=club)
-        member = request.user
-        book_club_members_qs = BookClubMembers.objects.filter(
-            book_club=book_club,
-            member=member
-        )
-
-        if not book_club_members_qs.exists():
+        if not is_allowed(resolve_club_membership(request, club)):
             return HttpResponseForbidden("Toegang geweigerd voor de geselecteerde boeken club")
-        book_club = book_club_members_qs.first()
+        return view_func(request, club, *args, **kwargs)
+    return wrap
 
-        if not book_club.is_mod:
-            return HttpResponseForbidden("Toegang geweigerd voor de geselecteerde boeken club")
 
-        return view_func(request, club, *args, **kwargs)
+def user_is_club_member(view_func):
+    return _club_access(view_func, lambda membership: membership is not None)
 
-    return wrap
+
+def user_is_club_mod(view_func):
+    return _club_access(view_func, lambda membership: membership is not None and membership.is_mod)
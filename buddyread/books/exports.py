@@ -0,0 +1,94 @@
+import csv
+import json
+from django.db.models import FilteredRelation, Q
+from .models import Review, BookClubBooks, BookClubMembers
+from .pagination import CLUB_BOOKS_ORDERING, keyset_page
+
+
+# club books per keyset page; each page is one joined query, streamed in chunks of EXPORT_CHUNK_SIZE rows
+EXPORT_PAGE_SIZE = 2000
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_BUFFER_SIZE = 64 * 1024
+SCORE_LABELS = dict(Review.SCORES)
+
+# export field -> values_list() lookup
+EXPORT_LOOKUPS = {
+    "title": "book__title",
+    "author": "book__author",
+    "date_added": "date_added",
+    "selected_by": "selected_by__username",
+    "reviewer": "member_review__user__username",
+    "score": "member_review__score",
+    "comment": "member_review__comment",
+}
+EXPORT_FIELDS = list(EXPORT_LOOKUPS)
+
+
+def club_history(book_club, page_size=None, chunk_size=None):
+    """
+    Yield the club books of book_club, newest first, as one row per member review (a book without
+    reviews once, with empty review fields). Club books are walked in keyset pages and every page is
+    joined with its member reviews through values_list().iterator(), so memory does not grow with
+    the club, also on drivers that buffer a whole result set.
+    """
+    club_books = BookClubBooks.objects.filter(book_club=book_club)
+    members = BookClubMembers.objects.filter(book_club=book_club).values("member")
+    cursor = None
+    while True:
+        page_pks, cursor = keyset_page(club_books, cursor, page_size or EXPORT_PAGE_SIZE)
+        rows = BookClubBooks.objects.filter(pk__in=page_pks).annotate(
+            member_review=FilteredRelation("book__review", condition=Q(book__review__user__in=members))
+        ).order_by(*CLUB_BOOKS_ORDERING, "member_review__pk").values_list(*EXPORT_LOOKUPS.values())
+
+        for row in rows.iterator(chunk_size=chunk_size or EXPORT_CHUNK_SIZE):
+            record = dict(zip(EXPORT_FIELDS, row))
+            record["date_added"] = record["date_added"].isoformat() if record["date_added"] else None
+            if record["score"] is not None:
+                record["score"] = SCORE_LABELS[record["score"]]
+            yield record
+        if cursor is None:
+            return
+
+
+class _Echo:
+    # csv.writer target that hands back each line instead of storing it
+    def write(self, value):
+        return value
+
+
+def _buffered(lines):
+    # one chunk per row would be a socket write per row
+    buffer, size = [], 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= EXPORT_BUFFER_SIZE:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def csv_lines(records):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for record in records:
+        yield writer.writerow(["" if record[field] is None else record[field] for field in EXPORT_FIELDS])
+
+
+def ndjson_lines(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+# format -> (content type, file extension, renderer)
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv", csv_lines),
+    "ndjson": ("application/x-ndjson; charset=utf-8", "ndjson", ndjson_lines),
+}
+
+
+def export_club_history(book_club, export_format):
+    """Chunks of the rendered club history, for a StreamingHttpResponse."""
+    _, _, render_lines = EXPORT_FORMATS[export_format]
+    return _buffered(render_lines(club_history(book_club)))
@@ -3,7 +3,8 @@ from crispy_forms.layout import Submit
 from django import forms
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from .models import Book, Review, BookClub
+from django.urls import reverse_lazy
+from .models import Book, Review, BookClub, BookClubMembers
 
 
 class BookForm(forms.ModelForm):
@@ -14,6 +15,14 @@ class BookForm(forms.ModelForm):
             "title": "Titel",
             "author": "Auteur"
         }
+        widgets = {
+            field: forms.TextInput(attrs={
+                "autocomplete": "off",
+                "data-autocomplete-url": reverse_lazy("book_autocomplete"),
+                "data-autocomplete-field": field,
+            })
+            for field in ["title", "author"]
+        }
 
     helper = FormHelper()
     helper.add_input(Submit('submit', 'Opslaan', css_class='btn-primary'))
@@ -21,6 +30,11 @@ class BookForm(forms.ModelForm):
 
 
 class ReviewForm(forms.ModelForm):
+    score = forms.ChoiceField(
+        choices=[(label, label) for _, label in Review.SCORES],
+        label="Score"
+    )
+
     class Meta:
         model = Review
         fields = ["score", "comment"]
@@ -33,6 +47,9 @@ class ReviewForm(forms.ModelForm):
     helper.add_input(Submit('submit', 'Opslaan', css_class='btn-primary'))
     helper.form_method = 'POST'
 
+    def clean_score(self):
+        return Review.score_from_label(self.cleaned_data['score'])
+
 
 class BookClubForm(forms.ModelForm):
     class Meta:
@@ -90,4 +107,28 @@ class InviteMemberForm(forms.Form):
         password = cleaned_data["password"]
         password_repeat = cleaned_data["password_repeat"]
         if password != password_repeat:
-            raise ValidationError('Het wachtwoord en de herhaling komen niet overeen')
\ No newline at end of file
+            raise ValidationError('Het wachtwoord en de herhaling komen niet overeen')
+
+class InviteBatchForm(forms.Form):
+    MAX_INVITES = 50
+
+    count = forms.IntegerField(min_value=1, max_value=MAX_INVITES, initial=1, label="Aantal uitnodigingen")
+
+    helper = FormHelper()
+    helper.add_input(Submit('submit', 'Genereer nieuwe links', css_class='btn-success'))
+    helper.form_method = 'POST'
+
+
+class ImportBooksForm(forms.Form):
+    # reviews belong to their user in every club, so the scores are only ever imported as the moderator's own
+    file = forms.FileField(
+        label="CSV-bestand",
+        help_text="Je eigen export van Goodreads, met minstens de kolommen Title en Author; de scores worden je eigen reviews",
+    )
+    restart = forms.BooleanField(
+        required=False, label="Opnieuw importeren", help_text="Importeer een eerder geïmporteerd bestand opnieuw vanaf het begin"
+    )
+
+    helper = FormHelper()
+    helper.add_input(Submit('submit', 'Importeer', css_class='btn-primary'))
+    helper.form_method = 'POST'
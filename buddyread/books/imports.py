@@ -0,0 +1,209 @@
+import csv
+import hashlib
+import io
+import time
+from datetime import date, datetime
+from itertools import islice
+from django.db import connection, transaction
+from .caching import bump_club_versions
+from .models import Book, Review, BookClub, BookClubMembers, BookClubBooks, BookImport, normalize_book_key
+from .search import book_index
+
+
+IMPORT_BATCH_SIZE = 1000
+# Goodreads export columns; other exports only need Title and Author
+COLUMNS = {
+    "title": "Title",
+    "author": "Author",
+    "rating": "My Rating",
+    "review": "My Review",
+    "date_added": "Date Added",
+    "shelf": "Exclusive Shelf",
+}
+
+
+class InvalidImport(ValueError):
+    pass
+
+
+class ImportResult:
+    def __init__(self, resumed_from=0, already_imported=False):
+        self.resumed_from = resumed_from
+        # the same file was imported before for this member; nothing was read
+        self.already_imported = already_imported
+        self.rows = 0
+        self.skipped = 0
+        self.books_created = 0
+        self.club_books_created = 0
+        self.reviews_created = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def file_digest(stream):
+    """sha256 of a binary stream, read in blocks; the stream is rewound afterwards."""
+    digest = hashlib.sha256()
+    for block in iter(lambda: stream.read(64 * 1024), b""):
+        digest.update(block)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def _parse_score(value):
+    # Goodreads rates in whole stars with 0 for unrated, other exports in half stars
+    try:
+        score = round(float(value.strip().replace(",", ".")) * 2) if value and value.strip() else 0
+    except ValueError:
+        return None
+    return score if score in dict(Review.SCORES) and score != Review.DNF else None
+
+
+def _parse_date(value):
+    for date_format in ("%Y/%m/%d", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value.strip(), date_format).date()
+        except (AttributeError, ValueError):
+            pass
+    return None
+
+
+def parse_row(row):
+    """(title, author, score, comment, date_added) of a CSV row, or None for a row that is not a read book."""
+    title = " ".join((row.get(COLUMNS["title"]) or "").split())
+    author = " ".join((row.get(COLUMNS["author"]) or "").split())
+    shelf = (row.get(COLUMNS["shelf"]) or "read").strip()
+    if not title or not author or shelf != "read":
+        return None
+    comment = (row.get(COLUMNS["review"]) or "").replace("<br/>", "\n").strip() or None
+    return (
+        title[:255],
+        author[:255],
+        _parse_score(row.get(COLUMNS["rating"])),
+        comment,
+        _parse_date(row.get(COLUMNS["date_added"])),
+    )
+
+
+class _RowCount:
+    """Execute wrapper that adds up the rows the statements affected."""
+
+    def __init__(self):
+        self.rows = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        self.rows += max(context["cursor"].rowcount, 0)
+        return result
+
+
+def _books_by_key(keys):
+    return {
+        (title_key, author_key): pk
+        for pk, title_key, author_key in Book.objects.filter(
+            title_key__in={title_key for title_key, _ in keys}
+        ).values_list("pk", "title_key", "author_key")
+        if (title_key, author_key) in keys
+    }
+
+
+def _import_batch(book_club, user, rows, result):
+    # a book listed twice in one batch is imported once, with its last rating
+    by_key = {(normalize_book_key(row[0]), normalize_book_key(row[1])): row for row in rows}
+
+    book_pks = _books_by_key(by_key.keys())
+    missing = by_key.keys() - book_pks.keys()
+    if missing:
+        # ignore_conflicts: a book added concurrently is simply looked up again below
+        Book.objects.bulk_create(
+            (Book(title=by_key[key][0], author=by_key[key][1], title_key=key[0], author_key=key[1]) for key in missing),
+            ignore_conflicts=True,
+        )
+        created = _books_by_key(missing)
+        result.books_created += len(created)
+        book_pks.update(created)
+        for key, pk in created.items():
+            book_index.add(pk, by_key[key][0], by_key[key][1])
+
+    rows_by_book = {book_pks[key]: row for key, row in by_key.items() if key in book_pks}
+    in_club = set(
+        BookClubBooks.objects.filter(book_club=book_club, book_id__in=rows_by_book).values_list("book_id", flat=True)
+    )
+    new_club_books = [book_pk for book_pk in rows_by_book if book_pk not in in_club]
+    BookClubBooks.objects.bulk_create(
+        BookClubBooks(book_club=book_club, book_id=book_pk, selected_by=user, date_added=rows_by_book[book_pk][4] or date.today())
+        for book_pk in new_club_books
+    )
+    result.club_books_created += len(new_club_books)
+
+    # existing reviews are kept
+    reviewed = set(
+        Review.objects.filter(user=user, book_id__in=rows_by_book).values_list("book_id", flat=True)
+    )
+    reviews = [
+        Review(user=user, book_id=book_pk, score=row[2], comment=row[3])
+        for book_pk, row in rows_by_book.items()
+        if row[2] is not None and book_pk not in reviewed
+    ]
+    # ignore_conflicts: a review added concurrently is kept, so the rows the INSERT reports are counted
+    inserted = _RowCount()
+    with connection.execute_wrapper(inserted):
+        Review.objects.bulk_create(reviews, ignore_conflicts=True)
+    result.reviews_created += inserted.rows
+
+    # bulk_create sends no signals: invalidate the pages of every club of the member at once
+    bump_club_versions(BookClub.objects.filter(
+        pk__in=BookClubMembers.objects.filter(member=user).values("book_club")
+    ))
+
+
+def import_reading_history(book_club, user, stream, batch_size=None, restart=False, progress=None):
+    """
+    Import a reading history CSV from a binary stream into book_club, with the ratings as reviews
+    of user. The file is read row by row and written in batches of batch_size rows, each in its own
+    transaction together with the progress of the import, so an interrupted import of the same file
+    resumes after its last committed batch, and a finished one is not imported again unless restart.
+    progress(result) is called after every batch.
+    """
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    book_import, _ = BookImport.objects.get_or_create(book_club=book_club, user=user, digest=file_digest(stream))
+    if book_import.finished and not restart:
+        return ImportResult(already_imported=True)
+    if restart:
+        book_import.rows_done = 0
+        book_import.finished = False
+
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.DictReader(text)
+        if reader.fieldnames is None or not {COLUMNS["title"], COLUMNS["author"]} <= set(reader.fieldnames):
+            raise InvalidImport(f"Het bestand mist de kolommen {COLUMNS['title']} en {COLUMNS['author']}")
+
+        result = ImportResult(resumed_from=book_import.rows_done)
+        start = time.perf_counter()
+        # committed rows are skipped without touching the database
+        rows = islice(reader, book_import.rows_done, None)
+        while batch := list(islice(rows, batch_size)):
+            parsed = [row for row in map(parse_row, batch) if row is not None]
+            with transaction.atomic():
+                if parsed:
+                    _import_batch(book_club, user, parsed, result)
+                book_import.rows_done += len(batch)
+                book_import.save(update_fields=["rows_done", "modified"])
+            result.rows += len(batch)
+            result.skipped += len(batch) - len(parsed)
+            result.seconds = time.perf_counter() - start
+            if progress:
+                progress(result)
+    except (csv.Error, UnicodeDecodeError) as exc:
+        raise InvalidImport(f"Het bestand is geen geldig CSV-bestand: {exc}") from exc
+    finally:
+        # the caller owns the stream
+        text.detach()
+
+    book_import.finished = True
+    book_import.save(update_fields=["rows_done", "finished", "modified"])
+    result.seconds = time.perf_counter() - start
+    return result
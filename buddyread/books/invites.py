@@ -0,0 +1,30 @@
+import secrets
+from django.core import signing
+from django.db import IntegrityError, transaction
+from .models import INVITE_LIFETIME, RedeemedInvite
+
+
+SALT = "books.invite"
+
+
+def issue_invite_token(book_club):
+    """A signed, timestamped invite token carrying the club slug and a single-use nonce."""
+    return signing.dumps({"c": book_club.slug, "n": secrets.token_urlsafe(8)}, salt=SALT)
+
+
+def read_invite_token(token):
+    """
+    Validate an invite token without touching the database and return its payload.
+    Raises signing.SignatureExpired for an expired token and signing.BadSignature for any other invalid token.
+    """
+    return signing.loads(token, salt=SALT, max_age=INVITE_LIFETIME)
+
+
+def redeem_invite_nonce(nonce):
+    """Record the nonce of a token as used. Returns False when it was used before."""
+    try:
+        with transaction.atomic():
+            RedeemedInvite.objects.create(nonce=nonce)
+    except IntegrityError:
+        return False
+    return True
@@ -0,0 +1,88 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from books.models import BookClub
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput of the club books page on the WSGI path (sync views, one request per "
+        "worker thread) against the ASGI path (async views, concurrent requests on one event loop)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("club", help="slug of the club to request")
+        parser.add_argument("username", help="member of the club to request the page as")
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--workers", type=int, default=4, help="sync worker threads of the WSGI path")
+        parser.add_argument("--concurrency", type=int, default=50, help="in-flight requests of the ASGI path")
+        parser.add_argument("--latency", type=float, default=0.0, help="simulated database round-trip in ms")
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options["username"])
+            club = BookClub.objects.get(slug=options["club"])
+        except (BookClub.DoesNotExist, get_user_model().DoesNotExist) as exc:
+            raise CommandError(exc)
+
+        url = reverse("books", kwargs={"club": club.slug})
+        client = Client()
+        client.force_login(user)
+        self.cookies = client.cookies
+        self.latency = options["latency"] / 1000
+
+        # every connection, whichever thread opens it, gets the simulated round-trip
+        connections.close_all()
+        connection_created.connect(self.slow_database)
+        wsgi = self.bench(self.run_wsgi, url, options["requests"], options["workers"])
+        with override_settings(ROOT_URLCONF="buddyread.async_urls"):
+            asgi = self.bench(self.run_asgi, url, options["requests"], options["concurrency"])
+
+        self.stdout.write(f"requests:     {options['requests']}")
+        self.stdout.write(f"latency:      {options['latency']} ms per query")
+        self.stdout.write(f"wsgi:         {wsgi:.1f} req/s ({options['workers']} workers)")
+        self.stdout.write(f"asgi:         {asgi:.1f} req/s ({options['concurrency']} in flight)")
+
+    def slow_database(self, sender, connection, **kwargs):
+        connection.execute_wrappers.append(self.round_trip)
+
+    def round_trip(self, execute, sql, params, many, context):
+        time.sleep(self.latency)
+        return execute(sql, params, many, context)
+
+    def bench(self, run, url, requests, concurrency):
+        start = time.perf_counter()
+        statuses = run(url, requests, concurrency)
+        seconds = time.perf_counter() - start
+        if set(statuses) != {200}:
+            raise CommandError(f"unexpected responses: {sorted(set(statuses))}")
+        return requests / seconds
+
+    def get_wsgi(self, url):
+        client = Client()
+        client.cookies = self.cookies
+        return client.get(url).status_code
+
+    def run_wsgi(self, url, requests, workers):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(self.get_wsgi, [url] * requests))
+
+    def run_asgi(self, url, requests, concurrency):
+        async def get(client, semaphore):
+            async with semaphore:
+                response = await client.get(url)
+            return response.status_code
+
+        async def main():
+            semaphore = asyncio.Semaphore(concurrency)
+            client = AsyncClient()
+            client.cookies = self.cookies
+            return await asyncio.gather(*(get(client, semaphore) for _ in range(requests)))
+
+        return asyncio.run(main())
@@ -0,0 +1,49 @@
+import random
+import statistics
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand
+from books.search import BookPrefixIndex
+
+
+class Command(BaseCommand):
+    help = "Benchmark the in-process book autocomplete index on a synthetic catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--books", type=int, default=1000000)
+        parser.add_argument("--lookups", type=int, default=10000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        words = [
+            "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9)))
+            for _ in range(5000)
+        ]
+        books = [
+            (pk, " ".join(rng.choices(words, k=rng.randint(1, 4))).title(), f"{rng.choice(words)} {rng.choice(words)}")
+            for pk in range(1, options["books"] + 1)
+        ]
+
+        # a synthetic catalog, never checked against the database
+        index = BookPrefixIndex(max_books=options["books"], refresh_seconds=float("inf"))
+        tracemalloc.start()
+        start = time.perf_counter()
+        index.build(reversed(books))
+        build_seconds = time.perf_counter() - start
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        prefixes = [rng.choice(books)[1][:rng.randint(1, 6)] for _ in range(options["lookups"])]
+        timings = []
+        for prefix in prefixes:
+            start = time.perf_counter()
+            index.search(prefix)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+
+        self.stdout.write(f"books:        {options['books']}")
+        self.stdout.write(f"build:        {build_seconds:.2f} s")
+        self.stdout.write(f"memory:       {memory / 2 ** 20:.1f} MiB")
+        self.stdout.write(f"lookup mean:  {statistics.mean(timings) * 1e6:.1f} us")
+        self.stdout.write(f"lookup p99:   {timings[int(len(timings) * 0.99)] * 1e6:.1f} us")
@@ -0,0 +1,91 @@
+import statistics
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from books.decorators import _membership_qs
+from books.models import Book, BookClub, BookClubBooks, BookClubMembers, Review, club_counts
+from books.pagination import CLUB_BOOKS_ORDERING
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the queries that join the club tables on book_club, on a synthetic data set that is "
+        "rolled back afterwards. Run it before and after a schema change of the club keys to compare."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clubs", type=int, default=200)
+        parser.add_argument("--members", type=int, default=25, help="members per club")
+        parser.add_argument("--books", type=int, default=200, help="books per club")
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            users, clubs = self.seed(options)
+            user, club = users[0], clubs[len(clubs) // 2]
+            request = RequestFactory().get("/")
+            request.user = user
+            member_clubs = BookClubMembers.objects.filter(member=user).values("book_club")
+            queries = {
+                "membership": lambda: _membership_qs(request, club.slug).get(),
+                "club books page": lambda: list(
+                    BookClubBooks.objects.filter(book_club=club).with_review_stats().select_related("book")
+                    .order_by(*CLUB_BOOKS_ORDERING)[:20]
+                ),
+                "club counts": lambda: BookClub.objects.filter(pk=club.pk).values(**club_counts()).get(),
+                "clubs of member": lambda: list(BookClub.objects.filter(pk__in=member_clubs).values_list("pk")),
+            }
+
+            self.stdout.write(f"vendor:       {connection.vendor}")
+            self.stdout.write(f"club key:     {BookClub._meta.pk.get_internal_type()} ({BookClub._meta.pk.name})")
+            self.stdout.write(f"clubs:        {options['clubs']} x {options['members']} members, {options['books']} books")
+            for name, query in queries.items():
+                timings = []
+                for _ in range(options["repeat"]):
+                    start = time.perf_counter()
+                    query()
+                    timings.append(time.perf_counter() - start)
+                timings.sort()
+                self.stdout.write(
+                    f"{name + ':':<18}mean {statistics.mean(timings) * 1e6:8.1f} us, "
+                    f"p99 {timings[int(len(timings) * 0.99)] * 1e6:8.1f} us"
+                )
+            transaction.set_rollback(True)
+
+    def seed(self, options):
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(username=f"bench-{i}", password="!") for i in range(options["members"] * 4)
+        )
+        # realistic slugs: the old string keys were as long as club names
+        BookClub.objects.bulk_create(
+            BookClub(slug=f"de-leesclub-van-de-bench-nummer-{i}", name=f"De leesclub van de bench nummer {i}")
+            for i in range(options["clubs"])
+        )
+        clubs = list(BookClub.objects.filter(slug__startswith="de-leesclub-van-de-bench-").order_by("slug"))
+        Book.objects.bulk_create(
+            Book(title=f"Bench {i}", author="Bench", title_key=f"bench {i}", author_key="bench")
+            for i in range(options["books"] * 2)
+        )
+        books = list(Book.objects.filter(author_key="bench").order_by("pk"))
+        BookClubMembers.objects.bulk_create(
+            (
+                BookClubMembers(book_club=club, member=users[(i + j) % len(users)])
+                for i, club in enumerate(clubs) for j in range(options["members"])
+            ),
+            batch_size=5000,
+        )
+        BookClubBooks.objects.bulk_create(
+            (
+                BookClubBooks(book_club=club, book=books[(i + j) % len(books)], selected_by=users[j % len(users)])
+                for i, club in enumerate(clubs) for j in range(options["books"])
+            ),
+            batch_size=5000,
+        )
+        Review.objects.bulk_create(
+            (Review(user=user, book=book, score=8) for user in users for book in books[:options["books"]]),
+            batch_size=5000,
+            ignore_conflicts=True,
+        )
+        return users, clubs
@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from books.imports import IMPORT_BATCH_SIZE, InvalidImport, import_reading_history
+from books.models import BookClub, BookClubMembers
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a Goodreads-style reading history CSV into a book club, with the ratings as reviews of a member. "
+        "An interrupted import of the same file resumes after its last committed batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("club", help="slug of the book club")
+        parser.add_argument("username", help="member whose ratings are imported")
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument("--restart", action="store_true", help="start over instead of resuming")
+
+    def handle(self, *args, **options):
+        try:
+            book_club = BookClub.objects.get(slug=options["club"])
+            user = get_user_model().objects.get(username=options["username"])
+        except (BookClub.DoesNotExist, get_user_model().DoesNotExist) as exc:
+            raise CommandError(exc)
+        if not BookClubMembers.objects.filter(book_club=book_club, member=user).exists():
+            raise CommandError(f"{user.username} is geen lid van {book_club.name}")
+
+        try:
+            with open(options["path"], "rb") as f:
+                result = import_reading_history(
+                    book_club, user, f, batch_size=options["batch_size"], restart=options["restart"],
+                    progress=lambda result: self.stdout.write(
+                        f"{result.resumed_from + result.rows} rijen, {result.rows_per_second:.0f} rijen/s"
+                    ),
+                )
+        except InvalidImport as exc:
+            raise CommandError(exc)
+
+        if result.already_imported:
+            self.stdout.write("Dit bestand is al geïmporteerd voor dit lid, gebruik --restart om het opnieuw te importeren")
+            return
+        if result.resumed_from:
+            self.stdout.write(f"Hervat na {result.resumed_from} rijen")
+        self.stdout.write(
+            f"{result.rows} rijen in {result.seconds:.1f}s ({result.rows_per_second:.0f} rijen/s): "
+            f"{result.books_created} nieuwe boeken, {result.club_books_created} boeken toegevoegd aan de club, "
+            f"{result.reviews_created} reviews, {result.skipped} rijen overgeslagen"
+        )
@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from books.models import BookClub, InviteURL, RedeemedInvite, INVITE_LIFETIME
+
+
+class Command(BaseCommand):
+    help = "Delete accepted and expired invites in small chunks, club by club, and the nonces of expired invite tokens"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between chunks")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - INVITE_LIFETIME
+        # both conditions lead with (book_club, accepted), so every chunk is a range scan on invite_club_open_idx
+        conditions = [Q(accepted=True), Q(accepted=False, creation_date__lte=cutoff)]
+
+        deleted = 0
+        for club in BookClub.objects.order_by("pk").values_list("pk", flat=True).iterator():
+            for condition in conditions:
+                deleted += self.sweep(InviteURL.objects.filter(condition, book_club=club), options)
+        # a token redeemed before the cutoff has expired, so its nonce can no longer be replayed
+        deleted += self.sweep(RedeemedInvite.objects.filter(redeemed_at__lte=cutoff), options)
+        self.stdout.write(f"{deleted} uitnodigingen verwijderd")
+
+    def sweep(self, invites, options):
+        # every chunk is a separate short autocommit DELETE, so locks are released between chunks
+        deleted = 0
+        while True:
+            pks = list(invites.values_list("pk", flat=True)[:options["chunk_size"]])
+            if not pks:
+                return deleted
+            deleted += invites.model.objects.filter(pk__in=pks).delete()[0]
+            if options["pause"]:
+                time.sleep(options["pause"])
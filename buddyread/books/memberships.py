@@ -0,0 +1,49 @@
+from collections import namedtuple
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .models import BookClubMembers
+
+
+# per user, the clubs for index routing and the club switchers; invalidated by books.signals, so only cached
+# when the cache is shared by all workers (settings.CACHE_SHARED)
+ClubMembership = namedtuple("ClubMembership", ["slug", "name", "is_mod"])
+USER_CLUBS_TIMEOUT = 60 * 60 * 24
+
+
+def user_clubs_key(user_id):
+    return f"user-clubs:{user_id}"
+
+
+def _user_clubs_query(user):
+    return BookClubMembers.objects.filter(member=user).order_by("book_club__name").values_list(
+        "book_club__slug", "book_club__name", "is_mod"
+    )
+
+
+def user_clubs(user):
+    if not settings.CACHE_SHARED:
+        return [ClubMembership(*row) for row in _user_clubs_query(user)]
+    key = user_clubs_key(user.pk)
+    clubs = cache.get(key)
+    if clubs is None:
+        clubs = [ClubMembership(*row) for row in _user_clubs_query(user)]
+        cache.set(key, clubs, USER_CLUBS_TIMEOUT)
+    return clubs
+
+
+async def auser_clubs(user):
+    if not settings.CACHE_SHARED:
+        return [ClubMembership(*row) async for row in _user_clubs_query(user)]
+    key = user_clubs_key(user.pk)
+    clubs = await cache.aget(key)
+    if clubs is None:
+        clubs = [ClubMembership(*row) async for row in _user_clubs_query(user)]
+        await cache.aset(key, clubs, USER_CLUBS_TIMEOUT)
+    return clubs
+
+
+def invalidate_user_clubs(user_ids):
+    # after the commit, so a read before it cannot cache the old rows for USER_CLUBS_TIMEOUT
+    keys = [user_clubs_key(user_id) for user_id in user_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
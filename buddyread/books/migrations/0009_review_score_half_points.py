@@ -0,0 +1,53 @@
+from django.db import migrations, models
+from django.db.models import Case, F, Value, When
+
+
+SCORE_LABELS = {
+    'DNF': 0,
+    '1': 2,
+    '1.5': 3,
+    '2': 4,
+    '2.5': 5,
+    '3': 6,
+    '3.5': 7,
+    '4': 8,
+    '4.5': 9,
+    '5': 10,
+}
+
+
+def _relabel(apps, mapping):
+    # a single CASE update, so a converted score is never matched again by a later label
+    Review = apps.get_model('books', 'Review')
+    Review.objects.update(score=Case(
+        *[When(score=old, then=Value(new)) for old, new in mapping.items()],
+        default=F('score'),
+    ))
+
+
+def labels_to_half_points(apps, schema_editor):
+    _relabel(apps, {label: str(half_points) for label, half_points in SCORE_LABELS.items()})
+
+
+def half_points_to_labels(apps, schema_editor):
+    _relabel(apps, {str(half_points): label for label, half_points in SCORE_LABELS.items()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_bookclubmembers_is_mod_inviteurl'),
+    ]
+
+    operations = [
+        migrations.RunPython(labels_to_half_points, half_points_to_labels),
+        migrations.AlterField(
+            model_name='review',
+            name='score',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'DNF'), (2, '1'), (3, '1.5'), (4, '2'), (5, '2.5'), (6, '3'), (7, '3.5'), (8, '4'), (9, '4.5'), (10, '5')]),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['book', 'score'], name='review_book_score_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+import unicodedata
+from django.db import migrations, models
+
+
+def normalize_book_key(value):
+    # cut to the column, as books.models.normalize_book_key does
+    return " ".join(unicodedata.normalize("NFKC", value).split()).casefold()[:255]
+
+
+def backfill_book_keys(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    BookClubBooks = apps.get_model('books', 'BookClubBooks')
+    Review = apps.get_model('books', 'Review')
+
+    canonical_books = {}
+    for book in Book.objects.order_by('pk').iterator(chunk_size=1000):
+        key = (normalize_book_key(book.title), normalize_book_key(book.author))
+        canonical_pk = canonical_books.setdefault(key, book.pk)
+        if canonical_pk == book.pk:
+            Book.objects.filter(pk=book.pk).update(title_key=key[0], author_key=key[1])
+            continue
+
+        # merge the duplicate into the oldest book with the same key
+        BookClubBooks.objects.filter(book_id=book.pk).update(book_id=canonical_pk)
+        reviewed_by = list(Review.objects.filter(book_id=canonical_pk).values_list('user_id', flat=True))
+        Review.objects.filter(book_id=book.pk, user_id__in=reviewed_by).delete()
+        Review.objects.filter(book_id=book.pk).update(book_id=canonical_pk)
+        book.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0009_review_score_half_points'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='title_key',
+            field=models.CharField(default='', editable=False, max_length=255),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='author_key',
+            field=models.CharField(default='', editable=False, max_length=255),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_book_keys, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.UniqueConstraint(fields=('title_key', 'author_key'), name='unique_book_key'),
+        ),
+    ]
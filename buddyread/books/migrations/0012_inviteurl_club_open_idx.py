@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-17 21:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0011_bookclub_version_modified'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inviteurl',
+            index=models.Index(fields=['book_club', 'accepted', 'creation_date'], name='invite_club_open_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.23 on 2026-10-17 21:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0012_inviteurl_club_open_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RedeemedInvite',
+            fields=[
+                ('nonce', models.CharField(max_length=16, primary_key=True, serialize=False)),
+                ('redeemed_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-17 22:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0013_redeemedinvite'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['author_key'], name='book_author_key_idx'),
+        ),
+    ]
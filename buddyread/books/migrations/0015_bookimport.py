@@ -0,0 +1,38 @@
+# Generated by Django 4.2.23 on 2026-10-17 22:13
+
+import datetime
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('books', '0014_book_author_key_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bookclubbooks',
+            name='date_added',
+            field=models.DateField(blank=True, default=datetime.date.today, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='BookImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64)),
+                ('rows_done', models.PositiveIntegerField(default=0)),
+                ('finished', models.BooleanField(default=False)),
+                ('modified', models.DateTimeField(auto_now=True)),
+                ('book_club', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='books.bookclub')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='bookimport',
+            constraint=models.UniqueConstraint(fields=('book_club', 'user', 'digest'), name='unique_book_import'),
+        ),
+    ]
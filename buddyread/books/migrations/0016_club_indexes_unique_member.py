@@ -0,0 +1,38 @@
+# Generated by Django 4.2.23 on 2026-10-17 22:17
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remove_duplicate_memberships(apps, schema_editor):
+    BookClubMembers = apps.get_model('books', 'BookClubMembers')
+
+    duplicates = BookClubMembers.objects.values('book_club', 'member').annotate(count=Count('pk')).filter(count__gt=1)
+    for duplicate in duplicates.iterator():
+        memberships = BookClubMembers.objects.filter(book_club=duplicate['book_club'], member=duplicate['member'])
+        # keep the oldest membership with moderator rights, or else the oldest one
+        keep = memberships.order_by('-is_mod', 'pk').first()
+        memberships.exclude(pk=keep.pk).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0015_bookimport'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookclubbooks',
+            index=models.Index(fields=['book_club', '-date_added', '-id'], name='club_books_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['book', 'user'], name='review_book_user_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_memberships, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='bookclubmembers',
+            constraint=models.UniqueConstraint(fields=('book_club', 'member'), name='unique_club_member'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+CLUB_CHILDREN = ['bookclubmembers', 'bookclubbooks', 'inviteurl', 'bookimport']
+SLUG_INDEX = 'books_bookclub_slug_uniq'
+
+
+def _slug_fields(apps):
+    BookClub = apps.get_model('books', 'BookClub')
+    unique_slug = models.SlugField(unique=True)
+    unique_slug.set_attributes_from_name('slug')
+    return BookClub, BookClub._meta.get_field('slug'), unique_slug
+
+
+def slug_to_unique(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        # the unique index first: the foreign keys of the club tables need an index on slug when the
+        # primary key is dropped (error 1553), and neither statement touches the child tables
+        schema_editor.execute(f'CREATE UNIQUE INDEX {SLUG_INDEX} ON books_bookclub (slug)')
+        schema_editor.execute('ALTER TABLE books_bookclub DROP PRIMARY KEY')
+    else:
+        BookClub, primary_slug, unique_slug = _slug_fields(apps)
+        schema_editor.alter_field(BookClub, primary_slug, unique_slug)
+
+
+def slug_to_primary_key(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE books_bookclub ADD PRIMARY KEY (slug)')
+        schema_editor.execute(f'DROP INDEX {SLUG_INDEX} ON books_bookclub')
+    else:
+        BookClub, primary_slug, unique_slug = _slug_fields(apps)
+        schema_editor.alter_field(BookClub, unique_slug, primary_slug)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0016_club_indexes_unique_member'),
+    ]
+
+    operations = [
+        # the book_club columns already reference bookclub.slug, so only the state names it; altering
+        # them would drop and re-create the foreign keys, which copies the child tables on MySQL
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name=model_name,
+                    name='book_club',
+                    field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='books.bookclub', to_field='slug'),
+                )
+                for model_name in CLUB_CHILDREN
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(slug_to_unique, slug_to_primary_key)],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='bookclub',
+                    name='slug',
+                    field=models.SlugField(unique=True),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='bookclub',
+            name='id',
+            field=models.BigAutoField(auto_created=True, default=None, primary_key=True, serialize=False, verbose_name='ID'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,53 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+CLUB_CHILDREN = ['bookclubmembers', 'bookclubbooks', 'inviteurl', 'bookimport']
+BACKFILL_CHUNK_SIZE = 5000
+
+
+def backfill_club_ids(apps, schema_editor, chunk_size=BACKFILL_CHUNK_SIZE):
+    """
+    Copy the club of every child row from the slug column to the new club id column, walking each
+    table by primary key in chunks. The migration is not atomic, so every chunk is a short
+    transaction of its own and the tables stay writable. Only rows without a club id are updated,
+    so running it again catches up with rows written in the meantime.
+    """
+    BookClub = apps.get_model('books', 'BookClub')
+    for model_name in CLUB_CHILDREN:
+        model = apps.get_model('books', model_name)
+        club_id = Subquery(BookClub.objects.filter(slug=OuterRef('book_club')).values('id'))
+        pending = model.objects.filter(club__isnull=True).order_by('pk')
+        last_pk = None
+        while True:
+            chunk = pending if last_pk is None else pending.filter(pk__gt=last_pk)
+            pks = list(chunk.values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                break
+            model.objects.filter(pk__in=pks).update(club=club_id)
+            last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('books', '0017_bookclub_id'),
+    ]
+
+    operations = [
+        # without constraint or index, so adding the column does not rebuild or lock the large child tables
+        *[
+            migrations.AddField(
+                model_name=model_name,
+                name='club',
+                field=models.ForeignKey(
+                    null=True, db_constraint=False, db_index=False, related_name='+',
+                    on_delete=django.db.models.deletion.DO_NOTHING, to='books.bookclub',
+                ),
+            )
+            for model_name in CLUB_CHILDREN
+        ],
+        migrations.RunPython(backfill_club_ids, migrations.RunPython.noop),
+    ]
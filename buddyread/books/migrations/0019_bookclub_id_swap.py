@@ -0,0 +1,55 @@
+from importlib import import_module
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+CLUB_CHILDREN = ['bookclubmembers', 'bookclubbooks', 'inviteurl', 'bookimport']
+
+
+def catch_up_club_ids(apps, schema_editor):
+    # rows written since the backfill of 0018_bookclub_id_backfill
+    import_module('books.migrations.0018_bookclub_id_backfill').backfill_club_ids(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0018_bookclub_id_backfill'),
+    ]
+
+    operations = [
+        migrations.RunPython(catch_up_club_ids, migrations.RunPython.noop),
+        migrations.RemoveConstraint(model_name='bookclubmembers', name='unique_club_member'),
+        migrations.RemoveIndex(model_name='bookclubbooks', name='club_books_date_idx'),
+        migrations.RemoveIndex(model_name='inviteurl', name='invite_club_open_idx'),
+        migrations.RemoveConstraint(model_name='bookimport', name='unique_book_import'),
+        *[
+            operation
+            for model_name in CLUB_CHILDREN
+            for operation in (
+                migrations.RemoveField(model_name=model_name, name='book_club'),
+                migrations.RenameField(model_name=model_name, old_name='club', new_name='book_club'),
+                migrations.AlterField(
+                    model_name=model_name,
+                    name='book_club',
+                    field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='books.bookclub'),
+                ),
+            )
+        ],
+        migrations.AddConstraint(
+            model_name='bookclubmembers',
+            constraint=models.UniqueConstraint(fields=('book_club', 'member'), name='unique_club_member'),
+        ),
+        migrations.AddIndex(
+            model_name='bookclubbooks',
+            index=models.Index(fields=['book_club', '-date_added', '-id'], name='club_books_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inviteurl',
+            index=models.Index(fields=['book_club', 'accepted', 'creation_date'], name='invite_club_open_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='bookimport',
+            constraint=models.UniqueConstraint(fields=('book_club', 'user', 'digest'), name='unique_book_import'),
+        ),
+    ]
@@ -1,38 +1,67 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+import unicodedata
 import uuid
 from django.db import models
+from django.db.models import Avg, Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.template.defaultfilters import slugify
 from django.utils import timezone
 
 
+BOOK_KEY_MAX_LENGTH = 255
+
+
+def normalize_book_key(value):
+    # NFKC and casefold() can lengthen a string ("ß" -> "ss"), so the key is cut to fit its column
+    return " ".join(unicodedata.normalize("NFKC", value).split()).casefold()[:BOOK_KEY_MAX_LENGTH]
+
+
 class Book(models.Model):
     title = models.CharField(max_length=255, blank=False, null=False)
     author = models.CharField(max_length=255, blank=False, null=False)
+    # normalized title and author identify a book, so "The Hobbit" and "the hobbit " are the same book
+    title_key = models.CharField(max_length=BOOK_KEY_MAX_LENGTH, editable=False)
+    author_key = models.CharField(max_length=BOOK_KEY_MAX_LENGTH, editable=False)
     creation_date = models.DateField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['title_key', 'author_key'], name='unique_book_key')
+        ]
+        # title_key prefix searches use the unique constraint, author_key ones this index
+        indexes = [
+            models.Index(fields=['author_key'], name='book_author_key_idx')
+        ]
+
+    def save(self, *args, **kwargs):
+        self.title_key = normalize_book_key(self.title)
+        self.author_key = normalize_book_key(self.author)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.title
 
 
 class Review(models.Model):
+    # scores are stored in half points, so they can be averaged, sorted and indexed in SQL
+    DNF = 0
     SCORES = [
-        ('DNF', 'DNF'),
-        ('1', '1'),
-        ('1.5', '1.5'),
-        ('2', '2'),
-        ('2.5', '2.5'),
-        ('3', '3'),
-        ('3.5', '3.5'),
-        ('4', '4'),
-        ('4.5', '4.5'),
-        ('5', '5'),
+        (DNF, 'DNF'),
+        (2, '1'),
+        (3, '1.5'),
+        (4, '2'),
+        (5, '2.5'),
+        (6, '3'),
+        (7, '3.5'),
+        (8, '4'),
+        (9, '4.5'),
+        (10, '5'),
     ]
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
-    score = models.CharField(
-        max_length=3,
+    score = models.PositiveSmallIntegerField(
         blank=False,
         null=False,
         choices=SCORES
@@ -43,21 +72,38 @@ class Review(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['user', 'book'], name='unique_user_book')
         ]
+        indexes = [
+            models.Index(fields=['book', 'score'], name='review_book_score_idx'),
+            # the member reviews of a page of club books: book_id IN (...) AND user_id IN (members)
+            models.Index(fields=['book', 'user'], name='review_book_user_idx'),
+        ]
+
+    @classmethod
+    def score_from_label(cls, label):
+        return {score_label: score for score, score_label in cls.SCORES}[label]
 
     def __str__(self):
         return f"{self.book.title} - {self.user.username}"
 
 
 class BookClub(models.Model):
-    slug = models.SlugField(primary_key=True, max_length=50, null=False, blank=False)
+    slug = models.SlugField(unique=True, max_length=50, null=False, blank=False)
     name = models.CharField(unique=True, max_length=50, null=False, blank=False)
     creation_date = models.DateField(auto_now_add=True)
     end_date = models.DateField(null=True, blank=True)
+    # bumped whenever the books, reviews or members of the club change, see books.signals
+    version = models.PositiveBigIntegerField(default=1, editable=False)
+    modified = models.DateTimeField(auto_now=True)
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        if not self._state.adding:
+            # never write back a stale in-memory version
+            self.version = F("version") + 1
         super().save(*args, **kwargs)
+        if not isinstance(self.version, int):
+            self.refresh_from_db(fields=["version"])
 
     def __str__(self):
         return f"{self.name}"
@@ -70,16 +116,51 @@ class BookClubMembers(models.Model):
 
     class Meta:
         verbose_name_plural = "Book club members"
+        constraints = [
+            models.UniqueConstraint(fields=['book_club', 'member'], name='unique_club_member')
+        ]
+
+
+class BookClubBooksQuerySet(models.QuerySet):
+    def with_review_stats(self):
+        """
+        Annotate the average score (in half points, DNF excluded) and the number of reviews
+        given by members of the club.
+        """
+        club_review = Q(book__review__user__bookclubmembers__book_club=F("book_club"))
+        return self.annotate(
+            average_score=Avg("book__review__score", filter=club_review & Q(book__review__score__gt=Review.DNF)),
+            review_count=Count("book__review", filter=club_review, distinct=True),
+        )
 
 
 class BookClubBooks(models.Model):
     book_club = models.ForeignKey(BookClub, on_delete=models.CASCADE, blank=False, null=False)
     book = models.ForeignKey(Book, on_delete=models.CASCADE, blank=False, null=False)
     selected_by = models.ForeignKey(User, on_delete=models.CASCADE, blank=True, null=True)
-    date_added = models.DateField(auto_now_add=True, blank=True, null=True)
+    # a default instead of auto_now_add, so imported reading histories keep their own dates
+    date_added = models.DateField(default=date.today, editable=False, blank=True, null=True)
+
+    objects = BookClubBooksQuerySet.as_manager()
 
     class Meta:
         verbose_name_plural = "Book club books"
+        indexes = [
+            # the club book pages and their keyset, see books.pagination.CLUB_BOOKS_ORDERING
+            models.Index(fields=['book_club', '-date_added', '-id'], name='club_books_date_idx')
+        ]
+
+
+INVITE_LIFETIME = timedelta(days=1)
+
+
+class InviteURLQuerySet(models.QuerySet):
+    def open(self):
+        """Invites that are neither accepted nor expired."""
+        return self.filter(accepted=False, creation_date__gt=timezone.now() - INVITE_LIFETIME)
+
+    def create_batch(self, book_club, count):
+        return self.bulk_create(self.model(book_club=book_club) for _ in range(count))
 
 
 class InviteURL(models.Model):
@@ -88,7 +169,61 @@ class InviteURL(models.Model):
     accepted = models.BooleanField(blank=False, null=False, default=False)
     book_club = models.ForeignKey(BookClub, on_delete=models.CASCADE, blank=False, null=False)
 
+    objects = InviteURLQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['book_club', 'accepted', 'creation_date'], name='invite_club_open_idx')
+        ]
 
     def is_expired(self):
-        expiration_time = self.creation_date + timedelta(days=1)
+        expiration_time = self.creation_date + INVITE_LIFETIME
         return timezone.now() >= expiration_time
+
+
+class RedeemedInvite(models.Model):
+    # nonces of used invite tokens, kept until the tokens themselves have expired (see books.invites)
+    nonce = models.CharField(primary_key=True, max_length=16)
+    redeemed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+class BookImport(models.Model):
+    # progress of a reading history import, so an interrupted import resumes after its last committed batch
+    book_club = models.ForeignKey(BookClub, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    digest = models.CharField(max_length=64)
+    rows_done = models.PositiveIntegerField(default=0)
+    finished = models.BooleanField(default=False)
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book_club', 'user', 'digest'], name='unique_book_import')
+        ]
+
+
+def _count(queryset, group_by):
+    return Coalesce(
+        Subquery(queryset.order_by().values(group_by).annotate(count=Count("pk", distinct=True)).values("count")),
+        0,
+    )
+
+
+def club_counts(club_ref="pk", invites=True):
+    """
+    Annotations counting the members, books, member reviews of club books and, with invites, open
+    invites of the club at club_ref, each as a correlated subquery so they do not multiply each
+    other's rows. Only InviteURL rows can be counted, signed invite tokens have none.
+    """
+    club = OuterRef(club_ref)
+    counts = {
+        "member_count": _count(BookClubMembers.objects.filter(book_club=club), "book_club"),
+        "book_count": _count(BookClubBooks.objects.filter(book_club=club), "book_club"),
+        "review_count": _count(
+            Review.objects.filter(book__bookclubbooks__book_club=club, user__bookclubmembers__book_club=club),
+            "book__bookclubbooks__book_club",
+        ),
+    }
+    if invites:
+        counts["open_invite_count"] = _count(InviteURL.objects.filter(book_club=club).open(), "book_club")
+    return counts
@@ -0,0 +1,76 @@
+from datetime import date
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+
+
+BOOKS_PAGE_SIZE = 20
+# numbered pages for the searchable member and book lists of the club admin
+ADMIN_PAGE_SIZE = 25
+CLUB_BOOKS_ORDERING = (F("date_added").desc(nulls_last=True), "-pk")
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(pk, date_added):
+    return f"{date_added.isoformat() if date_added else ''}_{pk}"
+
+
+def decode_cursor(cursor):
+    try:
+        date_added, pk = cursor.split("_")
+        return int(pk), date.fromisoformat(date_added) if date_added else None
+    except ValueError as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+def _after(pk, date_added):
+    # rows without a date_added are sorted last, see CLUB_BOOKS_ORDERING
+    if date_added is None:
+        return Q(date_added__isnull=True, pk__lt=pk)
+    return (
+        Q(date_added__lt=date_added)
+        | Q(date_added=date_added, pk__lt=pk)
+        | Q(date_added__isnull=True)
+    )
+
+
+def keyset_page(queryset, cursor=None, page_size=None):
+    """
+    Return the primary keys of one page of club books ordered by (date_added, pk), newest first,
+    together with the cursor of the next page (None on the last page).
+    Every page is a single range scan, so page N costs the same as page 1.
+    """
+    page_size = page_size or BOOKS_PAGE_SIZE
+    if cursor:
+        queryset = queryset.filter(_after(*decode_cursor(cursor)))
+
+    rows = list(queryset.order_by(*CLUB_BOOKS_ORDERING).values_list("pk", "date_added")[:page_size + 1])
+    next_cursor = encode_cursor(*rows[page_size - 1]) if len(rows) > page_size else None
+    return [pk for pk, _ in rows[:page_size]], next_cursor
+
+
+class KeysetPage:
+    """
+    Lazily evaluated keyset page: nothing is queried until the page is rendered,
+    so a cached rendering of it costs no queries at all.
+    """
+    def __init__(self, queryset, cursor=None, page_size=None):
+        if cursor:
+            decode_cursor(cursor)
+        self.queryset = queryset
+        self.cursor = cursor
+        self.page_size = page_size
+
+    @cached_property
+    def _page(self):
+        return keyset_page(self.queryset, self.cursor, self.page_size)
+
+    @property
+    def pks(self):
+        return self._page[0]
+
+    @property
+    def next_cursor(self):
+        return self._page[1]
@@ -0,0 +1,178 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from .models import Book, normalize_book_key
+
+
+SEPARATOR = "\x00"
+VERSION_KEY = "book_index_version"
+# more new books than this since the last check are loaded by rebuilding, not one insort each
+MAX_NEW_BOOKS = 1000
+
+
+class BookPrefixIndex:
+    """
+    In-process prefix index over the normalized titles and authors of the Book catalog.
+    Keys are kept in sorted lists of "key\\x00pk" strings, so a lookup is a bisect without
+    touching the database. The index is built lazily on the first lookup and holds the
+    max_books newest books, evicting the oldest when a new one comes in.
+
+    Books saved or deleted in this process update the index directly. Every refresh_seconds a
+    lookup also checks the catalog: books with a higher pk than any it has seen (created by
+    another worker, or by bulk_create without signals) are loaded, and a changed catalog version
+    (see publish_change) rebuilds it.
+    """
+    FIELDS = ("title", "author")
+
+    def __init__(self, max_books=None, refresh_seconds=None, clock=time.monotonic):
+        self.max_books = max_books
+        self.refresh_seconds = refresh_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._keys = {field: [] for field in self.FIELDS}
+        # pk -> "title\x00author", newest first
+        self._books = OrderedDict()
+        self._version = None
+        self._max_pk = 0
+        self._checked = 0.0
+
+    def _max_books(self):
+        return self.max_books or settings.BOOK_INDEX_MAX_BOOKS
+
+    def _refresh_seconds(self):
+        return settings.BOOK_INDEX_REFRESH_SECONDS if self.refresh_seconds is None else self.refresh_seconds
+
+    def _due(self):
+        return not self._loaded or self.clock() >= self._checked + self._refresh_seconds()
+
+    def _ensure_fresh(self):
+        if not self._due():
+            return
+        with self._lock:
+            if not self._due():
+                return
+            # read before the books, so a change published meanwhile is picked up by the next check
+            version = cache.get(VERSION_KEY, 0)
+            if not self._loaded or version != self._version:
+                self._load()
+            elif (Book.objects.aggregate(max_pk=Max("pk"))["max_pk"] or 0) > self._max_pk:
+                new_books = list(
+                    Book.objects.filter(pk__gt=self._max_pk).order_by("pk")
+                    .values_list("pk", "title", "author")[:MAX_NEW_BOOKS + 1]
+                )
+                if len(new_books) > MAX_NEW_BOOKS:
+                    self._load()
+                else:
+                    for pk, title, author in new_books:
+                        self._add(pk, title, author)
+            self._version = version
+            self._checked = self.clock()
+
+    def _load(self):
+        books = Book.objects.order_by("-pk").values_list("pk", "title", "author")[:self._max_books()]
+        self._build(books.iterator(chunk_size=10000))
+
+    def build(self, books):
+        """Build the index from (pk, title, author) of the books, newest first."""
+        with self._lock:
+            self._build(books)
+
+    def _build(self, books):
+        keys = {field: [] for field in self.FIELDS}
+        self._books = OrderedDict()
+        for pk, title, author in books:
+            self._books[pk] = f"{title}{SEPARATOR}{author}"
+            keys["title"].append(f"{normalize_book_key(title)}{SEPARATOR}{pk}")
+            keys["author"].append(f"{normalize_book_key(author)}{SEPARATOR}{pk}")
+        for field_keys in keys.values():
+            field_keys.sort()
+        self._keys = keys
+        self._max_pk = max(self._books, default=0)
+        self._loaded = True
+        self._checked = self.clock()
+
+    def _remove_keys(self, pk):
+        title, author = self._books[pk].split(SEPARATOR)
+        for field, value in zip(self.FIELDS, (title, author)):
+            field_keys = self._keys[field]
+            key = f"{normalize_book_key(value)}{SEPARATOR}{pk}"
+            i = bisect_left(field_keys, key)
+            if i < len(field_keys) and field_keys[i] == key:
+                del field_keys[i]
+
+    def _add(self, pk, title, author):
+        if pk in self._books:
+            self._remove_keys(pk)
+            self._books[pk] = f"{title}{SEPARATOR}{author}"
+        else:
+            if len(self._books) >= self._max_books():
+                oldest = next(reversed(self._books))
+                if oldest > pk:
+                    return  # older than every book the index holds
+                self._remove_keys(oldest)
+                del self._books[oldest]
+            self._books[pk] = f"{title}{SEPARATOR}{author}"
+            self._books.move_to_end(pk, last=False)
+        insort(self._keys["title"], f"{normalize_book_key(title)}{SEPARATOR}{pk}")
+        insort(self._keys["author"], f"{normalize_book_key(author)}{SEPARATOR}{pk}")
+        self._max_pk = max(self._max_pk, pk)
+
+    def add(self, pk, title, author):
+        with self._lock:
+            if self._loaded:
+                self._add(pk, title, author)
+            # else picked up when the index is built
+
+    def remove(self, pk):
+        with self._lock:
+            if self._loaded and pk in self._books:
+                self._remove_keys(pk)
+                del self._books[pk]
+
+    def publish_change(self):
+        """
+        Tell the indexes of the other workers that a book changed or was deleted, which they cannot
+        tell from the pks; also after queryset updates and deletes, which send no signals.
+        """
+        cache.add(VERSION_KEY, 0, None)
+        try:
+            version = cache.incr(VERSION_KEY)
+        except ValueError:
+            return
+        with self._lock:
+            # this index has the change already, unless another change came in between
+            if self._version == version - 1:
+                self._version = version
+
+    def search(self, prefix, field="title", limit=10):
+        prefix = normalize_book_key(prefix)
+        if not prefix:
+            return []
+        self._ensure_fresh()
+
+        results = []
+        with self._lock:
+            field_keys = self._keys[field]
+            i = bisect_left(field_keys, prefix)
+            while i < len(field_keys) and len(results) < limit and field_keys[i].startswith(prefix):
+                pk = int(field_keys[i].rsplit(SEPARATOR, 1)[1])
+                title, author = self._books[pk].split(SEPARATOR)
+                results.append({"pk": pk, "title": title, "author": author})
+                i += 1
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._loaded = False
+            self._keys = {field: [] for field in self.FIELDS}
+            self._books = OrderedDict()
+            self._version = None
+            self._max_pk = 0
+
+
+book_index = BookPrefixIndex()
@@ -0,0 +1,86 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .caching import bump_club_versions
+from .memberships import invalidate_user_clubs
+from .models import Book, Review, BookClub, BookClubMembers, BookClubBooks
+from .search import book_index
+
+
+def _clubs_of_member(member_id):
+    return Q(pk__in=BookClubMembers.objects.filter(member_id=member_id).values("book_club"))
+
+
+@receiver([post_save, post_delete], sender=BookClubBooks)
+def bump_club_of_book(sender, instance, **kwargs):
+    bump_club_versions(BookClub.objects.filter(pk=instance.book_club_id))
+
+
+@receiver([post_save, post_delete], sender=BookClubMembers)
+def bump_clubs_of_membership(sender, instance, **kwargs):
+    # the club dropdown on every club page of the member changes as well
+    bump_club_versions(BookClub.objects.filter(Q(pk=instance.book_club_id) | _clubs_of_member(instance.member_id)))
+
+
+@receiver([post_save, post_delete], sender=BookClubMembers)
+def invalidate_clubs_of_member(sender, instance, **kwargs):
+    invalidate_user_clubs([instance.member_id])
+
+
+@receiver(post_save, sender=BookClub)
+def invalidate_clubs_of_members(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_user_clubs(BookClubMembers.objects.filter(book_club=instance).values_list("member_id", flat=True))
+
+
+@receiver(post_save, sender=BookClub)
+def bump_clubs_sharing_members(sender, instance, created, **kwargs):
+    # the club name shows up in the club dropdown of the other clubs of its members
+    if created:
+        return
+    members = BookClubMembers.objects.filter(book_club=instance).values("member")
+    bump_club_versions(
+        BookClub.objects.filter(
+            pk__in=BookClubMembers.objects.filter(member__in=members).values("book_club")
+        ).exclude(pk=instance.pk)
+    )
+
+
+@receiver([post_save, post_delete], sender=Book)
+def bump_clubs_of_book(sender, instance, **kwargs):
+    bump_club_versions(
+        BookClub.objects.filter(pk__in=BookClubBooks.objects.filter(book=instance).values("book_club"))
+    )
+
+
+@receiver(post_save, sender=Book)
+def index_book(sender, instance, created, **kwargs):
+    book_index.add(instance.pk, instance.title, instance.author)
+    # the other workers find new books by their pk
+    if not created:
+        transaction.on_commit(book_index.publish_change)
+
+
+@receiver(post_delete, sender=Book)
+def unindex_book(sender, instance, **kwargs):
+    book_index.remove(instance.pk)
+    transaction.on_commit(book_index.publish_change)
+
+
+@receiver([post_save, post_delete], sender=Review)
+def bump_clubs_of_review(sender, instance, **kwargs):
+    bump_club_versions(
+        BookClub.objects.filter(
+            pk__in=BookClubBooks.objects.filter(book_id=instance.book_id).values("book_club")
+        ).filter(_clubs_of_member(instance.user_id))
+    )
+
+
+@receiver(post_save, sender=User)
+def bump_clubs_of_user(sender, instance, created, update_fields=None, **kwargs):
+    # usernames are part of the club pages; logging in only touches last_login
+    if created or update_fields == frozenset({"last_login"}):
+        return
+    bump_club_versions(BookClub.objects.filter(_clubs_of_member(instance.pk)))
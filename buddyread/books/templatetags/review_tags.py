@@ -1,21 +1,29 @@
 from django.utils.safestring import mark_safe
 
 from django import template
+from books.models import Review
 
 register = template.Library()
 
 @register.filter
 def stars(score):
-    if score == "DNF":
-        return "DNF"
-
-    try:
-        value = float(score)
-    except ValueError:
+    """Render a score in half points (0 is DNF), or a score label such as '3.5', as stars."""
+    if score is None:
         return ""
 
-    full_stars = int(value)
-    half_star = 1 if value % 1 >= 0.5 else 0
+    if isinstance(score, str):
+        if score == "DNF":
+            return "DNF"
+        try:
+            half_points = float(score) * 2
+        except ValueError:
+            return ""
+    else:
+        if score == Review.DNF:
+            return "DNF"
+        half_points = score
+
+    full_stars, half_star = divmod(round(half_points), 2)
     empty_stars = 5 - full_stars - half_star
 
     html = []
@@ -0,0 +1,138 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+import books.models as books_models
+
+
+SCALES = {
+    "small": {"books": 3, "members": 2, "reviews": 4},
+    "large": {"books": 150, "members": 60, "reviews": 300},
+}
+
+
+def _seed_club(name, books, members, reviews):
+    book_club = books_models.BookClub.objects.create(name=name)
+    users = get_user_model().objects.bulk_create(
+        get_user_model()(username=f"{book_club.slug}-member-{i}", password="!")
+        for i in range(members)
+    )
+    books_models.BookClubMembers.objects.bulk_create(
+        books_models.BookClubMembers(book_club=book_club, member=user) for user in users
+    )
+    club_books = books_models.Book.objects.bulk_create(
+        books_models.Book(
+            title=f"{name} title {i}",
+            author=f"{name} author {i}",
+            title_key=books_models.normalize_book_key(f"{name} title {i}"),
+            author_key=books_models.normalize_book_key(f"{name} author {i}"),
+        )
+        for i in range(books)
+    )
+    books_models.BookClubBooks.objects.bulk_create(
+        books_models.BookClubBooks(book_club=book_club, book=book, selected_by=users[i % members])
+        for i, book in enumerate(club_books)
+    )
+    club_reviews = books_models.Review.objects.bulk_create(
+        books_models.Review(user=users[i % members], book=club_books[i // members], score=8)
+        for i in range(reviews)
+    )
+    return {
+        "club": book_club,
+        "book": club_books[0],
+        "review": club_reviews[0],
+        "user": users[0],
+    }
+
+
+ADMIN_PAGES = {
+    "book_changelist": lambda seeded: reverse("admin:books_book_changelist"),
+    "book_search": lambda seeded: reverse("admin:books_book_changelist") + "?q=Admin%20Large",
+    "book_change": lambda seeded: reverse("admin:books_book_change", args=[seeded["book"].pk]),
+    "book_add": lambda seeded: reverse("admin:books_book_add"),
+    "review_changelist": lambda seeded: reverse("admin:books_review_changelist"),
+    "review_search": lambda seeded: reverse("admin:books_review_changelist") + "?q=admin-large",
+    "review_change": lambda seeded: reverse("admin:books_review_change", args=[seeded["review"].pk]),
+    "review_add": lambda seeded: reverse("admin:books_review_add"),
+    "club_changelist": lambda seeded: reverse("admin:books_bookclub_changelist"),
+    "club_change": lambda seeded: reverse("admin:books_bookclub_change", args=[seeded["club"].pk]),
+    "club_change_page_2": lambda seeded: (
+        reverse("admin:books_bookclub_change", args=[seeded["club"].pk]) + "?bookclubmembers_set-page=2"
+    ),
+    "club_add": lambda seeded: reverse("admin:books_bookclub_add"),
+    "user_changelist": lambda seeded: reverse("admin:auth_user_changelist"),
+    "user_search": lambda seeded: reverse("admin:auth_user_changelist") + "?q=admin",
+    "user_autocomplete": lambda seeded: (
+        reverse("admin:autocomplete") + "?app_label=books&model_name=review&field_name=user&term=admin"
+    ),
+}
+
+
+@pytest.fixture
+def seeded_clubs(db):
+    return {scale: _seed_club(f"Admin {scale}", **size) for scale, size in SCALES.items()}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("page", ADMIN_PAGES)
+def test_admin_page_query_count_does_not_grow_with_data(admin_client, seeded_clubs, page):
+    admin_client.get(ADMIN_PAGES[page](seeded_clubs["small"]))  # warms the session and content type caches
+    queries = {}
+    for scale in SCALES:
+        url = ADMIN_PAGES[page](seeded_clubs[scale])
+        with CaptureQueriesContext(connection) as captured:
+            response = admin_client.get(url)
+        assert response.status_code == 200
+        queries[scale] = len(captured)
+
+    assert queries["small"] == queries["large"], f"query count of {page} grows with the data: {queries}"
+
+
+@pytest.mark.django_db
+def test_admin_club_inlines_are_paginated(admin_client, seeded_clubs):
+    book_club = seeded_clubs["large"]["club"]
+    url = reverse("admin:books_bookclub_change", args=[book_club.pk])
+
+    response = admin_client.get(url)
+    formset = response.context["inline_admin_formsets"][0].formset
+    assert formset.page.paginator.count == 60
+    assert len(formset.initial_forms) == 25
+    assert "?bookclubmembers_set-page=2" in response.content.decode()
+
+    response = admin_client.get(url + "?bookclubmembers_set-page=3")
+    formset = response.context["inline_admin_formsets"][0].formset
+    assert len(formset.initial_forms) == 10
+
+
+@pytest.mark.django_db
+def test_admin_club_inline_renders_selected_member(admin_client, seeded_clubs):
+    seeded = seeded_clubs["small"]
+    response = admin_client.get(reverse("admin:books_bookclub_change", args=[seeded["club"].pk]))
+    assert f'<option value="{seeded["user"].pk}" selected>{seeded["user"].username}</option>' in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_admin_club_inline_saves_page(admin_client, seeded_clubs):
+    book_club = seeded_clubs["small"]["club"]
+    url = reverse("admin:books_bookclub_change", args=[book_club.pk])
+    response = admin_client.get(url)
+    data = {"name": book_club.name}
+    for inline_admin_formset in response.context["inline_admin_formsets"]:
+        formset = inline_admin_formset.formset
+        management = formset.management_form
+        data.update({management.add_prefix(name): value for name, value in management.initial.items()})
+        for form in formset.initial_forms:
+            data.update({form.add_prefix(name): form[name].value() for name in form.fields if form[name].value() is not None})
+    member_form = response.context["inline_admin_formsets"][0].formset.initial_forms[0]
+    data[member_form.add_prefix("is_mod")] = "on"
+
+    response = admin_client.post(url, data)
+    assert response.status_code == 302
+    assert books_models.BookClubMembers.objects.get(pk=member_form.instance.pk).is_mod
+
+
+@pytest.mark.django_db
+def test_admin_book_search_normalizes_term(admin_client, seeded_clubs):
+    response = admin_client.get(reverse("admin:books_book_changelist") + "?q=%20ADMIN%20%20small%20title")
+    assert response.context["cl"].result_count == 3
@@ -0,0 +1,92 @@
+import pytest
+from django.urls import reverse
+import books.models as books_models
+import books.pagination as books_pagination
+
+
+@pytest.fixture
+def club_with_books(django_user_model):
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+    user_2 = django_user_model.objects.create_user(username='user2', password='pwd')
+    user_3 = django_user_model.objects.create_user(username='user3', password='pwd')
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user)
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user_2)
+    club_books = []
+    for i in range(3):
+        book = books_models.Book.objects.create(title=f"Title {i}", author=f"Author {i}")
+        club_books.append(books_models.BookClubBooks.objects.create(book_club=book_club, book=book, selected_by=user))
+        books_models.Review.objects.create(user=user, book=book, score=7, comment="Comment")
+        books_models.Review.objects.create(user=user_3, book=book, score=2, comment="Not a member")
+    return user, book_club, club_books
+
+
+def test_api_club_books_requires_login(client):
+    response = client.get(reverse("api_club_books", kwargs={"club": "club_slug"}))
+    assert response.status_code == 401
+
+
+@pytest.mark.django_db
+def test_api_club_books_requires_membership(client, django_user_model, club_with_books):
+    user = django_user_model.objects.create_user(username='other', password='pwd')
+    _, book_club, _ = club_with_books
+    client.force_login(user)
+    response = client.get(reverse("api_club_books", kwargs={"club": book_club.slug}))
+    assert response.status_code == 403
+
+
+@pytest.mark.django_db
+def test_api_club_books_lists_books_with_member_reviews(client, club_with_books):
+    user, book_club, club_books = club_with_books
+    client.force_login(user)
+    response = client.get(reverse("api_club_books", kwargs={"club": book_club.slug}))
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["next_cursor"] is None
+    assert [book["id"] for book in data["results"]] == [b.book_id for b in reversed(club_books)]
+    assert data["results"][0]["selected_by"] == "user"
+    assert data["results"][0]["reviews"] == [{"user": "user", "score": "3.5", "comment": "Comment"}]
+
+
+@pytest.mark.django_db
+def test_api_club_books_supports_sparse_fieldsets(client, club_with_books):
+    user, book_club, _ = club_with_books
+    client.force_login(user)
+    response = client.get(
+        reverse("api_club_books", kwargs={"club": book_club.slug}),
+        data={"fields": "title,reviews.score"}
+    )
+    assert response.json()["results"][0] == {"title": "Title 2", "reviews": [{"score": "3.5"}]}
+
+    response = client.get(reverse("api_club_books", kwargs={"club": book_club.slug}), data={"fields": "isbn"})
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_api_club_books_paginates_in_fixed_queries(client, club_with_books, django_assert_num_queries, monkeypatch):
+    monkeypatch.setattr(books_pagination, "BOOKS_PAGE_SIZE", 2)
+    user, book_club, club_books = club_with_books
+    client.force_login(user)
+    url = reverse("api_club_books", kwargs={"club": book_club.slug})
+
+    # user, membership, page keys, books and reviews; the session is cached
+    with django_assert_num_queries(5):
+        data = client.get(url).json()
+    assert len(data["results"]) == 2
+
+    with django_assert_num_queries(5):
+        data = client.get(url, data={"cursor": data["next_cursor"]}).json()
+    assert [book["id"] for book in data["results"]] == [club_books[0].book_id]
+    assert data["next_cursor"] is None
+
+
+@pytest.mark.django_db
+def test_api_club_book_shows_single_book(client, club_with_books):
+    user, book_club, club_books = club_with_books
+    client.force_login(user)
+    response = client.get(reverse("api_club_book", kwargs={"club": book_club.slug, "book_pk": club_books[0].book_id}))
+    assert response.json()["title"] == "Title 0"
+
+    response = client.get(reverse("api_club_book", kwargs={"club": book_club.slug, "book_pk": 0}))
+    assert response.status_code == 404
@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+from django.urls import reverse
+import books.async_views as books_async_views
+import books.context_processors as books_context_processors
+import books.models as books_models
+import core.async_views as core_async_views
+
+
+pytestmark = pytest.mark.urls("buddyread.async_urls")
+
+
+@pytest.fixture
+def member(client, django_user_model):
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user)
+    client.force_login(user)
+    return user, book_club
+
+
+test_views = [
+    core_async_views.index,
+    books_async_views.choose_club,
+    books_async_views.books,
+    books_async_views.review,
+]
+@pytest.mark.parametrize("view", test_views)
+def test_async_views_are_coroutine_functions(view):
+    assert asyncio.iscoroutinefunction(view)
+
+
+def test_async_books_requires_login(client):
+    response = client.get(reverse("books", kwargs={"club": "club_slug"}))
+    assert response.status_code == 302
+    assert "/accounts/login/?next=" in response.url
+
+
+@pytest.mark.django_db
+def test_async_index_redirects_to_single_club(client, member):
+    _, book_club = member
+    response = client.get(reverse("index"))
+    assert response.url == reverse("books", kwargs={"club": book_club.slug})
+
+
+@pytest.mark.django_db
+def test_async_choose_club_shows_clubs_of_user(client, member):
+    user, book_club = member
+    book_club_2 = books_models.BookClub.objects.create(name="Bookclub 2")
+    books_models.BookClubMembers.objects.create(book_club=book_club_2, member=user)
+
+    response = client.get(reverse("choose_club"))
+    assert {membership.slug for membership in response.context["user_clubs"]} == {book_club.slug, book_club_2.slug}
+
+
+@pytest.mark.django_db
+def test_async_books_renders_and_supports_not_modified(client, member):
+    user, book_club = member
+    book = books_models.Book.objects.create(title="Title", author="Author")
+    books_models.BookClubBooks.objects.create(book_club=book_club, book=book, selected_by=user)
+
+    response = client.get(reverse("books", kwargs={"club": book_club.slug}))
+    assert response.status_code == 200
+    assert "Title" in response.content.decode()
+
+    response = client.get(
+        reverse("books", kwargs={"club": book_club.slug}),
+        HTTP_IF_NONE_MATCH=response.headers["ETag"]
+    )
+    assert response.status_code == 304
+
+
+@pytest.mark.django_db
+def test_async_books_requires_membership(client, member, django_user_model):
+    other = django_user_model.objects.create_user(username='other', password='pwd')
+    book_club_2 = books_models.BookClub.objects.create(name="Bookclub 2")
+    books_models.BookClubMembers.objects.create(book_club=book_club_2, member=other)
+
+    response = client.get(reverse("books", kwargs={"club": book_club_2.slug}))
+    assert response.status_code == 403
+    response = client.get(reverse("books", kwargs={"club": "unknown"}))
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_async_review_creates_and_updates_review(client, member):
+    user, book_club = member
+    book = books_models.Book.objects.create(title="Title", author="Author")
+    url = reverse("review", kwargs={"club": book_club.slug, "book_pk": book.pk})
+
+    response = client.post(url, data={"score": "3.5", "comment": "Comment"})
+    assert response.url == reverse("books", kwargs={"club": book_club.slug})
+    client.post(url, data={"score": "4", "comment": "Changed"})
+
+    review = books_models.Review.objects.get(user=user, book=book)
+    assert review.score == 8
+    assert review.comment == "Changed"
+    assert client.get(url).context["form"].initial["score"] == "4"
+
+
+@pytest.mark.django_db
+def test_async_views_pass_awaited_clubs_to_template(client, member, monkeypatch):
+    user, book_club = member
+    book = books_models.Book.objects.create(title="Title", author="Author")
+
+    def lazy_lookup(user):
+        raise AssertionError("the user_clubs context processor looked up the clubs")
+
+    monkeypatch.setattr(books_context_processors, "_user_clubs", lazy_lookup)
+    for url in (
+        reverse("choose_club"),
+        reverse("books", kwargs={"club": book_club.slug}),
+        reverse("review", kwargs={"club": book_club.slug, "book_pk": book.pk}),
+    ):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert [membership.slug for membership in response.context["user_clubs"]] == [book_club.slug]
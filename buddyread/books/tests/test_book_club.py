@@ -1,9 +1,16 @@
 import pytest
+from django.core.cache import cache
+from django.http import Http404
 from pytest_django.asserts import assertRedirects
 from django.template.defaultfilters import slugify
 from django.urls import reverse
 import books.models as books_models
+import books.decorators as books_decorators
 import books.forms as books_forms
+import books.memberships as books_memberships
+import books.pagination as books_pagination
+import books.search as books_search
+import books.templatetags.review_tags as review_tags
 
 
 test_urls = ["add_club", "choose_club"]
@@ -101,12 +108,12 @@ def test_choose_club_shows_only_clubs_of_user(client, django_user_model):
     response = client.get(reverse("choose_club"))
 
     context = response.context[-1]
-    assert 'book_clubs' in context
+    assert 'user_clubs' in context
 
-    book_clubs = context["book_clubs"]
-    assert len(book_clubs) == 2
-    assert book_club_1 in book_clubs
-    assert book_club_2 in book_clubs
+    user_clubs = context["user_clubs"]
+    assert len(user_clubs) == 2
+    assert book_club_1.slug in [membership.slug for membership in user_clubs]
+    assert book_club_2.slug in [membership.slug for membership in user_clubs]
 
 
 @pytest.mark.django_db
@@ -140,11 +147,11 @@ def test_books_main_page_is_ok(client, django_user_model):
     response = client.get(reverse("books", kwargs={"club": book_club.slug}))
 
     context = response.context[-1]
-    assert all(keyword in context for keyword in ["books", "club", "book_clubs"])
+    assert all(keyword in context for keyword in ["books", "club", "user_clubs"])
 
-    books, club, book_clubs = context["books"], context["club"], context["book_clubs"]
+    books, club, user_clubs = context["books"], context["club"], context["user_clubs"]
     assert club == book_club
-    assert len(book_clubs) == 0  # user is member of exactly one club: book club is not displayed
+    assert len(user_clubs) == 1  # user is member of exactly one club: no club switcher is displayed
 
     # assert that only books of book club are displayed
     assert books.count() == 2
@@ -257,4 +264,488 @@ def test_user_not_allowed_to_review_without_membership(client, django_user_model
 
     client.login(username=username, password=password)
     response = client.get(reverse("review", kwargs={"club": book_club_2.slug, "book_pk": book.pk}))
-    assert response.status_code == 403
\ No newline at end of file
+    assert response.status_code == 403
+
+@pytest.mark.django_db
+def test_books_main_page_is_paginated(client, django_user_model, monkeypatch):
+    monkeypatch.setattr(books_pagination, "BOOKS_PAGE_SIZE", 2)
+    username = 'user'
+    password = 'pwd'
+    user = django_user_model.objects.create_user(username=username, password=password)
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user)
+    club_books = [
+        books_models.BookClubBooks.objects.create(
+            book_club=book_club,
+            book=books_models.Book.objects.create(title=f"Title {i}", author=f"Author {i}")
+        )
+        for i in range(5)
+    ]
+
+    client.login(username=username, password=password)
+    response = client.get(reverse("books", kwargs={"club": book_club.slug}))
+    context = response.context[-1]
+    assert list(context["books"]) == [club_books[4], club_books[3]]
+    assert context["page"].next_cursor is not None
+
+    response = client.get(
+        reverse("books_page", kwargs={"club": book_club.slug}),
+        data={"cursor": context["page"].next_cursor}
+    )
+    assert 'books/book_list_page.html' in [t.name for t in response.templates]
+    context = response.context
+    assert list(context["books"]) == [club_books[2], club_books[1]]
+
+    response = client.get(
+        reverse("books_page", kwargs={"club": book_club.slug}),
+        data={"cursor": context["page"].next_cursor}
+    )
+    context = response.context
+    assert list(context["books"]) == [club_books[0]]
+    assert context["page"].next_cursor is None
+
+
+@pytest.mark.django_db
+def test_books_page_costs_the_same_for_every_page(client, django_user_model, django_assert_num_queries, monkeypatch):
+    monkeypatch.setattr(books_pagination, "BOOKS_PAGE_SIZE", 2)
+    username = 'user'
+    password = 'pwd'
+    user = django_user_model.objects.create_user(username=username, password=password)
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user)
+    for i in range(6):
+        book = books_models.Book.objects.create(title=f"Title {i}", author=f"Author {i}")
+        books_models.BookClubBooks.objects.create(book_club=book_club, book=book, selected_by=user)
+        books_models.Review.objects.create(user=user, book=book, score='3')
+
+    client.login(username=username, password=password)
+    url = reverse("books_page", kwargs={"club": book_club.slug})
+    response = client.get(url)
+    cursor = response.context["page"].next_cursor
+    cache.clear()
+    client.session.save()  # sessions are cached, put it back
+
+    with django_assert_num_queries(5):
+        client.get(url)
+    with django_assert_num_queries(5):
+        client.get(url, data={"cursor": cursor})
+
+
+@pytest.mark.django_db
+def test_books_page_rejects_invalid_cursor(client, django_user_model):
+    username = 'user'
+    password = 'pwd'
+    user = django_user_model.objects.create_user(username=username, password=password)
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user)
+
+    client.login(username=username, password=password)
+    response = client.get(reverse("books_page", kwargs={"club": book_club.slug}), data={"cursor": "invalid"})
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_books_main_page_warm_cache_does_no_book_queries(client, django_user_model, django_assert_num_queries):
+    username = 'user'
+    password = 'pwd'
+    user = django_user_model.objects.create_user(username=username, password=password)
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user)
+    book = books_models.Book.objects.create(title="Title", author="Author")
+    books_models.BookClubBooks.objects.create(book_club=book_club, book=book, selected_by=user)
+    books_models.Review.objects.create(user=user, book=book, score='3')
+
+    client.login(username=username, password=password)
+    url = reverse("books", kwargs={"club": book_club.slug})
+    client.get(url)
+
+    # user and membership only: the club switcher comes from the cached clubs of the user
+    with django_assert_num_queries(2) as captured:
+        response = client.get(url)
+    assert "Title" in response.content.decode()
+    assert not any(
+        table in query["sql"]
+        for query in captured.captured_queries
+        for table in ["books_book\"", "books_bookclubbooks", "books_review"]
+    )
+
+
+test_changes = ["review", "book", "club_book", "member"]
+@pytest.mark.parametrize("change", test_changes)
+@pytest.mark.django_db
+def test_books_main_page_cache_is_invalidated(client, django_user_model, change):
+    username = 'user'
+    password = 'pwd'
+    user = django_user_model.objects.create_user(username=username, password=password)
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user)
+    book = books_models.Book.objects.create(title="Title", author="Author")
+    books_models.BookClubBooks.objects.create(book_club=book_club, book=book, selected_by=user)
+    review = books_models.Review.objects.create(user=user, book=book, score='3', comment="Comment")
+
+    client.login(username=username, password=password)
+    url = reverse("books", kwargs={"club": book_club.slug})
+    client.get(url)
+
+    if change == "review":
+        review.comment = "Changed"
+        review.save()
+    elif change == "book":
+        book.title = "Changed"
+        book.save()
+    elif change == "club_book":
+        books_models.BookClubBooks.objects.create(
+            book_club=book_club,
+            book=books_models.Book.objects.create(title="Changed", author="Author")
+        )
+    else:
+        user_2 = django_user_model.objects.create_user(username="user2", password=password)
+        books_models.Review.objects.create(user=user_2, book=book, score='3', comment="Changed")
+        books_models.BookClubMembers.objects.create(book_club=book_club, member=user_2)
+
+    response = client.get(url)
+    assert "Changed" in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_resolve_club_membership_attaches_club_and_membership(rf, django_user_model, django_assert_num_queries):
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    membership = books_models.BookClubMembers.objects.create(book_club=book_club, member=user)
+    request = rf.get("/")
+    request.user = user
+
+    with django_assert_num_queries(1):
+        assert books_decorators.resolve_club_membership(request, book_club.slug) == membership
+        assert request.club == book_club
+        assert request.membership == membership
+
+
+@pytest.mark.django_db
+def test_resolve_club_membership_of_non_member(rf, django_user_model):
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    request = rf.get("/")
+    request.user = user
+
+    assert books_decorators.resolve_club_membership(request, book_club.slug) is None
+    assert request.club == book_club
+    assert request.membership is None
+
+    with pytest.raises(Http404):
+        books_decorators.resolve_club_membership(request, "unknown-club")
+
+
+@pytest.mark.django_db
+def test_form_review_stores_score_in_half_points():
+    form = books_forms.ReviewForm(data={"score": "3.5", "comment": ""})
+    assert form.is_valid()
+    assert form.cleaned_data["score"] == 7
+
+    form = books_forms.ReviewForm(data={"score": "DNF", "comment": ""})
+    assert form.is_valid()
+    assert form.cleaned_data["score"] == books_models.Review.DNF
+
+
+test_scores = [(7, 3, 1), ("3.5", 3, 1), (10, 5, 0), (6.4, 3, 0)]
+@pytest.mark.parametrize("score, full_stars, half_stars", test_scores)
+def test_stars_filter_renders_half_points_and_labels(score, full_stars, half_stars):
+    html = review_tags.stars(score)
+    assert html.count("bi-star-fill") == full_stars
+    assert html.count("bi-star-half") == half_stars
+
+
+def test_stars_filter_renders_dnf():
+    assert review_tags.stars(books_models.Review.DNF) == "DNF"
+    assert review_tags.stars("DNF") == "DNF"
+
+
+@pytest.mark.django_db
+def test_club_books_with_review_stats_only_counts_club_members(django_user_model):
+    user = django_user_model.objects.create_user(username="user", password="pwd")
+    user_2 = django_user_model.objects.create_user(username="user2", password="pwd")
+    user_3 = django_user_model.objects.create_user(username="user3", password="pwd")
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user)
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user_2)
+    book = books_models.Book.objects.create(title="Title", author="Author")
+    books_models.BookClubBooks.objects.create(book_club=book_club, book=book)
+    books_models.Review.objects.create(user=user, book=book, score=8)
+    books_models.Review.objects.create(user=user_2, book=book, score=books_models.Review.DNF)
+    books_models.Review.objects.create(user=user_3, book=book, score=2)
+
+    club_book = books_models.BookClubBooks.objects.filter(book_club=book_club).with_review_stats().get()
+    assert club_book.average_score == 8
+    assert club_book.review_count == 2
+
+
+@pytest.mark.django_db
+def test_model_book_creates_normalized_keys_on_save():
+    book = books_models.Book.objects.create(title="  The   Hobbit ", author="J.R.R. TOLKIEN")
+    assert book.title_key == "the hobbit"
+    assert book.author_key == "j.r.r. tolkien"
+
+
+@pytest.mark.django_db
+def test_model_book_key_fits_column_when_normalizing_lengthens_title():
+    book = books_models.Book(title="ß" * 255, author="ﬁ" * 255)
+    book.full_clean()
+    book.save()
+    assert book.title_key == "s" * 255
+    assert book.author_key == "fi" * 127 + "f"
+
+
+@pytest.mark.django_db
+def test_add_book_reuses_book_with_same_normalized_title_and_author(client, django_user_model):
+    username = 'user'
+    password = 'pwd'
+    user = django_user_model.objects.create_user(username=username, password=password)
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user)
+    book = books_models.Book.objects.create(title="The Hobbit", author="Tolkien")
+
+    client.login(username=username, password=password)
+    client.post(
+        reverse("add_book", kwargs={"club": book_club.slug}),
+        data={"title": "the hobbit ", "author": "tolkien"}
+    )
+
+    assert books_models.Book.objects.count() == 1
+    assert books_models.BookClubBooks.objects.get(book_club=book_club).book == book
+
+
+@pytest.mark.django_db
+def test_book_autocomplete_finds_books_by_prefix(client, django_user_model, django_assert_num_queries):
+    username = 'user'
+    password = 'pwd'
+    django_user_model.objects.create_user(username=username, password=password)
+    books_models.Book.objects.create(title="The Hobbit", author="Tolkien")
+    books_models.Book.objects.create(title="The Silmarillion", author="Tolkien")
+    books_models.Book.objects.create(title="Dune", author="Herbert")
+
+    client.login(username=username, password=password)
+    url = reverse("book_autocomplete")
+    response = client.get(url, data={"q": "the h"})
+    assert [book["title"] for book in response.json()["results"]] == ["The Hobbit"]
+
+    books_models.Book.objects.create(title="The Hunger Games", author="Collins")
+    books_models.Book.objects.get(title="Dune").delete()
+
+    # user only: the session is cached and the index is not backed by the database
+    with django_assert_num_queries(1):
+        response = client.get(url, data={"q": "The H"})
+    assert [book["title"] for book in response.json()["results"]] == ["The Hobbit", "The Hunger Games"]
+
+    response = client.get(url, data={"q": "tolk", "field": "author"})
+    assert len(response.json()["results"]) == 2
+    response = client.get(url, data={"q": "herb", "field": "author"})
+    assert response.json()["results"] == []
+
+
+def test_book_prefix_index_holds_at_most_max_books():
+    index = books_search.BookPrefixIndex(max_books=2)
+    index.build(iter([(2, "B", "Y"), (1, "A", "X")]))
+    index.add(3, "C", "Z")
+    # the oldest book makes room for the new one
+    assert index.search("a") == []
+    assert index.search("c") == [{"pk": 3, "title": "C", "author": "Z"}]
+    index.add(2, "Bb", "Y")
+    assert index.search("b") == [{"pk": 2, "title": "Bb", "author": "Y"}]
+    index.add(1, "A", "X")
+    assert index.search("a") == []
+
+
+@pytest.mark.django_db
+def test_book_prefix_index_picks_up_changes_of_other_workers(django_assert_num_queries):
+    class Clock:
+        now = 0.0
+
+        def __call__(self):
+            return self.now
+
+    clock = Clock()
+    index = books_search.BookPrefixIndex(refresh_seconds=30, clock=clock)
+    hobbit = books_models.Book.objects.create(title="The Hobbit", author="Tolkien")
+    assert [book["title"] for book in index.search("the")] == ["The Hobbit"]
+
+    # no signals: bulk_create, and a queryset update published by another worker
+    books_models.Book.objects.bulk_create([
+        books_models.Book(title="The Hunger Games", author="Collins", title_key="the hunger games", author_key="collins")
+    ])
+    books_models.Book.objects.filter(pk=hobbit.pk).update(title="There and Back Again")
+    assert [book["title"] for book in index.search("the")] == ["The Hobbit"]
+
+    clock.now = 30
+    assert [book["title"] for book in index.search("the")] == ["The Hobbit", "The Hunger Games"]
+    books_search.BookPrefixIndex().publish_change()
+    clock.now = 60
+    assert [book["title"] for book in index.search("the")] == ["The Hunger Games", "There and Back Again"]
+
+    # a change it has already applied itself only costs the check for new books
+    index.add(hobbit.pk, "The Hobbit", "Tolkien")
+    index.publish_change()
+    clock.now = 90
+    with django_assert_num_queries(1):
+        assert "The Hobbit" in [book["title"] for book in index.search("the")]
+
+
+test_urls = ["books", "review"]
+@pytest.mark.parametrize("url", test_urls)
+@pytest.mark.django_db
+def test_unchanged_club_page_returns_not_modified(client, django_user_model, django_assert_num_queries, url):
+    username = 'user'
+    password = 'pwd'
+    user = django_user_model.objects.create_user(username=username, password=password)
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user)
+    book = books_models.Book.objects.create(title="Title", author="Author")
+    books_models.BookClubBooks.objects.create(book_club=book_club, book=book)
+
+    client.login(username=username, password=password)
+    kwargs = {"club": book_club.slug, "book_pk": book.pk} if url == "review" else {"club": book_club.slug}
+    response = client.get(reverse(url, kwargs=kwargs))
+    etag = response.headers["ETag"]
+    assert response.headers["Last-Modified"]
+
+    # user and membership only, the session is cached
+    with django_assert_num_queries(2):
+        response = client.get(reverse(url, kwargs=kwargs), HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+    books_models.Review.objects.create(user=user, book=book, score=6)
+    response = client.get(reverse(url, kwargs=kwargs), HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+@pytest.mark.django_db
+def test_model_book_club_version_increases_on_save_and_on_changes(django_user_model):
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    stale_book_club = books_models.BookClub.objects.get(pk=book_club.pk)
+    assert book_club.version == 1
+
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user)
+    book_club.refresh_from_db()
+    assert book_club.version == 2
+
+    stale_book_club.name = "Bookclub renamed"
+    stale_book_club.save()
+    assert stale_book_club.version == 3
+
+
+@pytest.mark.django_db
+def test_model_book_club_children_reference_integer_key(django_user_model):
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    membership = books_models.BookClubMembers.objects.create(book_club=book_club, member=user)
+    assert isinstance(book_club.pk, int)
+    assert membership.book_club_id == book_club.pk
+    # urls keep using the slug
+    assert books_models.BookClub.objects.get(slug="bookclub") == book_club
+
+
+@pytest.mark.django_db
+def test_club_views_have_cache_policy(client, django_user_model):
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user)
+    client.login(username='user', password='pwd')
+
+    for url in [reverse("books", kwargs={"club": book_club.slug}), reverse("books_page", kwargs={"club": book_club.slug})]:
+        cache_control = client.get(url).headers["Cache-Control"]
+        assert "private" in cache_control
+        assert "no-cache" in cache_control
+
+    cache_control = client.get(reverse("book_autocomplete"), data={"q": "a"}).headers["Cache-Control"]
+    assert "private" in cache_control
+    assert "max-age=60" in cache_control
+
+
+@pytest.mark.django_db
+def test_user_clubs_are_cached_and_invalidated(
+    client, django_user_model, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user, is_mod=True)
+
+    with django_assert_num_queries(1):
+        assert books_memberships.user_clubs(user) == [(book_club.slug, "Bookclub", True)]
+    with django_assert_num_queries(0):
+        books_memberships.user_clubs(user)
+
+    book_club_2 = books_models.BookClub.objects.create(name="Another club")
+    with django_capture_on_commit_callbacks(execute=True):
+        membership = books_models.BookClubMembers.objects.create(book_club=book_club_2, member=user)
+        # a read before the commit does not outlive it in the cache
+        books_memberships.user_clubs(user)
+    assert [club.name for club in books_memberships.user_clubs(user)] == ["Another club", "Bookclub"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        book_club_2.name = "Renamed club"
+        book_club_2.save()
+    assert [club.name for club in books_memberships.user_clubs(user)] == ["Bookclub", "Renamed club"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        membership.delete()
+    assert [club.name for club in books_memberships.user_clubs(user)] == ["Bookclub"]
+
+
+@pytest.mark.django_db
+def test_user_clubs_are_not_cached_without_shared_cache(django_user_model, django_assert_num_queries, settings):
+    settings.CACHE_SHARED = False
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user)
+    books_memberships.user_clubs(user)
+
+    # another worker's change is seen at once
+    books_models.BookClubMembers.objects.filter(member=user).delete()
+    with django_assert_num_queries(1):
+        assert books_memberships.user_clubs(user) == []
+
+
+@pytest.mark.django_db
+def test_index_and_switchers_cost_no_club_queries_on_warm_cache(client, django_user_model, django_assert_num_queries):
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+    for name in ["Bookclub", "Bookclub 2"]:
+        book_club = books_models.BookClub.objects.create(name=name)
+        books_models.BookClubMembers.objects.create(book_club=book_club, member=user)
+    client.login(username='user', password='pwd')
+    client.get(reverse("index"))
+
+    # the user only
+    with django_assert_num_queries(1):
+        assert client.get(reverse("index")).url == reverse("choose_club")
+    with django_assert_num_queries(1):
+        response = client.get(reverse("choose_club"))
+    assert reverse("books", kwargs={"club": "bookclub-2"}) in response.content.decode()
+
+
+@pytest.mark.nplusone
+@pytest.mark.parametrize("url", ["books", "review", "choose_club", "club_overview", "club_custom_admin"])
+@pytest.mark.django_db
+def test_club_pages_run_no_query_per_row(client, django_user_model, url):
+    users = [django_user_model.objects.create_user(username=f'user-{i}', password='pwd') for i in range(6)]
+    user = users[0]
+    clubs = [books_models.BookClub.objects.create(name=f"Bookclub {i}") for i in range(6)]
+    for book_club in clubs:
+        for member in users:
+            books_models.BookClubMembers.objects.create(book_club=book_club, member=member, is_mod=member == user)
+    book_club = clubs[0]
+    for i in range(6):
+        book = books_models.Book.objects.create(title=f"Title {i}", author=f"Author {i}")
+        books_models.BookClubBooks.objects.create(book_club=book_club, book=book, selected_by=users[i])
+        for member in users:
+            books_models.Review.objects.create(user=member, book=book, score=6, comment="Mooi")
+    client.login(username='user-0', password='pwd')
+
+    kwargs = {
+        "books": {"club": book_club.slug},
+        "review": {"club": book_club.slug, "book_pk": book.pk},
+        "club_custom_admin": {"club": book_club.slug},
+    }.get(url, {})
+    # strict mode raises on a query that repeats for every member, book, review or club
+    response = client.get(reverse(url, kwargs=kwargs))
+    assert response.status_code == 200
@@ -1,11 +1,16 @@
 from datetime import datetime, timedelta
+from io import StringIO
+import time
 import pytest
 from pytest_django.asserts import assertRedirects
+from django.core import signing
+from django.core.management import call_command
 from django.template.defaultfilters import slugify
 from django.urls import reverse
 from django.utils import timezone
 import books.models as books_models
 import books.forms as books_forms
+import books.invites as books_invites
 
 
 def test_url_to_visit_club_overview_exists():
@@ -759,7 +764,8 @@ def test_invite_member_as_mod_is_ok(client, django_user_model):
     assert response.status_code == 200
 
 @pytest.mark.django_db
-def test_invite_member_generates_url(client, django_user_model):
+def test_invite_member_generates_url(client, django_user_model, settings):
+    settings.INVITE_MODE = "uuid"
     username = 'user'
     password = 'pwd'
     user = django_user_model.objects.create_user(username=username, password=password)
@@ -779,7 +785,8 @@ def test_invite_member_generates_url(client, django_user_model):
 
 
 @pytest.mark.django_db
-def test_invite_member_contains_correct_context(client, django_user_model):
+def test_invite_member_contains_correct_context(client, django_user_model, settings):
+    settings.INVITE_MODE = "uuid"
     username = 'user'
     password = 'pwd'
     user = django_user_model.objects.create_user(username=username, password=password)
@@ -923,3 +930,248 @@ def test_sign_up_form_raises_error_if_password_repeat_incorrect(django_user_mode
     }
     form = books_forms.InviteMemberForm(data=data)
     assert not form.is_valid()
+
+
+@pytest.mark.django_db
+def test_invite_member_reuses_open_invite(client, django_user_model, settings):
+    settings.INVITE_MODE = "uuid"
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user, is_mod=True)
+    client.login(username='user', password='pwd')
+    url = reverse('invite_member', kwargs={"club": book_club.slug})
+
+    first = client.get(url).context['invite_url']
+    assert client.get(url).context['invite_url'] == first
+    assert books_models.InviteURL.objects.count() == 1
+
+    books_models.InviteURL.objects.update(accepted=True)
+    assert client.get(url).context['invite_url'] != first
+    assert books_models.InviteURL.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_invite_member_does_not_reuse_expired_invite(client, django_user_model, settings):
+    settings.INVITE_MODE = "uuid"
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user, is_mod=True)
+    invite_url = books_models.InviteURL.objects.create(book_club=book_club)
+    books_models.InviteURL.objects.update(creation_date=timezone.now() - timedelta(days=1))
+    client.login(username='user', password='pwd')
+
+    response = client.get(reverse('invite_member', kwargs={"club": book_club.slug}))
+    assert str(invite_url.uuid) not in response.context['invite_url']
+
+
+@pytest.mark.django_db
+def test_invite_member_post_creates_batch_in_one_query(client, django_user_model, django_assert_num_queries, settings):
+    settings.INVITE_MODE = "uuid"
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user, is_mod=True)
+    client.login(username='user', password='pwd')
+
+    with django_assert_num_queries(1):
+        invites = books_models.InviteURL.objects.create_batch(book_club, 5)
+    assert len(invites) == 5
+
+    response = client.post(reverse('invite_member', kwargs={"club": book_club.slug}), {"count": 3})
+    assert len(response.context['invite_urls']) == 3
+    assert books_models.InviteURL.objects.filter(book_club=book_club).count() == 8
+
+
+test_counts = ["0", "51", "veel"]
+@pytest.mark.parametrize("count", test_counts)
+@pytest.mark.django_db
+def test_invite_member_post_with_invalid_count_shows_error(client, django_user_model, settings, count):
+    settings.INVITE_MODE = "uuid"
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user, is_mod=True)
+    client.login(username='user', password='pwd')
+
+    response = client.post(reverse('invite_member', kwargs={"club": book_club.slug}), {"count": count})
+    assert response.status_code == 200
+    assert response.context['form'].errors['count']
+    assert response.context['invite_urls'] == []
+    assert not books_models.InviteURL.objects.exists()
+
+
+@pytest.mark.django_db
+def test_visit_sign_up_of_removed_invite_is_not_found(client):
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    url_uuid = books_models.InviteURL.objects.create(book_club=book_club).uuid
+    books_models.InviteURL.objects.filter(uuid=url_uuid).delete()
+    response = client.get(reverse('sign_up', kwargs={"url_uuid": url_uuid}))
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_sweep_invites_deletes_accepted_and_expired_invites():
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    book_club_2 = books_models.BookClub.objects.create(name="Bookclub 2")
+    books_models.InviteURL.objects.create_batch(book_club, 3)
+    books_models.InviteURL.objects.create_batch(book_club_2, 2)
+    books_models.InviteURL.objects.filter(book_club=book_club_2).update(accepted=True)
+    expired = books_models.InviteURL.objects.filter(book_club=book_club).first()
+    books_models.InviteURL.objects.filter(pk=expired.pk).update(creation_date=timezone.now() - timedelta(days=1))
+
+    call_command("sweep_invites", chunk_size=1, stdout=StringIO())
+
+    remaining = books_models.InviteURL.objects.all()
+    assert remaining.count() == 2
+    assert expired not in remaining
+    assert all(invite.book_club == book_club for invite in remaining)
+
+
+@pytest.mark.django_db
+def test_invite_member_issues_signed_token_without_row(client, django_user_model, settings):
+    settings.INVITE_MODE = "token"
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user, is_mod=True)
+    client.login(username='user', password='pwd')
+
+    response = client.post(reverse('invite_member', kwargs={"club": book_club.slug}), {"count": 3})
+    assert len(set(response.context['invite_urls'])) == 3
+    assert "/uitnodiging/token/" in response.context['invite_url']
+    assert not books_models.InviteURL.objects.exists()
+
+
+@pytest.mark.django_db
+def test_sign_up_token_creates_member_once(client, django_user_model):
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    url = reverse('sign_up_token', kwargs={"token": books_invites.issue_invite_token(book_club)})
+    assert client.get(url).status_code == 200
+
+    data = {"username": 'user', "password": 'pwd', "password_repeat": 'pwd'}
+    response = client.post(url, data)
+    assert response.url == reverse("index")
+    user = django_user_model.objects.get(username='user')
+    assert books_models.BookClubMembers.objects.filter(book_club=book_club, member=user, is_mod=False).exists()
+
+    assert client.get(url).status_code == 403
+    data["username"] = 'user-2'
+    assert client.post(url, data).status_code == 403
+    assert not django_user_model.objects.filter(username='user-2').exists()
+
+
+@pytest.mark.django_db
+def test_sign_up_token_rejects_expired_and_tampered_tokens(client, monkeypatch):
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    token = books_invites.issue_invite_token(book_club)
+
+    response = client.get(reverse('sign_up_token', kwargs={"token": token[:-1] + ("A" if token[-1] != "A" else "B")}))
+    assert response.status_code == 404
+
+    day_later = time.time() + timedelta(days=1, seconds=1).total_seconds()
+    monkeypatch.setattr(signing.time, "time", lambda: day_later)
+    response = client.get(reverse('sign_up_token', kwargs={"token": token}))
+    assert response.status_code == 403
+
+
+@pytest.mark.django_db
+def test_sign_up_token_failed_sign_up_does_not_use_nonce(client, django_user_model):
+    django_user_model.objects.create_user(username='user', password='pwd')
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    url = reverse('sign_up_token', kwargs={"token": books_invites.issue_invite_token(book_club)})
+
+    client.post(url, {"username": 'user', "password": 'pwd', "password_repeat": 'pwd'})
+    assert not books_models.RedeemedInvite.objects.exists()
+    assert client.get(url).status_code == 200
+
+
+@pytest.mark.django_db
+def test_sweep_invites_deletes_nonces_of_expired_tokens():
+    books_models.RedeemedInvite.objects.create(nonce="old")
+    books_models.RedeemedInvite.objects.create(nonce="new")
+    books_models.RedeemedInvite.objects.filter(nonce="old").update(redeemed_at=timezone.now() - timedelta(days=1))
+
+    call_command("sweep_invites", stdout=StringIO())
+    assert list(books_models.RedeemedInvite.objects.values_list("nonce", flat=True)) == ["new"]
+
+
+@pytest.fixture
+def club_with_mod(client, django_user_model):
+    mod = django_user_model.objects.create_user(username='user', password='pwd')
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=mod, is_mod=True)
+    client.login(username='user', password='pwd')
+    return mod, book_club
+
+
+@pytest.mark.django_db
+def test_club_counts_count_members_books_reviews_and_open_invites(client, django_user_model, club_with_mod, settings):
+    settings.INVITE_MODE = "uuid"
+    mod, book_club = club_with_mod
+    member = django_user_model.objects.create_user(username="member", password='pwd')
+    outsider = django_user_model.objects.create_user(username="outsider", password='pwd')
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=member)
+    book = books_models.Book.objects.create(title="Book 1", author="Author 1")
+    other_book = books_models.Book.objects.create(title="Book 2", author="Author 2")
+    books_models.BookClubBooks.objects.create(book_club=book_club, book=book, selected_by=mod)
+    books_models.Review.objects.create(user=mod, book=book, score=6)
+    books_models.Review.objects.create(user=member, book=book, score=8)
+    books_models.Review.objects.create(user=outsider, book=book, score=8)
+    books_models.Review.objects.create(user=member, book=other_book, score=8)
+    books_models.InviteURL.objects.create_batch(book_club, 3)
+    books_models.InviteURL.objects.filter(pk=books_models.InviteURL.objects.first().pk).update(accepted=True)
+
+    response = client.get(reverse('club_custom_admin', kwargs={"club": book_club.slug}))
+    assert response.context["counts"] == {
+        "member_count": 2, "book_count": 1, "review_count": 2, "open_invite_count": 2
+    }
+
+    response = client.get(reverse('club_overview'))
+    club = response.context["book_clubs"][0]
+    assert (club.member_count, club.book_count, club.review_count, club.open_invite_count) == (2, 1, 2, 2)
+
+
+@pytest.mark.django_db
+def test_club_counts_leave_out_invites_in_token_mode(client, club_with_mod, settings):
+    settings.INVITE_MODE = "token"
+    mod, book_club = club_with_mod
+
+    response = client.get(reverse('club_custom_admin', kwargs={"club": book_club.slug}))
+    assert "open_invite_count" not in response.context["counts"]
+    assert "open uitnodigingen" not in response.content.decode()
+
+    response = client.get(reverse('club_overview'))
+    assert "open uitnodigingen" not in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_club_custom_admin_searches_members_and_books(client, django_user_model, club_with_mod):
+    mod, book_club = club_with_mod
+    for name in ["anna", "bert", "annabel"]:
+        user = django_user_model.objects.create_user(username=name, password='pwd')
+        books_models.BookClubMembers.objects.create(book_club=book_club, member=user)
+    for title, author in [("Dune", "Herbert"), ("Emma", "Austen"), ("Persuasion", "Austen")]:
+        book = books_models.Book.objects.create(title=title, author=author)
+        books_models.BookClubBooks.objects.create(book_club=book_club, book=book)
+
+    url = reverse('club_custom_admin', kwargs={"club": book_club.slug})
+    response = client.get(url, data={"member_q": "ANNA", "book_q": "austen"})
+    assert [m.member.username for m in response.context["members"]] == ["anna", "annabel"]
+    assert [b.book.title for b in response.context["club_books"]] == ["Emma", "Persuasion"]
+    assert response.context["members"].paginator.count == 2
+
+
+@pytest.mark.django_db
+def test_club_custom_admin_pages_in_constant_queries(client, django_user_model, club_with_mod, django_assert_max_num_queries, monkeypatch):
+    monkeypatch.setattr("books.views.ADMIN_PAGE_SIZE", 5)
+    mod, book_club = club_with_mod
+    users = django_user_model.objects.bulk_create(
+        django_user_model(username=f"member-{i:02}", password="!") for i in range(12)
+    )
+    books_models.BookClubMembers.objects.bulk_create(
+        books_models.BookClubMembers(book_club=book_club, member=user) for user in users
+    )
+    url = reverse('club_custom_admin', kwargs={"club": book_club.slug})
+
+    with django_assert_max_num_queries(5):
+        response = client.get(url, data={"member_page": 3})
+    members = response.context["members"]
+    assert members.paginator.num_pages == 3
+    assert [m.member.username for m in members] == ["member-10", "member-11", "user"]
@@ -0,0 +1,204 @@
+from datetime import date
+from io import BytesIO, StringIO
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+import books.imports as books_imports
+import books.models as books_models
+
+
+HEADER = "Book Id,Title,Author,My Rating,Average Rating,Date Added,Exclusive Shelf,My Review\n"
+
+
+def _csv(*rows):
+    return (HEADER + "".join(f"{i},{row}\n" for i, row in enumerate(rows))).encode()
+
+
+def _history(count):
+    return _csv(*(f"Title {i},Author {i},{i % 6},3.9,2019/05/{i % 28 + 1:02},read," for i in range(count)))
+
+
+@pytest.fixture
+def mod_club(django_user_model):
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user, is_mod=True)
+    return user, book_club
+
+
+def test_url_to_import_books_exists():
+    try:
+        reverse('import_books', kwargs={"club": "bookclub"})
+    except Exception as exc:
+        pytest.fail(str(exc))
+
+
+@pytest.mark.django_db
+def test_import_books_requires_mod_perm(client, django_user_model):
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user, is_mod=False)
+    client.login(username='user', password='pwd')
+    response = client.get(reverse('import_books', kwargs={"club": book_club.slug}))
+    assert response.status_code == 403
+
+
+@pytest.mark.django_db
+def test_import_books_as_mod_is_ok(client, mod_club):
+    user, book_club = mod_club
+    client.login(username='user', password='pwd')
+    response = client.get(reverse('import_books', kwargs={"club": book_club.slug}))
+    assert response.status_code == 200
+    assert "username" not in response.context["form"].fields
+
+
+@pytest.mark.django_db
+def test_import_books_imports_history(client, mod_club):
+    user, book_club = mod_club
+    existing = books_models.Book.objects.create(title="The Hobbit", author="J.R.R. Tolkien")
+    books_models.Review.objects.create(user=user, book=existing, score=4)
+    upload = SimpleUploadedFile("goodreads.csv", _csv(
+        'the  hobbit,J.R.R. Tolkien,5,4.3,2015/01/02,read,',
+        'Dune,Frank Herbert,4,4.2,2016/03/04,read,"Zand<br/>overal"',
+        'Dune,Frank Herbert,3,4.2,2016/03/04,read,',
+        'Emma,Jane Austen,0,4.0,2017/05/06,read,',
+        'Ulysses,James Joyce,0,3.7,2018/07/08,to-read,',
+        ',Anonymous,3,3.0,2018/07/08,read,',
+    ))
+    client.login(username='user', password='pwd')
+
+    response = client.post(reverse('import_books', kwargs={"club": book_club.slug}), {"file": upload})
+    assert response.status_code == 200
+    result = response.context["result"]
+    assert (result.rows, result.skipped, result.books_created) == (6, 2, 2)
+    assert (result.club_books_created, result.reviews_created) == (3, 1)
+
+    assert books_models.Book.objects.count() == 3
+    club_books = {b.book.title: b for b in books_models.BookClubBooks.objects.filter(book_club=book_club).select_related("book")}
+    assert set(club_books) == {"The Hobbit", "Dune", "Emma"}
+    assert club_books["Dune"].date_added == date(2016, 3, 4)
+    assert club_books["Dune"].selected_by == user
+    # existing reviews are kept, the last rating of a book wins and unrated books get no review
+    reviews = {r.book.title: r for r in books_models.Review.objects.filter(user=user).select_related("book")}
+    assert reviews["The Hobbit"].score == 4
+    assert reviews["Dune"].score == 6
+    assert reviews["Dune"].comment is None
+    assert "Emma" not in reviews
+
+
+@pytest.mark.django_db
+def test_import_books_reviews_only_as_the_moderator(client, mod_club, django_user_model):
+    user, book_club = mod_club
+    member = django_user_model.objects.create_user(username='member', password='pwd')
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=member)
+    client.login(username='user', password='pwd')
+    upload = SimpleUploadedFile("goodreads.csv", _history(3))
+    client.post(reverse('import_books', kwargs={"club": book_club.slug}), {"file": upload, "username": "member"})
+    assert not books_models.Review.objects.filter(user=member).exists()
+    assert books_models.Review.objects.filter(user=user).count() == 2
+
+
+@pytest.mark.django_db
+def test_import_books_rejects_file_without_columns(client, mod_club):
+    user, book_club = mod_club
+    client.login(username='user', password='pwd')
+    upload = SimpleUploadedFile("goodreads.csv", b"Naam,Schrijver\nDune,Frank Herbert\n")
+    response = client.post(reverse('import_books', kwargs={"club": book_club.slug}), {"file": upload})
+    assert "file" in response.context["form"].errors
+    assert not books_models.Book.objects.exists()
+
+
+@pytest.mark.django_db
+def test_import_resumes_after_interruption(mod_club, monkeypatch):
+    user, book_club = mod_club
+    history = _history(25)
+    import_batch = books_imports._import_batch
+    calls = []
+
+    def interrupted_batch(*args):
+        calls.append(1)
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        import_batch(*args)
+
+    monkeypatch.setattr(books_imports, "_import_batch", interrupted_batch)
+    with pytest.raises(KeyboardInterrupt):
+        books_imports.import_reading_history(book_club, user, BytesIO(history), batch_size=10)
+    assert books_models.BookImport.objects.get().rows_done == 20
+    assert books_models.BookClubBooks.objects.count() == 20
+
+    monkeypatch.setattr(books_imports, "_import_batch", import_batch)
+    result = books_imports.import_reading_history(book_club, user, BytesIO(history), batch_size=10)
+    assert (result.resumed_from, result.rows) == (20, 5)
+    assert books_models.BookClubBooks.objects.count() == 25
+    assert books_models.BookImport.objects.get().finished
+
+    result = books_imports.import_reading_history(book_club, user, BytesIO(history), batch_size=10, restart=True)
+    assert (result.resumed_from, result.rows, result.club_books_created) == (0, 25, 0)
+
+
+@pytest.mark.django_db
+def test_import_books_tells_when_file_was_already_imported(client, mod_club):
+    user, book_club = mod_club
+    client.login(username='user', password='pwd')
+    url = reverse('import_books', kwargs={"club": book_club.slug})
+    client.post(url, {"file": SimpleUploadedFile("goodreads.csv", _history(3))})
+    books_models.BookClubBooks.objects.all().delete()
+
+    response = client.post(url, {"file": SimpleUploadedFile("goodreads.csv", _history(3))})
+    assert response.context["result"].already_imported
+    assert "al geïmporteerd" in response.content.decode()
+    assert not books_models.BookClubBooks.objects.exists()
+
+    response = client.post(url, {"file": SimpleUploadedFile("goodreads.csv", _history(3)), "restart": "on"})
+    assert not response.context["result"].already_imported
+    assert response.context["result"].club_books_created == 3
+
+
+@pytest.mark.django_db
+def test_import_counts_only_inserted_reviews(mod_club, monkeypatch):
+    user, book_club = mod_club
+    bulk_create = books_models.Review.objects.bulk_create
+
+    def concurrent_review_first(reviews, **kwargs):
+        # another request reviews one of the books between the lookup and the insert, on its own connection
+        connection.connection.cursor().execute(
+            f"INSERT INTO {books_models.Review._meta.db_table} (user_id, book_id, score) "
+            f"VALUES ({user.pk}, {reviews[0].book_id}, 2)"
+        )
+        return bulk_create(reviews, **kwargs)
+
+    monkeypatch.setattr(books_models.Review.objects, "bulk_create", concurrent_review_first)
+    result = books_imports.import_reading_history(book_club, user, BytesIO(_csv(
+        'Dune,Frank Herbert,4,4.2,2016/03/04,read,',
+        'Emma,Jane Austen,3,4.0,2017/05/06,read,',
+    )))
+    assert result.reviews_created == 1
+    assert books_models.Review.objects.filter(user=user).count() == 2
+
+
+@pytest.mark.django_db
+def test_import_query_count_per_batch_is_constant(mod_club):
+    user, book_club = mod_club
+    queries = {}
+    for rows in (10, 100):
+        with CaptureQueriesContext(connection) as captured:
+            books_imports.import_reading_history(book_club, user, BytesIO(_history(rows)), batch_size=rows, restart=True)
+        queries[rows] = len(captured)
+    assert queries[10] == queries[100]
+
+
+@pytest.mark.django_db
+def test_import_reading_history_command_reports_rate(mod_club, tmp_path):
+    user, book_club = mod_club
+    path = tmp_path / "goodreads.csv"
+    path.write_bytes(_history(30))
+    out = StringIO()
+
+    call_command("import_reading_history", book_club.slug, "user", str(path), "--batch-size", "10", stdout=out)
+    assert "30 rijen in" in out.getvalue()
+    assert "rijen/s" in out.getvalue()
+    assert books_models.BookClubBooks.objects.filter(book_club=book_club).count() == 30
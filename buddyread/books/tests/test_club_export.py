@@ -0,0 +1,149 @@
+import csv
+import io
+import json
+import os
+import tracemalloc
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.urls import reverse
+import books.exports as books_exports
+import books.models as books_models
+
+
+EXPORT_REVIEWS = int(os.environ.get("EXPORT_TEST_REVIEWS", 500000))
+EXPORT_MEMBERS = 50
+# the memory allocated at once while the whole club is exported may peak at most this high
+EXPORT_MAX_PEAK = 16 * 1024 * 1024
+
+
+@pytest.fixture
+def mod_club(django_user_model):
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user, is_mod=True)
+    return user, book_club
+
+
+def test_url_to_export_club_exists():
+    try:
+        reverse('export_club', kwargs={"club": "bookclub"})
+    except Exception as exc:
+        pytest.fail(str(exc))
+
+
+@pytest.mark.django_db
+def test_export_club_requires_mod_perm(client, django_user_model):
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user, is_mod=False)
+    client.login(username='user', password='pwd')
+    response = client.get(reverse('export_club', kwargs={"club": book_club.slug}))
+    assert response.status_code == 403
+
+
+@pytest.mark.django_db
+def test_export_club_rejects_unknown_format(client, mod_club):
+    user, book_club = mod_club
+    client.login(username='user', password='pwd')
+    response = client.get(reverse('export_club', kwargs={"club": book_club.slug}) + "?format=xml")
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_export_club_streams_csv_and_ndjson(client, mod_club, django_user_model):
+    user, book_club = mod_club
+    outsider = django_user_model.objects.create_user(username='outsider', password='pwd')
+    dune = books_models.Book.objects.create(title="Dune", author="Frank Herbert")
+    emma = books_models.Book.objects.create(title="Emma", author="Jane Austen")
+    books_models.BookClubBooks.objects.create(book_club=book_club, book=dune, selected_by=user)
+    books_models.BookClubBooks.objects.create(book_club=book_club, book=emma, selected_by=user)
+    books_models.Review.objects.create(user=user, book=dune, score=9, comment="Zand, overal")
+    books_models.Review.objects.create(user=outsider, book=dune, score=2)
+    client.login(username='user', password='pwd')
+    url = reverse('export_club', kwargs={"club": book_club.slug})
+
+    response = client.get(url)
+    assert response.streaming
+    assert response["Content-Type"] == "text/csv; charset=utf-8"
+    assert response["Content-Disposition"] == 'attachment; filename="bookclub.csv"'
+    rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+    # reviews of non-members are left out, a book without reviews is listed once
+    assert [(row["title"], row["reviewer"], row["score"], row["comment"]) for row in rows] == [
+        ("Emma", "", "", ""),
+        ("Dune", "user", "4.5", "Zand, overal"),
+    ]
+
+    response = client.get(url + "?format=ndjson")
+    assert response["Content-Type"] == "application/x-ndjson; charset=utf-8"
+    records = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+    assert records[1] == {
+        "title": "Dune",
+        "author": "Frank Herbert",
+        "date_added": dune.bookclubbooks_set.get().date_added.isoformat(),
+        "selected_by": "user",
+        "reviewer": "user",
+        "score": "4.5",
+        "comment": "Zand, overal",
+    }
+
+
+@pytest.mark.django_db
+def test_club_history_walks_keyset_pages(mod_club):
+    user, book_club = mod_club
+    club_books = books_models.Book.objects.bulk_create(
+        books_models.Book(title=f"Title {i}", author="Author", title_key=f"title {i}", author_key="author")
+        for i in range(25)
+    )
+    books_models.BookClubBooks.objects.bulk_create(
+        books_models.BookClubBooks(book_club=book_club, book=book) for book in club_books
+    )
+    books_models.Review.objects.bulk_create(books_models.Review(user=user, book=book, score=6) for book in club_books)
+
+    records = list(books_exports.club_history(book_club, page_size=10, chunk_size=3))
+    assert len(records) == 25
+    assert [record["title"] for record in records] == [f"Title {i}" for i in reversed(range(25))]
+
+
+@pytest.mark.django_db
+def test_export_club_memory_stays_flat(client, mod_club):
+    user, book_club = mod_club
+    members = get_user_model().objects.bulk_create(
+        get_user_model()(username=f"member-{i}", password="!") for i in range(EXPORT_MEMBERS)
+    )
+    books_models.BookClubMembers.objects.bulk_create(
+        books_models.BookClubMembers(book_club=book_club, member=member) for member in members
+    )
+    book_count = EXPORT_REVIEWS // EXPORT_MEMBERS
+    club_books = books_models.Book.objects.bulk_create(
+        books_models.Book(title=f"Title {i}", author="Author", title_key=f"title {i}", author_key="author")
+        for i in range(book_count)
+    )
+    books_models.BookClubBooks.objects.bulk_create(
+        (books_models.BookClubBooks(book_club=book_club, book=book) for book in club_books), batch_size=10000
+    )
+    # one INSERT ... SELECT, so seeding the reviews stays fast
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {books_models.Review._meta.db_table} (user_id, book_id, score, comment) "
+            f"SELECT m.member_id, b.book_id, 8, 'Een commentaar' "
+            f"FROM {books_models.BookClubMembers._meta.db_table} m, {books_models.BookClubBooks._meta.db_table} b "
+            f"WHERE m.book_club_id = %s AND b.book_club_id = %s AND m.is_mod = %s",
+            [book_club.pk, book_club.pk, False],
+        )
+
+    client.login(username='user', password='pwd')
+    # traced from here on, so earlier tests and the seeding above do not count
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        response = client.get(reverse('export_club', kwargs={"club": book_club.slug}) + "?format=ndjson")
+        lines = 0
+        for chunk in response.streaming_content:
+            lines += chunk.count(b"\n")
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert lines == EXPORT_REVIEWS
+    assert peak < EXPORT_MAX_PEAK, f"{peak / 2 ** 20:.1f} MiB"
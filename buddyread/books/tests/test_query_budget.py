@@ -0,0 +1,185 @@
+import json
+import os
+import time
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+import books.invites as books_invites
+import books.models as books_models
+
+
+# Every named route of books/urls.py, books/api_urls.py and core/urls.py with its query budget and wall-clock ceiling (seconds).
+# The budget must hold for a small club and for a scaled club alike: a view whose query count grows with
+# the size of the club is an N+1 regression.
+ROUTE_BUDGETS = {
+    "index": (3, 0.5),
+    "change_auth": (2, 0.5),
+    "add_club": (2, 0.5),
+    "choose_club": (3, 0.5),
+    "club_overview": (3, 0.5),
+    "sign_up": (3, 0.5),
+    "sign_up_token": (2, 0.5),
+    "books": (7, 0.5),
+    "books_page": (6, 0.5),
+    "add_book": (3, 0.5),
+    "book_autocomplete": (2, 0.5),
+    "review": (5, 0.5),
+    "club_custom_admin": (6, 0.5),
+    "edit_club": (3, 0.5),
+    "delete_club": (3, 0.5),
+    "delete_club_member": (5, 0.5),
+    "delete_club_book": (5, 0.5),
+    "grant_mod_perm": (5, 0.5),
+    "invite_member": (4, 0.5),
+    "import_books": (3, 0.5),
+    "export_club": (5, 1.0),
+    "api_club_books": (6, 0.5),
+    "api_club_book": (5, 0.5),
+    "metrics": (2, 0.5),
+}
+
+SCALES = {
+    "small": {"books": 10, "members": 5, "reviews": 20},
+    "large": {
+        "books": int(os.environ.get("QUERY_BUDGET_BOOKS", 1000)),
+        "members": int(os.environ.get("QUERY_BUDGET_MEMBERS", 50)),
+        "reviews": int(os.environ.get("QUERY_BUDGET_REVIEWS", 20000)),
+    },
+}
+REPEAT = 3
+REPORT_PATH = os.environ.get("QUERY_BUDGET_REPORT", "query_budget_report.json")
+
+
+def _seed_club(name, mod, books, members, reviews):
+    book_club = books_models.BookClub.objects.create(name=name)
+    users = get_user_model().objects.bulk_create(
+        get_user_model()(username=f"{book_club.slug}-member-{i}", password="!")
+        for i in range(members)
+    )
+    books_models.BookClubMembers.objects.bulk_create(
+        [books_models.BookClubMembers(book_club=book_club, member=mod, is_mod=True)]
+        + [books_models.BookClubMembers(book_club=book_club, member=user) for user in users]
+    )
+    club_books = books_models.Book.objects.bulk_create(
+        books_models.Book(
+            title=f"{name} title {i}",
+            author=f"{name} author {i}",
+            title_key=books_models.normalize_book_key(f"{name} title {i}"),
+            author_key=books_models.normalize_book_key(f"{name} author {i}"),
+        )
+        for i in range(books)
+    )
+    books_models.BookClubBooks.objects.bulk_create(
+        books_models.BookClubBooks(book_club=book_club, book=book, selected_by=users[i % members])
+        for i, book in enumerate(club_books)
+    )
+    books_models.Review.objects.bulk_create(
+        (
+            books_models.Review(
+                user=users[i % members],
+                book=club_books[(i // members) % books],
+                score=books_models.Review.SCORES[i % len(books_models.Review.SCORES)][0],
+                comment=f"Comment {i}",
+            )
+            for i in range(reviews)
+        ),
+        batch_size=1000,
+    )
+    invite_url = books_models.InviteURL.objects.create(book_club=book_club)
+    return {
+        "club": book_club.slug,
+        "book_pk": club_books[0].pk,
+        "club_book_pk": books_models.BookClubBooks.objects.filter(book_club=book_club).first().pk,
+        "member_pk": books_models.BookClubMembers.objects.filter(book_club=book_club, is_mod=False).first().pk,
+        "url_uuid": invite_url.uuid,
+        "token": books_invites.issue_invite_token(book_club),
+    }
+
+
+def _route_kwargs(route, seeded):
+    kwargs = {
+        "sign_up": ["url_uuid"],
+        "sign_up_token": ["token"],
+        "books": ["club"],
+        "books_page": ["club"],
+        "add_book": ["club"],
+        "review": ["club", "book_pk"],
+        "club_custom_admin": ["club"],
+        "edit_club": ["club"],
+        "delete_club": ["club"],
+        "delete_club_member": ["club", "member_pk"],
+        "delete_club_book": ["club", "book_pk"],
+        "grant_mod_perm": ["club", "member_pk"],
+        "invite_member": ["club"],
+        "import_books": ["club"],
+        "export_club": ["club"],
+        "api_club_books": ["club"],
+        "api_club_book": ["club", "book_pk"],
+    }.get(route, [])
+    values = dict(seeded, book_pk=seeded["club_book_pk"]) if route == "delete_club_book" else seeded
+    return {key: values[key] for key in kwargs}
+
+
+@pytest.fixture(scope="module")
+def scaled_clubs(django_db_setup, django_db_blocker):
+    report = []
+    # the scaled clubs are seeded once per module and rolled back afterwards
+    with django_db_blocker.unblock(), transaction.atomic():
+        # staff, so the Server-Timing header is part of every measurement
+        mod = get_user_model().objects.create(username="budget-mod", password="!", is_staff=True)
+        seeded = {
+            scale: _seed_club(f"Budget {scale}", mod, **size)
+            for scale, size in SCALES.items()
+        }
+        yield mod, seeded, report
+        transaction.set_rollback(True)
+
+    with open(REPORT_PATH, "w") as f:
+        json.dump({"scales": SCALES, "routes": report}, f, indent=2)
+
+
+def _measure(client, url):
+    queries, seconds = 0, float("inf")
+    for _ in range(REPEAT):
+        cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(url)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            seconds = min(seconds, time.perf_counter() - start)
+        assert response.status_code in (200, 302), f"{url} returned {response.status_code}"
+        queries = max(queries, len(captured))
+    return queries, seconds
+
+
+@pytest.mark.budget
+@pytest.mark.parametrize("route", ROUTE_BUDGETS)
+@pytest.mark.django_db
+def test_route_stays_within_query_and_time_budget(client, scaled_clubs, route):
+    mod, seeded, report = scaled_clubs
+    max_queries, max_seconds = ROUTE_BUDGETS[route]
+    client.force_login(mod)
+    if route in ("sign_up", "sign_up_token"):
+        client.logout()
+
+    measured = {}
+    for scale in SCALES:
+        url = reverse(route, kwargs=_route_kwargs(route, seeded[scale]))
+        queries, seconds = _measure(client, url)
+        measured[scale] = queries
+        report.append({
+            "route": route,
+            "scale": scale,
+            "queries": queries,
+            "max_queries": max_queries,
+            "seconds": round(seconds, 6),
+            "max_seconds": max_seconds,
+        })
+        assert queries <= max_queries, f"{route} ({scale}) did {queries} queries, budget is {max_queries}"
+        assert seconds <= max_seconds, f"{route} ({scale}) took {seconds:.3f}s, ceiling is {max_seconds}s"
+
+    assert measured["small"] == measured["large"], f"query count of {route} grows with the club: {measured}"
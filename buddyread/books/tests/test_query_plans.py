@@ -0,0 +1,101 @@
+import re
+import pytest
+from django.db import IntegrityError, connection, transaction
+from django.test import RequestFactory
+import books.decorators as books_decorators
+import books.memberships as books_memberships
+import books.models as books_models
+import books.pagination as books_pagination
+
+
+def _full_scans(queryset):
+    """Tables (or subquery aliases) the database would read in full for queryset, according to EXPLAIN."""
+    plan = queryset.explain()
+    if connection.vendor == "sqlite":
+        # "SCAN <table>" is a full table (or full index) scan, "SEARCH <table> USING ..." a lookup
+        return [table for table in re.findall(r"\bSCAN (\w+)", plan) if table != "CONSTANT"]
+    if connection.vendor == "mysql":
+        # one row per table, whose access type is ALL for a full table scan
+        return [line.split()[2] for line in plan.splitlines() if " ALL " in f" {line} "]
+    pytest.skip(f"no query plan parser for {connection.vendor}")
+
+
+def _sorts(queryset):
+    """Whether the database sorts the rows of queryset itself instead of reading them in index order."""
+    plan = queryset.explain()
+    if connection.vendor == "sqlite":
+        return "USE TEMP B-TREE FOR ORDER BY" in plan
+    return "Using filesort" in plan
+
+
+@pytest.fixture
+def club(django_user_model):
+    users = [django_user_model.objects.create_user(username=f'user-{i}', password='pwd') for i in range(3)]
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    for user in users:
+        books_models.BookClubMembers.objects.create(book_club=book_club, member=user)
+    for i in range(3):
+        book = books_models.Book.objects.create(title=f"Title {i}", author="Author")
+        books_models.BookClubBooks.objects.create(book_club=book_club, book=book, selected_by=users[0])
+        books_models.Review.objects.create(user=users[i], book=book, score=6)
+    return book_club, users[0]
+
+
+@pytest.mark.django_db
+def test_membership_lookup_uses_index(club):
+    book_club, user = club
+    request = RequestFactory().get("/")
+    request.user = user
+    queryset = books_decorators._membership_qs(request, book_club.slug)
+    assert _full_scans(queryset) == []
+
+
+@pytest.mark.django_db
+def test_membership_is_unique(club):
+    book_club, user = club
+    with pytest.raises(IntegrityError), transaction.atomic():
+        books_models.BookClubMembers.objects.create(book_club=book_club, member=user)
+
+
+@pytest.mark.django_db
+def test_user_clubs_lookup_uses_index(club):
+    book_club, user = club
+    assert _full_scans(books_memberships._user_clubs_query(user)) == []
+
+
+@pytest.mark.django_db
+def test_club_members_list_uses_index(club):
+    book_club, user = club
+    queryset = books_models.BookClubMembers.objects.filter(book_club=book_club).select_related("member")
+    assert _full_scans(queryset) == []
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("cursor", [False, True])
+def test_club_books_keyset_page_reads_index_in_order(club, cursor):
+    book_club, user = club
+    queryset = books_models.BookClubBooks.objects.filter(book_club=book_club)
+    if cursor:
+        first = queryset.order_by(*books_pagination.CLUB_BOOKS_ORDERING).first()
+        queryset = queryset.filter(books_pagination._after(first.pk, first.date_added))
+    page = queryset.order_by(*books_pagination.CLUB_BOOKS_ORDERING).values_list("pk", "date_added")[:21]
+    assert _full_scans(page) == []
+    assert not _sorts(page)
+
+
+@pytest.mark.django_db
+def test_club_book_reviews_prefetch_uses_index(club):
+    book_club, user = club
+    book_pks = list(books_models.BookClubBooks.objects.filter(book_club=book_club).values_list("book_id", flat=True))
+    # the prefetch of the member reviews on the club book pages
+    queryset = books_models.Review.objects.filter(
+        book_id__in=book_pks, user__in=book_club.bookclubmembers_set.values("member")
+    ).select_related("user")
+    assert _full_scans(queryset) == []
+
+
+@pytest.mark.django_db
+def test_club_counts_use_indexes(club):
+    book_club, user = club
+    queryset = books_models.BookClub.objects.filter(pk=book_club.pk).values(**books_models.club_counts())
+    assert _full_scans(queryset) == []
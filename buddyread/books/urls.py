@@ -6,6 +6,8 @@ urlpatterns = [
     path("nieuwe/", views.add_or_edit_club, name="add_club"),
     path("keuze/", views.choose_club, name="choose_club"),
     path("uitnodiging/<str:url_uuid>/", views.sign_up, name="sign_up"),
+    path("uitnodiging/token/<str:token>/", views.sign_up_token, name="sign_up_token"),
+    path("zoek/boek/", views.book_autocomplete, name="book_autocomplete"),
     path("beheer/", views.club_overview, name="club_overview"),
     path("beheer/<slug:club>/", views.club_custom_admin, name="club_custom_admin"),
     path("beheer/<slug:club>/wijzig/", views.add_or_edit_club, name="edit_club"),
@@ -14,7 +16,10 @@ urlpatterns = [
     path("beheer/<slug:club>/verwijder/boek/<int:book_pk>", views.delete_club_book, name="delete_club_book"),
     path("beheer/<slug:club>/rechten/lid/<int:member_pk>", views.grant_mod_perm, name="grant_mod_perm"),
     path("beheer/<slug:club>/uitnodigen/lid/", views.invite_member, name="invite_member"),
+    path("beheer/<slug:club>/importeer/", views.import_books, name="import_books"),
+    path("beheer/<slug:club>/export/", views.export_club, name="export_club"),
     path("<slug:club>/", views.books, name="books"),
+    path("<slug:club>/boeken/", views.books_page, name="books_page"),
     path("<slug:club>/add/boek/", views.add_book, name="add_book"),
     path("<slug:club>/review/<int:book_pk>/", views.review, name="review"),
 ]
\ No newline at end of file
@@ -1,12 +1,24 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseForbidden
+from django.core import signing
+from django.db import transaction
+from django.http import Http404, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
-from django.db.models import Prefetch
-from .models import Book, Review, BookClub, BookClubMembers, BookClubBooks, InviteURL
-from .forms import BookForm, ReviewForm, BookClubForm, ConfirmDeleteForm, ConfirmModeratorForm, InviteMemberForm
-from .decorators import user_is_club_member, user_is_club_mod
+from django.core.paginator import Paginator
+from django.db.models import Prefetch, Q
+from django.utils.functional import SimpleLazyObject
+from core import hashing
+from .models import Book, Review, BookClub, BookClubMembers, BookClubBooks, InviteURL, RedeemedInvite, club_counts, normalize_book_key
+from .forms import BookForm, ReviewForm, BookClubForm, ConfirmDeleteForm, ConfirmModeratorForm, InviteMemberForm, InviteBatchForm, ImportBooksForm
+from .decorators import resolve_club_membership, user_is_club_member, user_is_club_mod
+from .caching import cache_policy, club_condition
+from .pagination import ADMIN_PAGE_SIZE, CLUB_BOOKS_ORDERING, InvalidCursor, KeysetPage
+from .exports import EXPORT_FORMATS, export_club_history
+from .imports import InvalidImport, import_reading_history
+from .invites import issue_invite_token, read_invite_token, redeem_invite_nonce
+from .search import book_index
 
 
 @login_required
@@ -15,8 +27,10 @@ def add_or_edit_club(request, club=None):
     form_caption = "Start een nieuwe boekenclub!"
 
     if club is not None:
-        book_club = get_object_or_404(BookClub, slug=club)
-        member = get_object_or_404(BookClubMembers, book_club=book_club, member=request.user)
+        member = resolve_club_membership(request, club)
+        if member is None:
+            raise Http404("Geen lid van deze boekenclub")
+        book_club = request.club
 
         if not member.is_mod:
             return HttpResponseForbidden(
@@ -49,7 +63,7 @@ def add_or_edit_club(request, club=None):
 @login_required
 @user_is_club_mod
 def delete_club(request, club):
-    book_club = get_object_or_404(BookClub, slug=club)
+    book_club = request.club
     if request.method == "POST":
         form = ConfirmDeleteForm(request.POST)
         if form.is_valid():
@@ -66,49 +80,74 @@ def delete_club(request, club):
 
 @login_required
 def choose_club(request):
-    book_clubs = [
-        m.book_club
-        for m in BookClubMembers.objects.filter(member=request.user)
-    ]
-    context = {'book_clubs': book_clubs}
-    return render(request, "books/choose_club.html", context)
+    # the clubs come from the user_clubs context processor
+    return render(request, "books/choose_club.html")
 
 
-@login_required
-@user_is_club_member
-def books(request, club):
-    book_club = get_object_or_404(BookClub, slug=club)
-    book_club_books = BookClubBooks.objects.filter(book_club=book_club)
-    book_clubs = [
-        m.book_club
-        for m in BookClubMembers.objects.filter(member=request.user)
-        if m.book_club != book_club
-    ]
-
-    book_qs = book_club_books.select_related("book").prefetch_related(
+def _club_books_context(book_club, cursor=None):
+    page = KeysetPage(BookClubBooks.objects.filter(book_club=book_club), cursor)
+    book_qs = SimpleLazyObject(
+        lambda: BookClubBooks.objects.filter(pk__in=page.pks).with_review_stats().select_related(
+            "book", "selected_by"
+        ).prefetch_related(
             Prefetch(
                 "book__review_set",
                 queryset=Review.objects.filter(
                     user__in=book_club.bookclubmembers_set.values("member")
-                )
+                ).select_related("user")
             )
-        ).order_by('-date_added')
-    context = {"books": book_qs, "club": book_club, "book_clubs": book_clubs}
+        ).order_by(*CLUB_BOOKS_ORDERING)
+    )
+    return {
+        "books": book_qs,
+        "page": page,
+        "cursor": cursor or "",
+        "club": book_club,
+    }
+
+
+@login_required
+@user_is_club_member
+@cache_policy()
+@club_condition
+def books(request, club):
+    book_club = request.club
+    cursor = request.GET.get("cursor")
+    try:
+        context = _club_books_context(book_club, cursor)
+    except InvalidCursor:
+        return HttpResponseBadRequest("Ongeldige cursor")
+
+    context["first_page"] = not cursor
     return render(request, "books/book_list.html", context)
 
 
+@login_required
+@user_is_club_member
+@cache_policy()
+def books_page(request, club):
+    book_club = request.club
+    try:
+        context = _club_books_context(book_club, request.GET.get("cursor"))
+    except InvalidCursor:
+        return HttpResponseBadRequest("Ongeldige cursor")
+    return render(request, "books/book_list_page.html", context)
+
+
 @login_required
 @user_is_club_member
 def add_book(request, club):
-    book_club = get_object_or_404(BookClub, slug=club)
+    book_club = request.club
     if request.method == "POST":
         form = BookForm(request.POST)
         if form.is_valid():
             title = form.cleaned_data['title']
             author = form.cleaned_data['author']
+            # get_or_create retries the lookup when a concurrent insert trips the unique key
             book, created = Book.objects.get_or_create(
-                title=title,
-                author=author,
+                title_key=normalize_book_key(title),
+                author_key=normalize_book_key(author),
+                defaults={'title': title, 'author': author},
             )
             BookClubBooks.objects.create(
                 book_club=book_club,
@@ -126,11 +165,22 @@ def add_book(request, club):
     return render(request, "books/generic_form.html", context)
 
 
+@login_required
+@cache_policy(max_age=60)
+def book_autocomplete(request):
+    field = request.GET.get("field", "title")
+    if field not in book_index.FIELDS:
+        return HttpResponseBadRequest("Ongeldig veld")
+    results = book_index.search(request.GET.get("q", ""), field=field)
+    return JsonResponse({"results": results})
+
+
 @login_required
 @user_is_club_member
+@club_condition
 def review(request, club, book_pk):
     book = get_object_or_404(Book, pk=book_pk)
-    book_club = get_object_or_404(BookClub, slug=club)
+    book_club = request.club
     review_selected = Review.objects.filter(user=request.user, book=book).first()
     if request.method == "POST":
         form = ReviewForm(request.POST)
@@ -154,28 +204,64 @@ def review(request, club, book_pk):
             form = ReviewForm()
         else:
             initial_data = {
-                'score': review_selected.score,
+                'score': review_selected.get_score_display(),
                 'comment': review_selected.comment
             }
             form = ReviewForm(initial=initial_data)
     context = {'book': book, 'form': form}
     return render(request, "books/review_form.html", context)
 
+def _counts_invites():
+    # invite tokens leave no row to count, only the invites of INVITE_MODE "uuid" do
+    return settings.INVITE_MODE == "uuid"
+
+
 @login_required
 def club_overview(request):
-    book_clubs = BookClubMembers.objects.filter(member=request.user)
-    context = {'book_clubs': book_clubs}
+    book_clubs = BookClubMembers.objects.filter(member=request.user).select_related("book_club").only(
+        "is_mod", "book_club__slug", "book_club__name"
+    ).annotate(**club_counts("book_club", invites=_counts_invites())).order_by("book_club__name")
+    context = {'book_clubs': book_clubs, 'counts_invites': _counts_invites()}
     return render(request, "books/club_overview.html", context)
 
 
 @login_required
 @user_is_club_mod
 def club_custom_admin(request, club):
-    book_club = get_object_or_404(BookClub, slug=club)
+    # no club_condition: the number of open invites changes as invites expire
+    book_club = request.club
+    member_q = request.GET.get("member_q", "").strip()
+    book_q = request.GET.get("book_q", "").strip()
+
+    members = BookClubMembers.objects.filter(book_club=book_club).select_related("member").only(
+        "is_mod", "member__username"
+    ).order_by("member__username", "pk")
+    if member_q:
+        members = members.filter(member__username__icontains=member_q)
+
+    club_books = BookClubBooks.objects.filter(book_club=book_club).select_related("book").only(
+        "book__title", "book__author"
+    ).order_by("book__title", "pk")
+    if book_q:
+        club_books = club_books.filter(Q(book__title__icontains=book_q) | Q(book__author__icontains=book_q))
+
+    counts = BookClub.objects.filter(pk=book_club.pk).values(**club_counts(invites=_counts_invites())).get()
+    member_pages = Paginator(members, ADMIN_PAGE_SIZE)
+    book_pages = Paginator(club_books, ADMIN_PAGE_SIZE)
+    # unfiltered lists are already counted, which saves the paginators a COUNT query each
+    if not member_q:
+        member_pages.count = counts["member_count"]
+    if not book_q:
+        book_pages.count = counts["book_count"]
+
     context = {
         "book_club": book_club,
-        "members": BookClubMembers.objects.filter(book_club=book_club),
-        "club_books": BookClubBooks.objects.filter(book_club=book_club)
+        "counts": counts,
+        "counts_invites": _counts_invites(),
+        "members": member_pages.get_page(request.GET.get("member_page")),
+        "club_books": book_pages.get_page(request.GET.get("book_page")),
+        "member_q": member_q,
+        "book_q": book_q,
     }
     return render(request, "books/club_custom_admin.html", context)
 
@@ -183,7 +269,7 @@ def club_custom_admin(request, club):
 @login_required
 @user_is_club_mod
 def delete_club_member(request, club, member_pk):
-    book_club = get_object_or_404(BookClub, slug=club)
+    book_club = request.club
     club_member = get_object_or_404(BookClubMembers, book_club=book_club, pk=member_pk)
     if request.method == "POST":
         form = ConfirmDeleteForm(request.POST)
@@ -204,7 +290,7 @@ def delete_club_member(request, club, member_pk):
 @login_required
 @user_is_club_mod
 def delete_club_book(request, club, book_pk):
-    book_club = get_object_or_404(BookClub, slug=club)
+    book_club = request.club
     club_book = get_object_or_404(BookClubBooks, book_club=book_club, pk=book_pk)
     if request.method == "POST":
         form = ConfirmDeleteForm(request.POST)
@@ -223,7 +309,7 @@ def delete_club_book(request, club, book_pk):
 @login_required
 @user_is_club_mod
 def grant_mod_perm(request, club, member_pk):
-    book_club = get_object_or_404(BookClub, slug=club)
+    book_club = request.club
     club_member = get_object_or_404(BookClubMembers, book_club=book_club, pk=member_pk)
     if request.method == "POST":
         form = ConfirmModeratorForm(request.POST)
@@ -245,32 +331,84 @@ def grant_mod_perm(request, club, member_pk):
 @login_required
 @user_is_club_mod
 def invite_member(request, club):
-    book_club = get_object_or_404(BookClub, slug=club)
-    invite_url = InviteURL.objects.create(book_club=book_club)
-    url = reverse('sign_up', kwargs={'url_uuid': invite_url.uuid})
+    book_club = request.club
+    form = InviteBatchForm(request.POST or None)
+    batch = request.method == "POST" and form.is_valid()
+    if form.is_bound and not batch:
+        # an invalid count issues no invites, the moderator sees why instead
+        context = {'book_club': book_club, 'invite_url': None, 'invite_urls': [], 'form': form}
+        return render(request, "books/invite_member.html", context)
+
+    if settings.INVITE_MODE == "token":
+        # signed tokens need no row, so every visit can simply issue a fresh one
+        count = form.cleaned_data['count'] if batch else 1
+        urls = [reverse('sign_up_token', kwargs={'token': issue_invite_token(book_club)}) for _ in range(count)]
+    else:
+        if batch:
+            invites = InviteURL.objects.create_batch(book_club, form.cleaned_data['count'])
+        else:
+            # a plain visit (or a link preview) reuses the open invite instead of adding a row every time
+            invite = InviteURL.objects.filter(book_club=book_club).open().order_by('-creation_date').first()
+            invites = [invite or InviteURL.objects.create(book_club=book_club)]
+        urls = [reverse('sign_up', kwargs={'url_uuid': invite.uuid}) for invite in invites]
+
+    invite_urls = [request.build_absolute_uri(url) for url in urls]
     context = {
         'book_club': book_club,
-        'invite_url': request.build_absolute_uri(url)
+        'invite_url': invite_urls[0],
+        'invite_urls': invite_urls,
+        'form': InviteBatchForm(),
     }
     return render(request, "books/invite_member.html", context)
 
 
-def sign_up(request, url_uuid):
-    invite_url = InviteURL.objects.get(uuid=url_uuid)
-    book_club = get_object_or_404(BookClub, slug=invite_url.book_club.slug)
+@login_required
+@user_is_club_mod
+def import_books(request, club):
+    book_club = request.club
+    form = ImportBooksForm(request.POST or None, request.FILES or None)
+    result = None
+    if request.method == "POST" and form.is_valid():
+        try:
+            # the upload is streamed in batches; uploading the same file again resumes an interrupted import
+            result = import_reading_history(
+                book_club, request.user, form.cleaned_data['file'].file, restart=form.cleaned_data['restart']
+            )
+        except InvalidImport as exc:
+            form.add_error('file', str(exc))
+    context = {
+        'book_club': book_club,
+        'form': form,
+        'result': result,
+    }
+    return render(request, "books/import_books.html", context)
 
-    if invite_url.accepted or invite_url.is_expired():
-        return HttpResponseForbidden("Uitnodiging is verlopen")
 
+@login_required
+@user_is_club_mod
+def export_club(request, club):
+    book_club = request.club
+    export_format = request.GET.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest("Ongeldig formaat")
+    content_type, extension, _ = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(export_club_history(book_club, export_format), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{book_club.slug}.{extension}"'
+    return response
+
+
+def _sign_up(request, book_club, redeem):
     if request.method == "POST":
         form = InviteMemberForm(request.POST)
         if form.is_valid():
-            username = form.cleaned_data['username']
-            password = form.cleaned_data['password']
-            new_user = get_user_model().objects.create_user(username=username, password=password)
-            BookClubMembers.objects.create(book_club=book_club, member=new_user)
-            invite_url.accepted=True
-            invite_url.save()
+            with transaction.atomic():
+                if not redeem():
+                    return HttpResponseForbidden("Uitnodiging is verlopen")
+                User = get_user_model()
+                new_user = User(username=User.normalize_username(form.cleaned_data['username']))
+                hashing.set_password(new_user, form.cleaned_data['password'])
+                new_user.save()
+                BookClubMembers.objects.create(book_club=book_club, member=new_user)
             return redirect("index")
 
     else:
@@ -281,3 +419,31 @@ def sign_up(request, url_uuid):
         'form_caption': f"Wordt lid bij boekenclub: {book_club.name}",
     }
     return render(request, "books/generic_form.html", context)
+
+
+def sign_up(request, url_uuid):
+    # accepted and expired invites are removed by the sweep_invites command
+    invite_url = get_object_or_404(InviteURL, uuid=url_uuid)
+    book_club = get_object_or_404(BookClub, slug=invite_url.book_club.slug)
+
+    if invite_url.accepted or invite_url.is_expired():
+        return HttpResponseForbidden("Uitnodiging is verlopen")
+
+    def redeem():
+        return InviteURL.objects.filter(uuid=invite_url.uuid, accepted=False).update(accepted=True) == 1
+
+    return _sign_up(request, book_club, redeem)
+
+
+def sign_up_token(request, token):
+    try:
+        invite = read_invite_token(token)
+    except signing.SignatureExpired:
+        return HttpResponseForbidden("Uitnodiging is verlopen")
+    except signing.BadSignature:
+        raise Http404("Ongeldige uitnodiging")
+
+    book_club = get_object_or_404(BookClub, slug=invite["c"])
+    if RedeemedInvite.objects.filter(nonce=invite["n"]).exists():
+        return HttpResponseForbidden("Uitnodiging is verlopen")
+    return _sign_up(request, book_club, lambda: redeem_invite_nonce(invite["n"]))
@@ -2,6 +2,15 @@
 ASGI config for buddyread project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The ASGI deployment routes through ``buddyread.async_urls``, which serves the hot
+read views (index, choose_club, books and review) with their async versions.
+Run it with uvicorn workers under gunicorn::
+
+    gunicorn buddyread.asgi:application -k uvicorn.workers.UvicornWorker -w 4
+
+or with uvicorn on its own::
+
+    uvicorn buddyread.asgi:application --workers 4
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -12,5 +21,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'buddyread.settings')
+os.environ.setdefault('ROOT_URLCONF', 'buddyread.async_urls')
 
 application = get_asgi_application()
@@ -0,0 +1,35 @@
+"""
+URL configuration of the ASGI deployment: the same routes as buddyread.urls, with the hot read
+views and the login view served by their async versions.
+"""
+from django.contrib import admin
+from django.urls import include, path
+
+import books.urls
+import core.urls
+from books import async_views as books_async_views
+from core import async_views as core_async_views
+
+ASYNC_VIEWS = {
+    "index": core_async_views.index,
+    "choose_club": books_async_views.choose_club,
+    "books": books_async_views.books,
+    "review": books_async_views.review,
+}
+
+
+def with_async_views(patterns):
+    return [
+        path(str(p.pattern), ASYNC_VIEWS.get(p.name, p.callback), name=p.name)
+        for p in patterns
+    ]
+
+
+urlpatterns = [
+    path("", include(with_async_views(core.urls.urlpatterns))),
+    path("club/", include(with_async_views(books.urls.urlpatterns))),
+    path("api/v1/", include("books.api_urls")),
+    path('admin/', admin.site.urls),
+    path('accounts/login/', core_async_views.login, name='login'),
+    path('accounts/', include('django.contrib.auth.urls')),
+]
@@ -0,0 +1,59 @@
+"""
+Cache backends of the cache tier in settings.CACHES, with per-process hit and miss counters.
+"""
+import threading
+from collections import Counter, defaultdict
+from django.core.cache.backends.filebased import FileBasedCache as BaseFileBasedCache
+from django.core.cache.backends.locmem import LocMemCache as BaseLocMemCache
+from django.core.cache.backends.memcached import PyMemcacheCache as BasePyMemcacheCache
+
+
+_stats = defaultdict(Counter)
+_stats_lock = threading.Lock()
+_missing = object()
+
+
+def _count(location, **counts):
+    with _stats_lock:
+        _stats[location].update(counts)
+
+
+class CountingCacheMixin:
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        if value is _missing:
+            _count(self.stats_key, misses=1)
+            return default
+        _count(self.stats_key, hits=1)
+        return value
+
+    @property
+    def stats_key(self):
+        return f"{type(self).__name__}:{self.key_prefix}"
+
+
+class LocMemCache(CountingCacheMixin, BaseLocMemCache):
+    pass
+
+
+class FileBasedCache(CountingCacheMixin, BaseFileBasedCache):
+    pass
+
+
+class PyMemcacheCache(CountingCacheMixin, BasePyMemcacheCache):
+    # get_many of the other backends goes through get
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = super().get_many(keys, version)
+        _count(self.stats_key, hits=len(values), misses=len(keys) - len(values))
+        return values
+
+
+def cache_stats():
+    """Hits, misses and hit ratio of the counting caches of this process."""
+    with _stats_lock:
+        stats = {key: dict(counts) for key, counts in _stats.items()}
+    for counts in stats.values():
+        lookups = counts.get("hits", 0) + counts.get("misses", 0)
+        counts["hit_ratio"] = round(counts.get("hits", 0) / lookups, 4) if lookups else None
+    return stats
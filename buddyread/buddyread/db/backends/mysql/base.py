@@ -0,0 +1,12 @@
+from django.db.backends.mysql import base
+from buddyread.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    @staticmethod
+    def is_raw_connection_usable(connection):
+        try:
+            connection.ping()
+        except base.Database.Error:
+            return False
+        return True
@@ -0,0 +1,6 @@
+from django.db.backends.sqlite3 import base
+from buddyread.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """Pooled SQLite backend, a local stand-in for the pooled MySQL backend."""
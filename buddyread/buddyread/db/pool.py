@@ -0,0 +1,205 @@
+"""
+A bounded, thread-safe pool of raw DB-API connections, shared by all threads of a process, and a
+database wrapper mixin that checks connections out of it instead of opening new ones.
+"""
+import threading
+import time
+from collections import Counter, deque
+from functools import partial
+from django.db import connections
+
+
+POOL_DEFAULTS = {
+    "MAX_SIZE": 10,
+    "TIMEOUT": 5.0,
+    "MAX_LIFETIME": 1800,
+    "HEALTH_CHECKS": True,
+}
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Idle connections are reused most recently returned first. A connection is evicted instead of
+    reused when it outlived max_lifetime seconds or fails the liveness check, and a checkout waits
+    at most timeout seconds for a free slot when max_size connections are open.
+    """
+
+    def __init__(self, check, max_size=10, timeout=5.0, max_lifetime=1800, health_checks=True, clock=time.monotonic):
+        self.check = check
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_checks = health_checks
+        self.clock = clock
+        self._condition = threading.Condition()
+        self._idle = deque()
+        self._created = {}
+        self._metrics = Counter()
+        self._evictions = Counter()
+
+    def _expired(self, created):
+        return self.max_lifetime is not None and self.clock() - created >= self.max_lifetime
+
+    def _reserve(self, deadline):
+        # pop an idle connection, or reserve a slot for a new one (None)
+        waited = False
+        with self._condition:
+            while not self._idle and len(self._created) >= self.max_size:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    self._metrics["timeouts"] += 1
+                    raise PoolTimeout(f"no database connection available within {self.timeout}s")
+                if not waited:
+                    self._metrics["waits"] += 1
+                    waited = True
+                self._condition.wait(remaining)
+            if self._idle:
+                return self._idle.pop()
+            slot = object()
+            self._created[id(slot)] = None
+            return slot, None
+
+    def acquire(self, connect):
+        deadline = self.clock() + self.timeout
+        while True:
+            connection, created = self._reserve(deadline)
+            if created is None:
+                slot = connection
+                try:
+                    connection = connect()
+                except BaseException:
+                    with self._condition:
+                        del self._created[id(slot)]
+                        self._condition.notify()
+                    raise
+                with self._condition:
+                    del self._created[id(slot)]
+                    self._created[id(connection)] = self.clock()
+                    self._metrics["connects"] += 1
+            elif self._expired(created):
+                self._evict(connection, "lifetime")
+                continue
+            elif self.health_checks and not self.check(connection):
+                self._evict(connection, "unusable")
+                continue
+            with self._condition:
+                self._metrics["checkouts"] += 1
+            return connection
+
+    def release(self, connection, discard=False):
+        created = self._created.get(id(connection))
+        if discard or created is None:
+            self._evict(connection, "broken")
+        elif self._expired(created):
+            self._evict(connection, "lifetime")
+        else:
+            with self._condition:
+                self._idle.append((connection, created))
+                self._condition.notify()
+
+    def _evict(self, connection, reason):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._condition:
+            self._created.pop(id(connection), None)
+            self._evictions[reason] += 1
+            self._condition.notify()
+
+    def close(self):
+        with self._condition:
+            idle, self._idle = self._idle, deque()
+        for connection, _ in idle:
+            self._evict(connection, "closed")
+
+    def stats(self):
+        with self._condition:
+            size, idle = len(self._created), len(self._idle)
+            return {
+                "size": size,
+                "idle": idle,
+                "in_use": size - idle,
+                "max_size": self.max_size,
+                **{key: self._metrics[key] for key in ("connects", "checkouts", "waits", "timeouts")},
+                "evictions": dict(self._evictions),
+            }
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Mixin for a DatabaseWrapper: connecting checks a connection out of the pool of the database (its
+    alias and connection settings) and closing returns it. Configure the pool with the POOL dict of the
+    database settings and keep CONN_MAX_AGE at 0, so that every request returns its connection.
+    """
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    @staticmethod
+    def is_raw_connection_usable(connection):
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+        except Exception:
+            return False
+        return True
+
+    @property
+    def pool_key(self):
+        # a handler with other settings under the same alias, e.g. once the test database replaced NAME,
+        # must not get connections to the database of another
+        return pool_key(self.alias, self.settings_dict)
+
+    @property
+    def pool(self):
+        key = self.pool_key
+        with self._pools_lock:
+            if key not in self._pools:
+                options = {**POOL_DEFAULTS, **self.settings_dict.get("POOL", {})}
+                self._pools[key] = ConnectionPool(
+                    check=self.is_raw_connection_usable,
+                    max_size=options["MAX_SIZE"],
+                    timeout=options["TIMEOUT"],
+                    max_lifetime=options["MAX_LIFETIME"],
+                    health_checks=options["HEALTH_CHECKS"],
+                )
+            return self._pools[key]
+
+    def close_pool(self):
+        with self._pools_lock:
+            pool = self._pools.pop(self.pool_key, None)
+        if pool is not None:
+            pool.close()
+
+    def get_new_connection(self, conn_params):
+        try:
+            return self.pool.acquire(partial(super().get_new_connection, conn_params))
+        except PoolTimeout as exc:
+            raise self.Database.OperationalError(str(exc)) from exc
+
+    def _close(self):
+        # a connection closed inside a transaction or after an error it did not survive is not reused
+        discard = self.in_atomic_block or (self.errors_occurred and not self.is_usable())
+        if not discard and not self.autocommit:
+            try:
+                self.connection.rollback()
+            except self.Database.Error:
+                discard = True
+        self.pool.release(self.connection, discard=discard)
+
+
+def pool_key(alias, settings_dict):
+    return (alias, *(str(settings_dict.get(key, "")) for key in ("ENGINE", "NAME", "HOST", "PORT", "USER")))
+
+
+def pool_stats():
+    """Metrics of the connection pools of the configured databases of this process, by database alias."""
+    keys = {pool_key(alias, connections.settings[alias]): alias for alias in connections}
+    with PooledDatabaseWrapperMixin._pools_lock:
+        pools = dict(PooledDatabaseWrapperMixin._pools)
+    return {keys[key]: pool.stats() for key, pool in pools.items() if key in keys}
@@ -48,7 +48,6 @@ CORE_APPS = [
 ]
 
 THIRD_PARTY_APPS = [
-    'bootstrap5',
     'crispy_forms',
     'crispy_bootstrap5',
 ]
@@ -59,19 +58,28 @@ INSTALLED_APPS = LOCAL_APPS + CORE_APPS + THIRD_PARTY_APPS
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # before the session and auth middleware, so an asset request never reads a session
+    'core.middleware.StaticFilesMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.NPlusOneMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.HashingBusyMiddleware',
+    'core.middleware.PreloadLinkMiddleware',
 ]
 
-ROOT_URLCONF = 'buddyread.urls'
+# buddyread.asgi switches to buddyread.async_urls, which serves the hot read views asynchronously
+ROOT_URLCONF = config('ROOT_URLCONF', default='buddyread.urls')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # the Django backend, timing renders for core.middleware.MetricsMiddleware
+        'BACKEND': 'core.metrics.DjangoTemplates',
+        'NAME': 'django',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -79,6 +87,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'books.context_processors.user_clubs',
             ],
         },
     },
@@ -92,15 +101,63 @@ WSGI_APPLICATION = 'buddyread.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        # buddyread.db.backends.mysql checks connections out of a per-process pool; the pool returns
+        # them at the end of every request, so CONN_MAX_AGE stays 0
+        'ENGINE': config('MDB_ENGINE', default='buddyread.db.backends.mysql'),
         'NAME': config('MDB_DATABASE'),
         'USER': config('MDB_USER'),
         'PASSWORD': config('MDB_PASSWORD'),
         'HOST': config('MDB_HOST'),
         'PORT': config('MDB_PORT'),
+        'POOL': {
+            'MAX_SIZE': config('MDB_POOL_MAX_SIZE', default=10, cast=int),
+            'TIMEOUT': config('MDB_POOL_TIMEOUT', default=5.0, cast=float),
+            'MAX_LIFETIME': config('MDB_POOL_MAX_LIFETIME', default=1800, cast=int),
+            'HEALTH_CHECKS': config('MDB_POOL_HEALTH_CHECKS', default=True, cast=bool),
+        },
+    }
+}
+
+# Cache tier: "locmem" for development, "file" or "memcached" (CACHE_LOCATION is a directory or host:port) in production
+CACHE_BACKENDS = {
+    'locmem': 'buddyread.cache.LocMemCache',
+    'file': 'buddyread.cache.FileBasedCache',
+    'memcached': 'buddyread.cache.PyMemcacheCache',
+}
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+# locmem lives in one process: with several gunicorn workers, what one worker caches or invalidates is not seen by
+# the others, so the caches that must be invalidated (sessions, the clubs of a user) need a file or memcached cache
+CACHE_SHARED = CACHE_BACKEND in ('file', 'memcached')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': config('CACHE_LOCATION', default=''),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
+        'KEY_PREFIX': 'buddyread',
     }
 }
 
+# Sessions: "cached_db" reads sessions from the cache and writes them through to the database,
+# "signed_cookies" keeps them in a signed cookie and "db" is Django's default. cached_db trusts the cache,
+# so it is only the default with a shared cache; core.checks refuses it with locmem outside DEBUG
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[config('SESSION_MODE', default='cached_db' if CACHE_SHARED else 'db')]
+
+# /metrics is open to staff users and to a scraper sending "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# N+1 detection of core.nplusone: "off", "log" (staging) or "raise" (the test suite with --nplusone). A SELECT
+# that runs more than NPLUSONE_THRESHOLD times in one request from the same template or code line is reported
+NPLUSONE = config('NPLUSONE', default='off')
+NPLUSONE_THRESHOLD = config('NPLUSONE_THRESHOLD', default=3, cast=int)
+# view names whose repeated queries are accepted: saving a club in the admin validates the foreign keys of every
+# inline row on its page (at most ADMIN_PAGE_SIZE) with a query per row, inside Django
+NPLUSONE_IGNORE = ['admin:books_bookclub_change']
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -120,6 +177,23 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Logins verify passwords on the hashing executor of core.hashing; ModelBackend only resolves sessions
+# that were logged in through it
+AUTHENTICATION_BACKENDS = [
+    'core.backends.HashingExecutorBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# WORKERS hashes run at once ("thread" or "process" workers), QUEUE more may wait for a worker and
+# a request waits TIMEOUT seconds for room in the queue before it gets a 503
+PASSWORD_HASHING = {
+    'EXECUTOR': config('PASSWORD_HASHING_EXECUTOR', default='thread'),
+    'WORKERS': config('PASSWORD_HASHING_WORKERS', default=2, cast=int),
+    'QUEUE': config('PASSWORD_HASHING_QUEUE', default=16, cast=int),
+    'TIMEOUT': config('PASSWORD_HASHING_TIMEOUT', default=2.0, cast=float),
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -138,11 +212,30 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# collectstatic writes content-hashed names with gzip and brotli variants; core.middleware.StaticFilesMiddleware
+# serves them from STATIC_ROOT with immutable caching. Bootstrap and Bootstrap Icons are vendored in core/static/vendor
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'core.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# "token" issues signed invite links without a database row, "uuid" issues InviteURL rows; links of both kinds keep working
+INVITE_MODE = config('INVITE_MODE', default='token')
+
+# Upper bound on the number of books held by the in-process autocomplete index
+BOOK_INDEX_MAX_BOOKS = config('BOOK_INDEX_MAX_BOOKS', default=1000000, cast=int)
+# How often a lookup checks the catalog for books added, changed or deleted by other workers
+BOOK_INDEX_REFRESH_SECONDS = config('BOOK_INDEX_REFRESH_SECONDS', default=30, cast=int)
+
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = "login"
 
@@ -20,6 +20,7 @@ from django.urls import include, path
 urlpatterns = [
     path("", include("core.urls")),
     path("club/", include("books.urls")),
+    path("api/v1/", include("books.api_urls")),
     path('admin/', admin.site.urls),
     path('accounts/', include('django.contrib.auth.urls')),
 ]
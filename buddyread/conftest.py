@@ -0,0 +1,46 @@
+import pytest
+from django.core.cache import cache
+from books.search import book_index
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def shared_cache(settings):
+    # the locmem cache is shared by everything in the single test process, as file or memcached are by workers
+    settings.CACHE_SHARED = True
+    settings.SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+
+
+@pytest.fixture(autouse=True)
+def clear_book_index():
+    book_index.clear()
+    yield
+    book_index.clear()
+
+
+@pytest.fixture(autouse=True)
+def plain_static_storage(settings):
+    # the hashed names only exist after collectstatic
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    }
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--nplusone", action="store_true", help="fail a test when one of its requests runs N+1 queries"
+    )
+
+
+@pytest.fixture(autouse=True)
+def nplusone_strict_mode(request, settings):
+    # opt in for the whole run with --nplusone, or per test with @pytest.mark.nplusone
+    if request.config.getoption("--nplusone") or request.node.get_closest_marker("nplusone"):
+        settings.NPLUSONE = "raise"
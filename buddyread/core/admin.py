@@ -1,3 +1,15 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.contrib.auth.models import User
+from .paginator import EstimatedCountPaginator
 
-# Register your models here.
+
+class UserAdmin(BaseUserAdmin):
+    # a prefix search on the unique username uses its index, unlike the default icontains on four columns
+    search_fields = ("^username",)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+
+admin.site.unregister(User)
+admin.site.register(User, UserAdmin)
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .metrics import install_query_timer
+        from .nplusone import install_detector
+        from . import checks  # noqa: F401
+        connection_created.connect(install_query_timer)
+        connection_created.connect(install_detector)
@@ -0,0 +1,50 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import REDIRECT_FIELD_NAME, login as auth_login
+from django.contrib.auth.forms import AuthenticationForm
+from django.core.exceptions import ValidationError
+from django.shortcuts import redirect, render, resolve_url
+from django.utils.http import url_has_allowed_host_and_scheme
+from books.decorators import async_login_required
+from books.memberships import auser_clubs
+from core.backends import HashingExecutorBackend
+
+
+class AsyncAuthenticationForm(AuthenticationForm):
+    # the login view authenticates itself, awaiting the hashing executor
+    def clean(self):
+        return self.cleaned_data
+
+
+@async_login_required
+async def index(request):
+    clubs = await auser_clubs(request.user)
+    if len(clubs) == 1:
+        return redirect("books", club=clubs[0].slug)
+
+    if len(clubs) > 1:
+        return redirect("choose_club")
+
+    return redirect("add_club")
+
+
+async def login(request):
+    form = AsyncAuthenticationForm(request, data=request.POST if request.method == "POST" else None)
+    if request.method == "POST" and form.is_valid():
+        user = await HashingExecutorBackend().aauthenticate(
+            request, username=form.cleaned_data["username"], password=form.cleaned_data["password"]
+        )
+        try:
+            if user is None:
+                raise form.get_invalid_login_error()
+            form.confirm_login_allowed(user)
+        except ValidationError as error:
+            form.add_error(None, error)
+        else:
+            await sync_to_async(auth_login)(request, user)
+            next_url = request.POST.get(REDIRECT_FIELD_NAME, request.GET.get(REDIRECT_FIELD_NAME))
+            if not url_has_allowed_host_and_scheme(next_url, {request.get_host()}, request.is_secure()):
+                next_url = resolve_url(settings.LOGIN_REDIRECT_URL)
+            return redirect(next_url)
+
+    return await sync_to_async(render)(request, "registration/login.html", {"form": form})
@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
+from core import hashing
+
+
+UserModel = get_user_model()
+
+
+class HashingExecutorBackend(ModelBackend):
+    """
+    ModelBackend that hashes on the hashing executor. A failed login raises PermissionDenied, so the
+    ModelBackend after it in AUTHENTICATION_BACKENDS (kept for existing sessions) does not hash again.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # hash anyway, so the response time does not reveal which usernames exist
+            hashing.make_password(password)
+        else:
+            if hashing.verify_password(user, password) and self.user_can_authenticate(user):
+                return user
+        raise PermissionDenied
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        user = await UserModel._default_manager.filter(**{UserModel.USERNAME_FIELD: username}).afirst()
+        if user is None:
+            await hashing.amake_password(password)
+        elif await hashing.averify_password(user, password) and self.user_can_authenticate(user):
+            user.backend = f"{self.__module__}.{type(self).__qualname__}"
+            return user
+        return None
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """The caches that are invalidated on a change only work across gunicorn workers with a shared cache."""
+    if settings.DEBUG or settings.CACHE_SHARED:
+        return []
+    if settings.SESSION_ENGINE == "django.contrib.sessions.backends.cached_db":
+        return [Error(
+            "SESSION_MODE=cached_db with the per-process locmem cache keeps a logged out session valid in the other workers",
+            hint="Set CACHE_BACKEND to file or memcached, or SESSION_MODE to db.",
+            id="core.E001",
+        )]
+    return [Warning(
+        "With the per-process locmem cache, the clubs of a user are not cached and the autocomplete index of a worker "
+        "only sees books changed in other workers after a restart",
+        hint="Set CACHE_BACKEND to file or memcached when running several workers.",
+        id="core.W001",
+    )]
@@ -3,6 +3,7 @@ from crispy_forms.layout import Submit
 from django import forms
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from core import hashing
 
 
 class ChangeAuthForm(forms.Form):
@@ -22,7 +23,7 @@ class ChangeAuthForm(forms.Form):
 
     def clean_current_password(self):
         pwd = self.cleaned_data.get('current_password')
-        if not self.user.check_password(pwd):
+        if not hashing.verify_password(self.user, pwd):
             raise ValidationError('Huidig wachtwoord is incorrect')
         return pwd
 
@@ -0,0 +1,113 @@
+"""
+Password hashing and verification on a bounded executor, so a burst of logins queues up for a fixed
+number of hashing workers instead of running PBKDF2 on every request thread at once.
+"""
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class HashingBusy(Exception):
+    pass
+
+
+def _verify(password, encoded):
+    # runs on the executor: no database access, the caller saves an upgraded hash
+    upgrades = []
+    is_correct = hashers.check_password(password, encoded, setter=upgrades.append)
+    return is_correct, bool(upgrades)
+
+
+class HashingExecutor:
+    """
+    At most workers hashes run at the same time and at most queue more wait for a worker. A call
+    that finds the queue full waits up to timeout seconds for room and then raises HashingBusy.
+    """
+
+    def __init__(self, workers=2, queue=16, timeout=2.0, kind="thread"):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        if kind == "process":
+            # hashers read the password settings, so every worker process sets up Django
+            self._executor = ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hashing")
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HashingBusy("te veel wachtwoorden tegelijk")
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn, *args):
+        return self.submit(fn, *args).result()
+
+    async def arun(self, fn, *args):
+        # waiting for a free slot blocks, so it happens off the event loop
+        future = await asyncio.to_thread(self.submit, fn, *args)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            options = settings.PASSWORD_HASHING
+            _executor = HashingExecutor(
+                workers=options["WORKERS"],
+                queue=options["QUEUE"],
+                timeout=options["TIMEOUT"],
+                kind=options["EXECUTOR"],
+            )
+        return _executor
+
+
+def make_password(password):
+    return get_executor().run(hashers.make_password, password)
+
+
+async def amake_password(password):
+    return await get_executor().arun(hashers.make_password, password)
+
+
+def set_password(user, password):
+    user.password = make_password(password)
+    user._password = password
+
+
+async def aset_password(user, password):
+    user.password = await amake_password(password)
+    user._password = password
+
+
+def verify_password(user, password):
+    """user.check_password on the executor, saving the hash when the hasher asks for an upgrade."""
+    is_correct, upgrade = get_executor().run(_verify, password, user.password)
+    if upgrade:
+        set_password(user, password)
+        user.save(update_fields=["password"])
+    return is_correct
+
+
+async def averify_password(user, password):
+    is_correct, upgrade = await get_executor().arun(_verify, password, user.password)
+    if upgrade:
+        await aset_password(user, password)
+        await user.asave(update_fields=["password"])
+    return is_correct
@@ -0,0 +1,71 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand
+from core import hashing
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark password verifications per second of concurrent logins, verifying inline on every "
+        "request thread versus on the hashing executor with a given number of workers"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=200)
+        parser.add_argument("--clients", type=int, default=32, help="concurrent request threads")
+        parser.add_argument("--workers", default="1,2,4,8", help="comma separated executor worker counts")
+        parser.add_argument(
+            "--hashers", default="pbkdf2_sha256,pbkdf2_sha256:100000",
+            help="comma separated algorithm[:iterations] of configured PASSWORD_HASHERS"
+        )
+        parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'hasher':<28}{'mode':<12}{'logins/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'busy':>6}")
+        for spec in options["hashers"].split(","):
+            encoded = self.encode(spec)
+            self.report(spec, "inline", self.bench(lambda: hashing._verify("pwd", encoded), options))
+
+            for workers in map(int, options["workers"].split(",")):
+                executor = hashing.HashingExecutor(
+                    workers=workers, queue=options["clients"], timeout=60, kind=options["executor"]
+                )
+                result = self.bench(lambda: executor.run(hashing._verify, "pwd", encoded), options)
+                executor.shutdown()
+                self.report(spec, f"{workers} workers", result)
+
+    def encode(self, spec):
+        algorithm, _, iterations = spec.partition(":")
+        hasher = get_hasher(algorithm)
+        if iterations:
+            return hasher.encode("pwd", hasher.salt(), iterations=int(iterations))
+        return hasher.encode("pwd", hasher.salt())
+
+    def bench(self, login, options):
+        def timed(_):
+            start = time.perf_counter()
+            try:
+                login()
+            except hashing.HashingBusy:
+                return None
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["clients"]) as clients:
+            timings = list(clients.map(timed, range(options["logins"])))
+        seconds = time.perf_counter() - start
+        done = sorted(t for t in timings if t is not None)
+        return {
+            "rate": len(done) / seconds,
+            "p50": statistics.median(done) if done else 0,
+            "p99": done[int(len(done) * 0.99)] if done else 0,
+            "busy": len(timings) - len(done),
+        }
+
+    def report(self, spec, mode, result):
+        self.stdout.write(
+            f"{spec:<28}{mode:<12}{result['rate']:>10.1f}{result['p50'] * 1000:>10.1f}"
+            f"{result['p99'] * 1000:>10.1f}{result['busy']:>6}"
+        )
@@ -0,0 +1,242 @@
+"""
+Per-process request metrics by view name: latency, database queries and time, template render time
+and response size, as histograms that core.views.metrics renders in the Prometheus text format.
+
+Every thread records into its own shard without taking a lock; only the first request of a thread
+registers its shard and only a scrape merges them. The numbers are those of one process: with several
+gunicorn workers every worker reports its own, labelled with its pid.
+"""
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextvars import ContextVar
+from django.template.backends.django import DjangoTemplates as BaseDjangoTemplates, Template as BaseTemplate
+
+
+# name -> (help, upper bounds of the buckets)
+HISTOGRAMS = {
+    "request_duration_seconds": (
+        "Time from the first middleware until the response is returned.",
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    ),
+    "db_queries": (
+        "Database queries per request.",
+        (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+    ),
+    "db_duration_seconds": (
+        "Time spent in database queries per request.",
+        (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+    ),
+    "template_render_seconds": (
+        "Time spent rendering templates per request, including queries run by the template.",
+        (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+    ),
+    "response_size_bytes": (
+        "Size of the response body; streamed responses without Content-Length are left out.",
+        (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+    ),
+}
+BOUNDS = [bounds for _, bounds in HISTOGRAMS.values()]
+# view label of requests that did not resolve to a view, such as 404s
+UNMATCHED = "unmatched"
+
+_current = ContextVar("request_metrics", default=None)
+_local = threading.local()
+# (thread, shard) of every thread that recorded a request, and the merged shards of finished threads
+_shards = []
+_retired = {}
+_shards_lock = threading.Lock()
+
+
+class RequestMetrics:
+    """Measurements of the request in progress, filled by the query wrapper and the template backend."""
+    __slots__ = ("start", "queries", "db_seconds", "template_seconds", "rendering")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.rendering = False
+
+    def observations(self, size):
+        return (time.perf_counter() - self.start, self.queries, self.db_seconds, self.template_seconds, size)
+
+
+class Histogram:
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self, bounds):
+        # one count per bound plus +Inf, not cumulative until they are rendered
+        self.buckets = [0] * (len(bounds) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, bounds, value):
+        self.buckets[bisect_left(bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other):
+        self.buckets = [mine + theirs for mine, theirs in zip(self.buckets, other.buckets)]
+        self.sum += other.sum
+        self.count += other.count
+
+
+def start_request():
+    """Start measuring the request of the current context; pass the token to stop_request."""
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def stop_request(token):
+    _current.reset(token)
+
+
+def record(view, observations):
+    """Add one request to the histograms of view; an observation of None is left out."""
+    try:
+        shard = _local.shard
+    except AttributeError:
+        shard = _local.shard = {}
+        with _shards_lock:
+            _shards.append((weakref.ref(threading.current_thread()), shard))
+    histograms = shard.get(view)
+    if histograms is None:
+        histograms = shard[view] = [Histogram(bounds) for bounds in BOUNDS]
+    for histogram, bounds, value in zip(histograms, BOUNDS, observations):
+        if value is not None:
+            histogram.observe(bounds, value)
+
+
+def _merge_into(totals, shard):
+    # list() copies the items in one step, while the owning thread may be adding a view
+    for view, histograms in list(shard.items()):
+        merged = totals.setdefault(view, [Histogram(bounds) for bounds in BOUNDS])
+        for total, histogram in zip(merged, histograms):
+            total.merge(histogram)
+
+
+def snapshot():
+    """{view: [Histogram per HISTOGRAMS entry]} of this process, merged over all threads."""
+    with _shards_lock:
+        live = []
+        for thread_ref, shard in _shards:
+            thread = thread_ref()
+            if thread is None or not thread.is_alive():
+                _merge_into(_retired, shard)
+            else:
+                live.append((thread_ref, shard))
+        _shards[:] = live
+        totals = {}
+        _merge_into(totals, _retired)
+        for _, shard in live:
+            _merge_into(totals, shard)
+    return totals
+
+
+def reset():
+    # the shards stay registered to their threads
+    with _shards_lock:
+        for _, shard in _shards:
+            shard.clear()
+        _retired.clear()
+
+
+def time_query(execute, sql, params, many, context):
+    """Execute wrapper of every connection (see CoreConfig.ready); counts only inside a measured request."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_seconds += time.perf_counter() - start
+        metrics.queries += 1
+
+
+def install_query_timer(sender, connection, **kwargs):
+    # connection_created fires on every connect of the same wrapper, also when the pool hands out a connection
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class Template(BaseTemplate):
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        # a template rendered while another renders is part of that render time
+        if metrics is None or metrics.rendering:
+            return super().render(context, request)
+        metrics.rendering = True
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_seconds += time.perf_counter() - start
+            metrics.rendering = False
+
+
+class DjangoTemplates(BaseDjangoTemplates):
+    """The Django template backend, timing every render of a measured request."""
+
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+def _format_bound(bound):
+    return f"{bound:g}" if isinstance(bound, float) else str(bound)
+
+
+def render_prometheus(cache_stats=None, pool_stats=None):
+    """The histograms, and the cache and connection pool stats, in the Prometheus text format."""
+    pid = os.getpid()
+    totals = snapshot()
+    lines = []
+    for index, (name, (help_text, bounds)) in enumerate(HISTOGRAMS.items()):
+        metric = f"buddyread_{name}"
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+        for view in sorted(totals):
+            histogram = totals[view][index]
+            labels = _labels(pid=pid, view=view)
+            cumulative = 0
+            for bound, count in zip([*map(_format_bound, bounds), "+Inf"], histogram.buckets):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{metric}_sum{{{labels}}} {float(histogram.sum)!r}")
+            lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+
+    if cache_stats:
+        for key in ("hits", "misses"):
+            metric = f"buddyread_cache_{key}_total"
+            lines += [f"# HELP {metric} Cache {key} of the counting cache backends.", f"# TYPE {metric} counter"]
+            for cache, counts in sorted(cache_stats.items()):
+                lines.append(f"{metric}{{{_labels(pid=pid, cache=cache)}}} {counts.get(key, 0)}")
+
+    if pool_stats:
+        for key, kind in (("size", "gauge"), ("idle", "gauge"), ("in_use", "gauge"), ("max_size", "gauge"),
+                          ("connects", "counter"), ("checkouts", "counter"), ("waits", "counter"),
+                          ("timeouts", "counter")):
+            metric = f"buddyread_db_pool_{key}" + ("_total" if kind == "counter" else "")
+            lines += [f"# HELP {metric} Connection pool {key.replace('_', ' ')}.", f"# TYPE {metric} {kind}"]
+            for alias, stats in sorted(pool_stats.items()):
+                lines.append(f"{metric}{{{_labels(pid=pid, alias=alias)}}} {stats[key]}")
+        metric = "buddyread_db_pool_evictions_total"
+        lines += [f"# HELP {metric} Connections the pool closed, by reason.", f"# TYPE {metric} counter"]
+        for alias, stats in sorted(pool_stats.items()):
+            for reason, count in sorted(stats["evictions"].items()):
+                lines.append(f"{metric}{{{_labels(pid=pid, alias=alias, reason=reason)}}} {count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,244 @@
+import json
+import mimetypes
+import os
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.http import parse_etags
+from core import metrics, nplusone
+from core.hashing import HashingBusy
+
+
+class HashingBusyMiddleware(MiddlewareMixin):
+    """Answer 503 instead of 500 when the hashing executor has no room for another password."""
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, HashingBusy):
+            response = HttpResponse("Het is even erg druk, probeer het zo opnieuw", status=503)
+            response["Retry-After"] = "1"
+            return response
+        return None
+
+
+# hashed names change with their content and are cached for a year, other names are revalidated
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+MUTABLE_CACHE_CONTROL = "public, max-age=60"
+# Content-Encoding -> suffix of the variants written by core.storage, best first
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+
+class StaticFile:
+    def __init__(self, path, immutable):
+        self.path = path
+        self.content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.cache_control = IMMUTABLE_CACHE_CONTROL if immutable else MUTABLE_CACHE_CONTROL
+        self.variants = {
+            encoding: path + suffix for encoding, suffix in ENCODINGS.items() if os.path.isfile(path + suffix)
+        }
+
+    def variant(self, accept_encoding):
+        """(path, encoding) of the best variant the client accepts; encoding is None for the file itself."""
+        accepted = _accepted_encodings(accept_encoding)
+        for encoding, path in self.variants.items():
+            if encoding in accepted:
+                return path, encoding
+        return self.path, None
+
+
+def _accepted_encodings(accept_encoding):
+    accepted = set()
+    for token in accept_encoding.lower().split(","):
+        encoding, *params = [part.strip() for part in token.split(";")]
+        try:
+            quality = float(next((param[2:] for param in params if param.startswith("q=")), 1))
+        except ValueError:
+            quality = 0
+        if quality > 0:
+            accepted.add(encoding)
+    return accepted
+
+
+def static_files(root, url):
+    """The files collected in root by url path, hashed names (in the staticfiles.json manifest) immutable."""
+    try:
+        with open(os.path.join(root, "staticfiles.json")) as manifest:
+            hashed = set(json.load(manifest)["paths"].values())
+    except (OSError, ValueError, KeyError):
+        hashed = set()
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.endswith(tuple(ENCODINGS.values())):
+                continue
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, root).replace(os.sep, "/")
+            files[url + relative] = StaticFile(path, relative in hashed)
+    return files
+
+
+class StaticFilesMiddleware(MiddlewareMixin):
+    """
+    Serve the files in STATIC_ROOT with their precompressed variant and far-future caching, for
+    deployments where gunicorn has no web server in front of it. The files are indexed once at startup,
+    so a path outside the index never touches the filesystem; run collectstatic before starting the workers.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.files = static_files(str(settings.STATIC_ROOT), settings.STATIC_URL) if settings.STATIC_ROOT else {}
+        if not self.files:
+            # nothing collected: development, where runserver serves the app directories itself
+            raise MiddlewareNotUsed
+
+    def process_request(self, request):
+        static_file = self.files.get(request.path_info)
+        if static_file is None or request.method not in ("GET", "HEAD"):
+            return None
+
+        path, encoding = static_file.variant(request.headers.get("Accept-Encoding", ""))
+        stat = os.stat(path)
+        etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponseNotModified()
+        elif request.method == "HEAD":
+            response = HttpResponse(content_type=static_file.content_type)
+            response["Content-Length"] = stat.st_size
+        else:
+            response = FileResponse(open(path, "rb"), content_type=static_file.content_type)
+            # FileResponse names the file on disk, which is the compressed variant
+            response.headers.pop("Content-Disposition", None)
+        response["ETag"] = etag
+        response["Cache-Control"] = static_file.cache_control
+        if static_file.variants:
+            response["Vary"] = "Accept-Encoding"
+        if encoding:
+            response["Content-Encoding"] = encoding
+        return response
+
+
+class PreloadLinkMiddleware(MiddlewareMixin):
+    """
+    Send the assets the page asked for through {% preload_static %} as a Link: rel=preload header, so
+    the browser (or a proxy sending 103 Early Hints) fetches them before it has parsed the head.
+    """
+
+    def process_request(self, request):
+        request.preload_links = []
+
+    def process_response(self, request, response):
+        links = getattr(request, "preload_links", None)
+        if links and not response.streaming:
+            response["Link"] = ", ".join(f"<{url}>; rel=preload; as={as_type}" for url, as_type in links)
+        return response
+
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match else metrics.UNMATCHED
+
+
+def _response_size(response):
+    if not response.streaming:
+        return len(response.content)
+    return int(response["Content-Length"]) if response.has_header("Content-Length") else None
+
+
+def _is_staff(request):
+    user = getattr(request, "user", None)
+    return user is not None and user.is_staff
+
+
+def server_timing(observations):
+    seconds, queries, db_seconds, template_seconds, _ = observations
+    return (
+        f'total;dur={seconds * 1000:.1f}, db;dur={db_seconds * 1000:.1f};desc="{queries} queries", '
+        f"tpl;dur={template_seconds * 1000:.1f}"
+    )
+
+
+class MetricsMiddleware:
+    """
+    Record latency, database queries and time, template render time and response size of every
+    request by view name (see core.metrics), and tell staff users where the time went in a
+    Server-Timing header.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        measured, token = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.stop_request(token)
+        observations = self.record(request, response, measured)
+        if _is_staff(request):
+            response["Server-Timing"] = server_timing(observations)
+        return response
+
+    async def __acall__(self, request):
+        measured, token = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.stop_request(token)
+        observations = self.record(request, response, measured)
+        if await sync_to_async(_is_staff)(request):
+            response["Server-Timing"] = server_timing(observations)
+        return response
+
+    def record(self, request, response, measured):
+        observations = measured.observations(_response_size(response))
+        metrics.record(_view_name(request), observations)
+        return observations
+
+
+class NPlusOneMiddleware:
+    """
+    Fingerprint the SELECTs of every request and report the N+1 queries (see core.nplusone), as
+    settings.NPLUSONE says: "log" for staging, "raise" for the test suite, "off" in production.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if settings.NPLUSONE == "off":
+            return self.get_response(request)
+        detector, token = nplusone.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            nplusone.stop(token)
+        self.report(request, detector)
+        return response
+
+    async def __acall__(self, request):
+        if settings.NPLUSONE == "off":
+            return await self.get_response(request)
+        detector, token = nplusone.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            nplusone.stop(token)
+        self.report(request, detector)
+        return response
+
+    def report(self, request, detector):
+        if _view_name(request) not in settings.NPLUSONE_IGNORE:
+            detector.report(settings.NPLUSONE, f"{request.method} {request.path}")
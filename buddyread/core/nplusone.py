@@ -0,0 +1,124 @@
+"""
+N+1 query detection: the SELECTs of a request (see core.middleware.NPlusOneMiddleware) or of a block
+of code (detect_nplusone) are fingerprinted with their literals normalized, and a fingerprint that runs
+more than a threshold of times from the same template line or line of code is reported.
+"""
+import logging
+import os
+import re
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.template.base import Node
+
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("nplusone_detector", default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?")
+# IN (?, ?, ?) of any length
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+class NPlusOneDetected(Exception):
+    pass
+
+
+def fingerprint(sql):
+    """sql with its literals and placeholders replaced by ?, so the queries of every row of a loop are equal."""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _LIST.sub("(...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+# project code that runs every query, never the place that asked for it
+_INFRASTRUCTURE = ("core/nplusone.py", "core/metrics.py", "core/middleware.py", "buddyread/db/")
+
+
+def _is_project_file(filename):
+    if not filename.startswith(str(settings.BASE_DIR)) or "site-packages" in filename:
+        return False
+    relative = os.path.relpath(filename, settings.BASE_DIR).replace(os.sep, "/")
+    return not relative.startswith(_INFRASTRUCTURE)
+
+
+def _location(frame):
+    """The template line being rendered, or else the innermost line of project code, that runs the query."""
+    code_location = None
+    while frame is not None:
+        if frame.f_code.co_name == "render_annotated":
+            node = frame.f_locals.get("self")
+            if isinstance(node, Node) and getattr(node, "token", None) is not None:
+                return f"{node.origin.template_name or node.origin.name}:{node.token.lineno}"
+        if code_location is None and _is_project_file(frame.f_code.co_filename):
+            code_location = f"{os.path.relpath(frame.f_code.co_filename, settings.BASE_DIR)}:{frame.f_lineno}"
+        frame = frame.f_back
+    return code_location or "unknown"
+
+
+class QueryDetector:
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.counts = Counter()
+
+    def add(self, sql, frame):
+        self.counts[fingerprint(sql), _location(frame)] += 1
+
+    def violations(self):
+        """(count, fingerprint, location) of every fingerprint that ran more than threshold times from one place."""
+        return sorted(
+            ((count, sql, location) for (sql, location), count in self.counts.items() if count > self.threshold),
+            reverse=True,
+        )
+
+    def report(self, mode, label):
+        violations = self.violations()
+        if not violations or mode == "off":
+            return
+        message = f"N+1 queries in {label}:\n" + "\n".join(
+            f"  {count}x from {location}: {sql}" for count, sql, location in violations
+        )
+        if mode == "raise":
+            raise NPlusOneDetected(message)
+        logger.warning(message)
+
+
+def detect_query(execute, sql, params, many, context):
+    """Execute wrapper of every connection (see CoreConfig.ready); counts only while a detector is active."""
+    detector = _current.get()
+    if detector is not None and not many and sql.lstrip()[:6].upper() == "SELECT":
+        detector.add(sql, sys._getframe(1))
+    return execute(sql, params, many, context)
+
+
+def install_detector(sender, connection, **kwargs):
+    if detect_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(detect_query)
+
+
+def start(threshold=None):
+    detector = QueryDetector(settings.NPLUSONE_THRESHOLD if threshold is None else threshold)
+    return detector, _current.set(detector)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+@contextmanager
+def detect_nplusone(mode="raise", threshold=None, label="block"):
+    """Report the N+1 queries of the block, once it has finished without an exception."""
+    detector, token = start(threshold)
+    try:
+        yield detector
+    finally:
+        stop(token)
+    detector.report(mode, label)
@@ -0,0 +1,54 @@
+"""
+Static files storage of collectstatic: manifest-hashed names plus gzip and brotli variants of every
+compressible file, written next to it so core.middleware.StaticFilesMiddleware never compresses on a request.
+"""
+import gzip
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    # without the brotli package only the gzip variants are built
+    brotli = None
+
+
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".map", ".svg", ".txt", ".json", ".xml", ".html", ".ico")
+# a variant that saves less than this is not worth a Content-Encoding
+MIN_SAVING = 0.05
+
+
+def _gzip(content):
+    # mtime=0 keeps the build reproducible
+    return gzip.compress(content, compresslevel=9, mtime=0)
+
+
+def _brotli(content):
+    return brotli.compress(content, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def encoders(self):
+        """(suffix, compress) pairs, best compression first."""
+        if brotli is not None:
+            yield ".br", _brotli
+        yield ".gz", _gzip
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # the unhashed names are collected too, they are what {% static %} falls back to in DEBUG
+        for name in [*paths, *self.hashed_files.values()]:
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as original:
+            content = original.read()
+        for suffix, compress in self.encoders():
+            compressed = compress(content)
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            if len(compressed) < len(content) * (1 - MIN_SAVING):
+                self._save(name + suffix, ContentFile(compressed))
@@ -0,0 +1,14 @@
+from django import template
+from django.templatetags.static import static
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def preload_static(context, path, as_type):
+    """The static url of path, also sent as a Link: rel=preload header by core.middleware.PreloadLinkMiddleware."""
+    url = static(path)
+    links = getattr(context.get("request"), "preload_links", None)
+    if links is not None and (url, as_type) not in links:
+        links.append((url, as_type))
+    return url
@@ -0,0 +1,54 @@
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from buddyread.cache import cache_stats
+import core.checks as core_checks
+
+
+def _counts():
+    return cache_stats().get(cache.stats_key, {})
+
+
+def test_cache_counts_hits_and_misses():
+    before = _counts()
+    cache.get("missing")
+    cache.set("present", 1)
+    assert cache.get("present") == 1
+    assert cache.get_many(["present", "missing"]) == {"present": 1}
+
+    after = _counts()
+    assert after["hits"] - before.get("hits", 0) == 2
+    assert after["misses"] - before.get("misses", 0) == 2
+    assert 0 <= after["hit_ratio"] <= 1
+
+
+def test_cache_counts_falsy_values_as_hits():
+    before = _counts()
+    cache.set("none", None)
+    assert cache.get("none", "default") is None
+    assert _counts()["hits"] - before.get("hits", 0) == 1
+
+
+@pytest.mark.django_db
+def test_authenticated_request_reads_session_from_cache(client, django_user_model, django_assert_num_queries):
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+    client.login(username='user', password='pwd')
+
+    with django_assert_num_queries(2) as captured:
+        client.get(reverse("index"))
+    assert not any("django_session" in query["sql"] for query in captured.captured_queries)
+    assert client.get(reverse("index")).wsgi_request.user == user
+
+
+def test_cached_db_sessions_require_shared_cache_outside_debug(settings):
+    settings.DEBUG = False
+    settings.CACHE_SHARED = False
+    settings.SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+    assert [error.id for error in core_checks.check_shared_cache(None)] == ["core.E001"]
+
+    settings.SESSION_ENGINE = "django.contrib.sessions.backends.db"
+    assert [error.id for error in core_checks.check_shared_cache(None)] == ["core.W001"]
+
+    settings.CACHE_SHARED = True
+    settings.SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+    assert core_checks.check_shared_cache(None) == []
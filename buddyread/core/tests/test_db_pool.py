@@ -0,0 +1,184 @@
+import threading
+import pytest
+from django.db import OperationalError
+from django.db.utils import ConnectionHandler
+from buddyread.db.pool import ConnectionPool, PoolTimeout, pool_stats
+
+
+class FakeConnection:
+    def __init__(self):
+        self.usable = True
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def pooled_db(tmp_path, django_db_blocker):
+    created = []
+
+    # every call is a new thread-local connection to the same pooled database
+    def make(**pool):
+        handler = ConnectionHandler({
+            "default": {},
+            "pooled": {
+                "ENGINE": "buddyread.db.backends.sqlite3",
+                "NAME": str(tmp_path / "db.sqlite3"),
+                "POOL": pool,
+            }
+        })
+        created.append(handler["pooled"])
+        return handler["pooled"]
+
+    # a scratch database next to the test database
+    with django_db_blocker.unblock():
+        yield make
+        for connection in created:
+            connection.close()
+            connection.close_pool()
+
+
+# ======================================================================================================================
+# TESTS POOLED DATABASE BACKEND
+# ======================================================================================================================
+
+def test_closed_connection_is_reused(pooled_db):
+    connection = pooled_db()
+    connection.ensure_connection()
+    raw = connection.connection
+    connection.close()
+    connection.ensure_connection()
+    assert connection.connection is raw
+
+    stats = connection.pool.stats()
+    assert (stats["connects"], stats["checkouts"], stats["in_use"]) == (1, 2, 1)
+
+
+def test_pools_are_kept_apart_by_connection_settings(pooled_db, tmp_path):
+    connection = pooled_db()
+    handler = ConnectionHandler({
+        "default": {},
+        "pooled": {"ENGINE": "buddyread.db.backends.sqlite3", "NAME": str(tmp_path / "other.sqlite3")}
+    })
+    other = handler["pooled"]
+    assert other.pool is not connection.pool
+
+    other.close_pool()
+    connection.ensure_connection()
+    assert connection.pool.stats()["connects"] == 1
+    assert "pooled" not in pool_stats()
+
+
+def test_uncommitted_transaction_is_rolled_back_on_close(pooled_db):
+    connection = pooled_db()
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE TABLE pooled (id integer)")
+    connection.set_autocommit(False)
+    with connection.cursor() as cursor:
+        cursor.execute("INSERT INTO pooled VALUES (1)")
+    raw = connection.connection
+    connection.close()
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM pooled")
+        assert cursor.fetchone() == (0,)
+    assert connection.connection is raw
+    assert connection.get_autocommit()
+
+
+def test_connection_with_error_is_discarded_when_unusable(pooled_db, monkeypatch):
+    connection = pooled_db()
+    connection.ensure_connection()
+    raw = connection.connection
+    connection.errors_occurred = True
+    monkeypatch.setattr(connection, "is_usable", lambda: False)
+    connection.close()
+
+    connection.ensure_connection()
+    assert connection.connection is not raw
+    assert connection.pool.stats()["evictions"] == {"broken": 1}
+
+
+def test_dead_connection_is_evicted_before_reuse(pooled_db):
+    connection = pooled_db()
+    connection.ensure_connection()
+    raw = connection.connection
+    connection.close()
+    raw.close()  # e.g. closed by the server
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    assert connection.connection is not raw
+    assert connection.pool.stats()["evictions"] == {"unusable": 1}
+
+
+def test_exhausted_pool_raises_operational_error(pooled_db):
+    connection = pooled_db(MAX_SIZE=1, TIMEOUT=0.01)
+    connection.ensure_connection()
+    other = pooled_db(MAX_SIZE=1, TIMEOUT=0.01)
+    with pytest.raises(OperationalError):
+        other.ensure_connection()
+    assert connection.pool.stats()["timeouts"] == 1
+
+
+# ======================================================================================================================
+# TESTS CONNECTION POOL
+# ======================================================================================================================
+
+def test_pool_waits_for_released_connection():
+    pool = ConnectionPool(check=lambda c: c.usable, max_size=1, timeout=5)
+    connection = pool.acquire(FakeConnection)
+    threading.Timer(0.05, pool.release, [connection]).start()
+
+    assert pool.acquire(FakeConnection) is connection
+    stats = pool.stats()
+    assert (stats["connects"], stats["waits"], stats["size"]) == (1, 1, 1)
+
+
+def test_pool_size_is_bounded():
+    pool = ConnectionPool(check=lambda c: c.usable, max_size=2, timeout=0)
+    # held, as the pool tracks open connections by id
+    connections = [pool.acquire(FakeConnection), pool.acquire(FakeConnection)]
+    with pytest.raises(PoolTimeout):
+        pool.acquire(FakeConnection)
+    assert pool.stats()["size"] == 2
+
+
+def test_pool_recycles_connections_after_max_lifetime():
+    clock = FakeClock()
+    pool = ConnectionPool(check=lambda c: c.usable, max_lifetime=60, clock=clock)
+    connection = pool.acquire(FakeConnection)
+    pool.release(connection)
+    clock.now = 60
+
+    assert pool.acquire(FakeConnection) is not connection
+    assert connection.closed
+    assert pool.stats()["evictions"] == {"lifetime": 1}
+
+
+def test_pool_skips_health_check_when_disabled():
+    pool = ConnectionPool(check=lambda c: c.usable, health_checks=False)
+    connection = pool.acquire(FakeConnection)
+    pool.release(connection)
+    connection.usable = False
+    assert pool.acquire(FakeConnection) is connection
+
+
+def test_failed_connect_frees_its_slot():
+    def connect():
+        raise OSError("connection refused")
+
+    pool = ConnectionPool(check=lambda c: c.usable, max_size=1, timeout=0)
+    with pytest.raises(OSError):
+        pool.acquire(connect)
+    assert pool.acquire(FakeConnection)
+    assert pool.stats()["size"] == 1
@@ -0,0 +1,93 @@
+import threading
+import pytest
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, make_password
+from django.urls import reverse
+from core import hashing
+
+
+@pytest.fixture
+def blocked_executor():
+    executor = hashing.HashingExecutor(workers=1, queue=0, timeout=0.01)
+    release = threading.Event()
+    executor.submit(release.wait)
+    yield executor
+    release.set()
+    executor.shutdown()
+
+
+def test_full_executor_raises_busy(blocked_executor):
+    with pytest.raises(hashing.HashingBusy):
+        blocked_executor.run(make_password, "pwd")
+
+
+def test_executor_accepts_work_again_when_slot_frees(settings):
+    settings.PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+    executor = hashing.HashingExecutor(workers=1, queue=0, timeout=5)
+    assert [executor.submit(make_password, "pwd") for _ in range(3)][-1].result().startswith("md5$")
+    executor.shutdown()
+
+
+@pytest.mark.django_db
+def test_verify_password_upgrades_outdated_hash(django_user_model, settings):
+    settings.PASSWORD_HASHERS = [
+        "django.contrib.auth.hashers.MD5PasswordHasher",
+        "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    ]
+    outdated = PBKDF2PasswordHasher().encode("pwd", "saltsaltsaltsalt", iterations=1)
+    user = django_user_model.objects.create(username='user', password=outdated)
+
+    assert not hashing.verify_password(user, "wrong")
+    assert hashing.verify_password(user, "pwd")
+    user.refresh_from_db()
+    assert user.password.startswith("md5$")
+
+
+@pytest.mark.django_db
+def test_login_verifies_password_on_executor(client, django_user_model, monkeypatch):
+    django_user_model.objects.create_user(username='user', password='pwd')
+    calls = []
+    monkeypatch.setattr(hashing.HashingExecutor, "run", lambda self, fn, *args: calls.append(fn) or fn(*args))
+
+    response = client.post(reverse("login"), {"username": "user", "password": "pwd"})
+    assert response.url == "/"
+    assert calls == [hashing._verify]
+
+    response = client.post(reverse("login"), {"username": "user", "password": "wrong"})
+    assert response.status_code == 200
+    assert response.context["form"].non_field_errors()
+
+
+@pytest.mark.django_db
+def test_login_answers_503_when_hashing_is_busy(client, django_user_model, blocked_executor, monkeypatch):
+    django_user_model.objects.create_user(username='user', password='pwd')
+    monkeypatch.setattr(hashing, "get_executor", lambda: blocked_executor)
+
+    response = client.post(reverse("login"), {"username": "user", "password": "pwd"})
+    assert response.status_code == 503
+    assert response["Retry-After"]
+
+
+@pytest.mark.urls("buddyread.async_urls")
+@pytest.mark.django_db
+def test_async_login(client, django_user_model):
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+
+    response = client.post(reverse("login"), {"username": "user", "password": "wrong"})
+    assert response.status_code == 200
+    assert response.context["form"].non_field_errors()
+
+    response = client.post(reverse("login") + "?next=/profiel/", {"username": "user", "password": "pwd"})
+    assert response.url == "/profiel/"
+    assert client.get(reverse("change_auth")).wsgi_request.user == user
+
+
+@pytest.mark.urls("buddyread.async_urls")
+@pytest.mark.django_db
+def test_async_login_rejects_unknown_user_and_foreign_next(client, django_user_model):
+    django_user_model.objects.create_user(username='user', password='pwd')
+
+    response = client.post(reverse("login"), {"username": "unknown", "password": "pwd"})
+    assert response.status_code == 200
+
+    response = client.post(reverse("login") + "?next=https://example.com/", {"username": "user", "password": "pwd"})
+    assert response.url == "/"
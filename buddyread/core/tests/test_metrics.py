@@ -0,0 +1,140 @@
+import threading
+from asgiref.sync import async_to_sync
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+import books.models as books_models
+import core.metrics as core_metrics
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    core_metrics.reset()
+    yield
+    core_metrics.reset()
+
+
+@pytest.fixture
+def member_client(client, django_user_model):
+    user = django_user_model.objects.create_user(username='user', password='pwd')
+    book_club = books_models.BookClub.objects.create(name="Bookclub")
+    books_models.BookClubMembers.objects.create(book_club=book_club, member=user)
+    client.login(username='user', password='pwd')
+    return client, user, book_club
+
+
+def _histograms(view):
+    return dict(zip(core_metrics.HISTOGRAMS, core_metrics.snapshot()[view]))
+
+
+@pytest.mark.django_db
+def test_request_is_recorded_by_view_name(member_client):
+    client, user, book_club = member_client
+    with CaptureQueriesContext(connection) as captured:
+        response = client.get(reverse("books", kwargs={"club": book_club.slug}))
+
+    histograms = _histograms("books")
+    assert histograms["request_duration_seconds"].count == 1
+    assert histograms["db_queries"].sum == len(captured)
+    assert histograms["db_duration_seconds"].sum > 0
+    assert histograms["template_render_seconds"].sum > 0
+    assert histograms["response_size_bytes"].sum == len(response.content)
+    # non-staff users do not see the timings
+    assert "Server-Timing" not in response
+
+
+@pytest.mark.django_db
+def test_unresolved_requests_share_one_label(member_client):
+    client, user, book_club = member_client
+    client.get("/bestaat-niet/")
+    client.get("/bestaat-ook-niet/")
+    assert _histograms(core_metrics.UNMATCHED)["request_duration_seconds"].count == 2
+
+
+@pytest.mark.django_db
+def test_staff_users_get_server_timing(member_client):
+    client, user, book_club = member_client
+    user.is_staff = True
+    user.save()
+    response = client.get(reverse("books", kwargs={"club": book_club.slug}))
+    timings = {part.split(";")[0]: part for part in response["Server-Timing"].split(", ")}
+    assert set(timings) == {"total", "db", "tpl"}
+    assert "queries" in timings["db"]
+
+
+def test_histograms_merge_the_shards_of_all_threads():
+    def record():
+        for value in (0.001, 0.02, 30.0):
+            core_metrics.record("books", (value, 3, 0.0, 0.0, None))
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    record()
+
+    histogram = _histograms("books")["request_duration_seconds"]
+    assert histogram.count == 15
+    # one per bucket: the first bound, the bucket of 0.025 and +Inf
+    assert [count for count in histogram.buckets if count] == [5, 5, 5]
+    # finished threads are folded in once
+    assert _histograms("books")["request_duration_seconds"].count == 15
+    # a missing observation is left out
+    assert _histograms("books")["response_size_bytes"].count == 0
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_requires_staff_or_token(member_client, settings):
+    client, user, book_club = member_client
+    assert client.get(reverse("metrics")).status_code == 403
+
+    settings.METRICS_TOKEN = "geheim"
+    client.logout()
+    assert client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer fout").status_code == 403
+    assert client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer geheim").status_code == 200
+
+    settings.METRICS_TOKEN = ""
+    user.is_staff = True
+    user.save()
+    client.login(username='user', password='pwd')
+    assert client.get(reverse("metrics")).status_code == 200
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_renders_prometheus_histograms(member_client, settings):
+    client, user, book_club = member_client
+    settings.METRICS_TOKEN = "geheim"
+    client.get(reverse("books", kwargs={"club": book_club.slug}))
+    response = client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer geheim")
+
+    assert response["Content-Type"] == "text/plain; version=0.0.4; charset=utf-8"
+    lines = response.content.decode().splitlines()
+    assert "# TYPE buddyread_request_duration_seconds histogram" in lines
+    books_lines = [line for line in lines if line.startswith("buddyread_request_duration_seconds") and 'view="books"' in line]
+    buckets = [int(line.rsplit(" ", 1)[1]) for line in books_lines if "_bucket" in line]
+    assert buckets == sorted(buckets)
+    # the buckets end with +Inf, followed by the sum and the count
+    assert 'le="+Inf"} 1' in books_lines[-3]
+    assert books_lines[-2].startswith("buddyread_request_duration_seconds_sum{")
+    assert books_lines[-1].startswith("buddyread_request_duration_seconds_count{") and books_lines[-1].endswith(" 1")
+    assert any(line.startswith("buddyread_cache_hits_total{") for line in lines)
+
+
+@pytest.mark.urls("buddyread.async_urls")
+@pytest.mark.django_db
+def test_async_views_are_recorded(async_client, member_client):
+    client, user, book_club = member_client
+    async_client.force_login(user)
+
+    async def get():
+        return await async_client.get(reverse("books", kwargs={"club": book_club.slug}))
+
+    with CaptureQueriesContext(connection) as captured:
+        async_to_sync(get)()
+
+    histograms = _histograms("books")
+    assert histograms["request_duration_seconds"].count == 1
+    # the queries run on other threads, the request context follows them there
+    assert histograms["db_queries"].sum == len(captured) > 0
@@ -0,0 +1,77 @@
+import logging
+import pytest
+from django.http import HttpResponse
+from django.template import engines
+from django.test import RequestFactory
+from django.urls import ResolverMatch
+import books.models as books_models
+import core.nplusone as core_nplusone
+from core.middleware import NPlusOneMiddleware
+
+
+@pytest.fixture
+def reviews(django_user_model):
+    book = books_models.Book.objects.create(title="Title", author="Author")
+    for i in range(5):
+        user = django_user_model.objects.create_user(username=f'user-{i}', password='pwd')
+        books_models.Review.objects.create(user=user, book=book, score=6)
+    return books_models.Review.objects.filter(book=book)
+
+
+def test_fingerprint_normalizes_literals():
+    assert core_nplusone.fingerprint(
+        "SELECT * FROM \"t\" U0 WHERE U0.id = 5 AND name = 'Dune' AND id IN (%s, %s)"
+    ) == core_nplusone.fingerprint(
+        "SELECT  * FROM \"t\" U0\nWHERE U0.id = 12 AND name = 'It''s' AND id IN (%s, %s, %s, %s)"
+    ) == "SELECT * FROM \"t\" U0 WHERE U0.id = ? AND name = ? AND id IN (...)"
+
+
+@pytest.mark.django_db
+def test_query_per_row_in_template_is_reported_at_template_line(reviews):
+    template = engines["django"].from_string(
+        "<ul>\n{% for review in reviews %}\n<li>{{ review.user.username }}</li>\n{% endfor %}</ul>"
+    )
+    with pytest.raises(core_nplusone.NPlusOneDetected, match=r"5x from <unknown source>:3: SELECT .*auth_user"):
+        with core_nplusone.detect_nplusone():
+            template.render({"reviews": reviews})
+
+    with core_nplusone.detect_nplusone():
+        template.render({"reviews": reviews.select_related("user")})
+
+
+@pytest.mark.django_db
+def test_query_per_row_in_code_is_reported_at_code_line(reviews):
+    with pytest.raises(core_nplusone.NPlusOneDetected, match=r"from core/tests/test_nplusone.py:\d+"):
+        with core_nplusone.detect_nplusone():
+            [review.user.username for review in reviews.all()]
+
+    # up to the threshold a repeated query is allowed
+    with core_nplusone.detect_nplusone(threshold=5) as detector:
+        [review.user.username for review in reviews.all()]
+    assert max(detector.counts.values()) == 5
+
+
+@pytest.mark.django_db
+def test_middleware_logs_or_raises_per_request(reviews, settings, caplog):
+    def view(request):
+        return HttpResponse(", ".join(review.user.username for review in reviews.all()))
+
+    request = RequestFactory().get("/club/leesclub/")
+    request.resolver_match = ResolverMatch(view, (), {}, url_name="books", route="club/<slug:club>/")
+    middleware = NPlusOneMiddleware(view)
+
+    settings.NPLUSONE = "log"
+    with caplog.at_level(logging.WARNING, logger="core.nplusone"):
+        middleware(request)
+    assert "N+1 queries in GET /club/leesclub/" in caplog.text
+
+    settings.NPLUSONE = "raise"
+    with pytest.raises(core_nplusone.NPlusOneDetected):
+        middleware(request)
+
+    settings.NPLUSONE_IGNORE = ["books"]
+    middleware(request)
+
+    settings.NPLUSONE = "off"
+    settings.NPLUSONE_IGNORE = []
+    middleware(request)
@@ -0,0 +1,97 @@
+import gzip
+import json
+from pathlib import Path
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+import core.storage as core_storage
+
+
+CORE_STATIC = Path(core_storage.__file__).resolve().parent / "static"
+BOOTSTRAP_CSS = "vendor/bootstrap/css/bootstrap.min.css"
+
+
+@pytest.fixture(scope="module")
+def collected(tmp_path_factory):
+    """STATIC_ROOT collected by the production storage, with only the files of the core app."""
+    root = tmp_path_factory.mktemp("static")
+    with override_settings(
+        STATIC_ROOT=root,
+        STATICFILES_DIRS=[CORE_STATIC],
+        STATICFILES_FINDERS=["django.contrib.staticfiles.finders.FileSystemFinder"],
+        STORAGES={
+            **settings.STORAGES,
+            "staticfiles": {"BACKEND": "core.storage.CompressedManifestStaticFilesStorage"},
+        },
+    ):
+        call_command("collectstatic", interactive=False, verbosity=0)
+    # served from here on by core.middleware.StaticFilesMiddleware
+    with override_settings(STATIC_ROOT=root):
+        yield root, json.loads((root / "staticfiles.json").read_text())["paths"]
+
+
+def test_collectstatic_writes_hashed_names_and_compressed_variants(collected):
+    root, manifest = collected
+    hashed = manifest[BOOTSTRAP_CSS]
+    assert hashed != BOOTSTRAP_CSS
+    assert gzip.decompress((root / (hashed + ".gz")).read_bytes()) == (root / hashed).read_bytes()
+    if core_storage.brotli is not None:
+        assert core_storage.brotli.decompress((root / (hashed + ".br")).read_bytes()) == (root / hashed).read_bytes()
+    # fonts are compressed already
+    font = manifest["vendor/bootstrap-icons/fonts/bootstrap-icons.woff2"]
+    assert not (root / (font + ".gz")).exists()
+    # the icon stylesheet points at the hashed font
+    assert font.split("/")[-1] in (root / manifest["vendor/bootstrap-icons/bootstrap-icons.min.css"]).read_text()
+
+
+@pytest.mark.django_db
+def test_static_files_served_precompressed_and_immutable(client, collected, django_assert_num_queries):
+    root, manifest = collected
+    url = "/static/" + manifest[BOOTSTRAP_CSS]
+    original = (root / manifest[BOOTSTRAP_CSS]).read_bytes()
+
+    # no session or user is loaded for an asset
+    with django_assert_num_queries(0):
+        response = client.get(url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+    assert response.status_code == 200
+    assert response["Content-Type"] == "text/css"
+    assert response["Content-Encoding"] == "gzip"
+    assert response["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert response["Vary"] == "Accept-Encoding"
+    assert "Content-Disposition" not in response
+    assert gzip.decompress(b"".join(response.streaming_content)) == original
+
+    if core_storage.brotli is not None:
+        response = client.get(url, HTTP_ACCEPT_ENCODING="gzip, deflate, br")
+        assert response["Content-Encoding"] == "br"
+
+    response = client.get(url, HTTP_ACCEPT_ENCODING="gzip;q=0")
+    assert "Content-Encoding" not in response
+    assert b"".join(response.streaming_content) == original
+
+
+@pytest.mark.django_db
+def test_static_files_revalidate(client, collected):
+    root, manifest = collected
+    url = "/static/" + manifest[BOOTSTRAP_CSS]
+    etag = client.get(url, HTTP_ACCEPT_ENCODING="gzip")["ETag"]
+    response = client.get(url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+    # an unhashed name may change with the next deploy
+    response = client.get("/static/" + BOOTSTRAP_CSS)
+    assert response["Cache-Control"] == "public, max-age=60"
+
+    assert client.get("/static/vendor/../../settings.py").status_code == 404
+    assert client.get("/static/vendor/missing.css").status_code == 404
+
+
+@pytest.mark.django_db
+def test_pages_preload_their_assets(client):
+    response = client.get(reverse("login"))
+    links = response["Link"].split(", ")
+    assert f"</static/{BOOTSTRAP_CSS}>; rel=preload; as=style" in links
+    assert "</static/vendor/bootstrap/js/bootstrap.bundle.min.js>; rel=preload; as=script" in links
+    assert "cdn.jsdelivr.net" not in response.content.decode()
@@ -4,5 +4,6 @@ from . import views
 
 urlpatterns = [
     path("", views.index, name="index"),
-    path("profiel/", views.change_auth, name="change_auth")
+    path("profiel/", views.change_auth, name="change_auth"),
+    path("metrics", views.metrics, name="metrics"),
 ]
\ No newline at end of file
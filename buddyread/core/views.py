@@ -1,19 +1,24 @@
+import hmac
+from django.conf import settings
 from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import redirect, render
+from django.views.decorators.cache import never_cache
+from buddyread.cache import cache_stats
+from buddyread.db.pool import pool_stats
+from core import hashing, metrics as core_metrics
 from core.forms import ChangeAuthForm
-from books.models import BookClubMembers, BookClub
+from books.memberships import user_clubs
 
 
 @login_required
 def index(request):
-    membership_qs = BookClubMembers.objects.filter(member=request.user)
-    membership_count = membership_qs.count()
-    if membership_count == 1:
-        membership = membership_qs.first()
-        return redirect("books", club=membership.book_club.slug)
+    clubs = user_clubs(request.user)
+    if len(clubs) == 1:
+        return redirect("books", club=clubs[0].slug)
 
-    if membership_count > 1:
+    if len(clubs) > 1:
         return redirect("choose_club")
 
     return redirect("add_club")
@@ -27,7 +32,7 @@ def change_auth(request):
             user.username = form.cleaned_data['username']
             new_password = form.cleaned_data['new_password']
             if new_password:
-                user.set_password(new_password)
+                hashing.set_password(user, new_password)
             user.save()
             update_session_auth_hash(request, user)
             return redirect("/")
@@ -35,3 +40,19 @@ def change_auth(request):
         form = ChangeAuthForm(initial={'username': user.username}, user=user)
     return render(request, 'core/profile.html', {'form': form})
 
+
+def _metrics_token_valid(request):
+    authorization = request.headers.get("Authorization", "")
+    return bool(settings.METRICS_TOKEN) and hmac.compare_digest(
+        authorization.encode(), f"Bearer {settings.METRICS_TOKEN}".encode()
+    )
+
+
+@never_cache
+def metrics(request):
+    if not _metrics_token_valid(request) and not request.user.is_staff:
+        return HttpResponseForbidden("Toegang geweigerd")
+    return HttpResponse(
+        core_metrics.render_prometheus(cache_stats(), pool_stats()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )